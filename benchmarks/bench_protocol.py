@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк протоколов команд ESP32: текстовый против двоичного
+
+Сравнивает кодирование в кадры транспорта, разбор на приемной стороне
+и объем данных на команду для пакетов разного размера.
+
+Запуск: python -m benchmarks.bench_protocol
+"""
+
+import timeit
+
+from src.core.serial_transport import FrameDecoder, encode_frame
+from src.core.esp32_protocol import BinaryCodec, parse_text_command
+
+def track_commands(count: int):
+    """Команды сопровождения трех объектов, как при покадровой отправке"""
+    return [f"TRACK:{i % 3 + 1}:{(i * 7) % 100}:{(i * 3) % 100}" for i in range(count)]
+
+def text_encode(commands):
+    return b''.join(encode_frame(command.encode('utf-8')) for command in commands)
+
+def text_decode(data: bytes):
+    """Разбор на стороне ESP32: кадры, split и преобразование чисел"""
+    parsed = []
+    for payload in FrameDecoder().feed(data):
+        parts = payload.decode('ascii').split(':')
+        parsed.append((parts[0], int(parts[1]), int(parts[2]), int(parts[3])))
+    return parsed
+
+def binary_encode(codec: BinaryCodec, commands):
+    return b''.join(encode_frame(message) for message in
+                    codec.encode_messages([(command, 0) for command in commands]))
+
+def binary_decode(codec: BinaryCodec, data: bytes):
+    parsed = []
+    for payload in FrameDecoder().feed(data):
+        parsed.extend(codec.decode(payload).commands)
+    return parsed
+
+def measure(func, repeat: int = 5) -> float:
+    """Лучшее время одного вызова, мкс"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number * 1e6
+
+def main():
+    codec = BinaryCodec()
+    print(f"{'пакет':>6} {'протокол':>9} {'кодир., мкс':>12} {'разбор, мкс':>12} "
+          f"{'команд/с':>10} {'байт/команду':>13}")
+
+    for batch in (1, 4, 16, 64):
+        text_commands = track_commands(batch)
+        binary_commands = [parse_text_command(command) for command in text_commands]
+
+        text_data = text_encode(text_commands)
+        binary_data = binary_encode(codec, binary_commands)
+        assert len(text_decode(text_data)) == len(binary_decode(codec, binary_data)) == batch
+
+        rows = (
+            ('текст', measure(lambda: text_encode(text_commands)),
+             measure(lambda: text_decode(text_data)), len(text_data)),
+            ('двоичный', measure(lambda: binary_encode(codec, binary_commands)),
+             measure(lambda: binary_decode(codec, binary_data)), len(binary_data))
+        )
+        for name, encode_us, decode_us, size in rows:
+            throughput = batch / ((encode_us + decode_us) / 1e6)
+            print(f"{batch:>6} {name:>9} {encode_us:>12.2f} {decode_us:>12.2f} "
+                  f"{throughput:>10.0f} {size / batch:>13.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк задержки _process_frame для разных масштабов обработки
+
+Запуск: python -m benchmarks.bench_scales
+"""
+
+import time
+import numpy as np
+
+from src.core.motion_tracker import MotionTracker
+from benchmarks.synthetic import synthetic_rgba_frames
+
+def run(scale: float, coarse_to_fine: bool, frames: int = 200, resolution=(640, 480)):
+    """Измерение задержки обработки кадра в мс"""
+    tracker = MotionTracker()
+    tracker.set_detector('mog2')
+    tracker.set_processing_scale(scale, coarse_to_fine)
+
+    latencies = []
+    for rgba in synthetic_rgba_frames(resolution, frames):
+        frame = tracker.frame_acquirer.from_rgba(rgba)
+        start = time.perf_counter()
+        tracker._process_frame(frame)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        tracker.frame_acquirer.release(frame)
+
+    # Первые кадры - инициализация модели фона
+    latencies = np.array(latencies[10:])
+    return latencies.mean(), np.percentile(latencies, 95)
+
+def main():
+    print(f"{'масштаб':>8} {'уточнение':>10} {'среднее, мс':>12} {'p95, мс':>10}")
+    for scale in (1.0, 0.5, 0.25):
+        for coarse_to_fine in (False, True):
+            mean, p95 = run(scale, coarse_to_fine)
+            print(f"{scale:>8} {str(coarse_to_fine):>10} {mean:>12.2f} {p95:>10.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Проверка выделений памяти в горячем цикле через tracemalloc
+
+В установившемся режиме ни морфология, ни _process_frame не должны
+удерживать память после прогрева. Тот же замер выполняет
+tests/test_allocations.py.
+
+Запуск: python -m benchmarks.check_allocations
+"""
+
+import gc
+import sys
+import tracemalloc
+from typing import Callable, Optional
+
+from src.core.blobs import EMPTY_BLOBS
+from src.core.motion_tracker import MotionTracker
+from src.core.morphology import MorphologyStage
+from benchmarks.synthetic import synthetic_rgba_frames
+
+# Выделения самого замера (снимки, счетчики) не учитываются
+OWN_FILTERS = (tracemalloc.Filter(False, tracemalloc.__file__),
+               tracemalloc.Filter(False, __file__))
+
+def traced_bytes() -> int:
+    """Память, выделенная вне кода замера (после сборки циклического мусора)"""
+    gc.collect()
+    snapshot = tracemalloc.take_snapshot().filter_traces(OWN_FILTERS)
+    return sum(stat.size for stat in snapshot.statistics('filename'))
+
+def measure(func, items, release: Optional[Callable[[], None]] = None):
+    """Удержанная и пиковая память (байты) после прогрева
+
+    Прогрев - проход по тем же items, чтобы кэши и состояние (буферы,
+    кэш малых массивов NumPy по размерам) вошли в базовую линию.
+    Трассировку лучше включить до создания проверяемых объектов: float
+    из freelist, выделенный до нее, при замене не учитывается.
+    release сбрасывает результат последнего вызова: он живет до
+    следующего кадра и утечкой не считается.
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        for item in items:
+            func(item)
+        if release is not None:
+            release()
+        # Первый снимок заполняет кэши фильтров (fnmatch) - до базовой линии
+        traced_bytes()
+        baseline = traced_bytes()
+        tracemalloc.reset_peak()
+        peak_baseline = tracemalloc.get_traced_memory()[0]
+
+        for item in items:
+            func(item)
+        if release is not None:
+            release()
+        peak = tracemalloc.get_traced_memory()[1] - peak_baseline
+        current = traced_bytes() - baseline
+    finally:
+        if started:
+            tracemalloc.stop()
+    return current, peak
+
+def measure_process_frame(tracker: MotionTracker, frames):
+    """Замер _process_frame; пятна последнего кадра сбрасываются перед подсчетом"""
+    def release():
+        tracker.blobs = EMPTY_BLOBS
+    return measure(tracker._process_frame, frames, release)
+
+def main() -> int:
+    tracemalloc.start()
+    tracker = MotionTracker()
+    tracker.set_detector('mog2')
+    frames = [tracker.frame_acquirer.from_rgba(rgba).copy()
+              for rgba in synthetic_rgba_frames(count=60)]
+    masks = [tracker.detector.apply(frame).copy() for frame in frames]
+    frame_bytes = frames[0].nbytes
+
+    failed = False
+    for merged in (False, True):
+        current, peak = measure(MorphologyStage(merged=merged).apply, masks)
+        # Допускаются только временные объекты Python-обвязки OpenCV
+        ok = current == 0 and peak < 4096
+        failed |= not ok
+        print(f"morphology merged={merged}: удержано {current} Б, пик {peak} Б "
+              f"{'OK' if ok else 'FAIL'}")
+
+    current, peak = measure_process_frame(tracker, frames)
+    ok = current == 0
+    failed |= not ok
+    print(f"_process_frame: удержано {current} Б, пик {peak} Б "
+          f"(кадр {frame_bytes} Б) {'OK' if ok else 'FAIL'}")
+
+    tracemalloc.stop()
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
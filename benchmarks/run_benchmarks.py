@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Воспроизводимый набор бенчмарков горячего пути детекции
+
+Измеряет _texture_to_numpy, _process_frame и полный цикл (чтение ->
+детекция -> публикация) на синтетических и записанных последовательностях
+при разных разрешениях и плотности движения. Сообщает p50/p95/p99,
+пропускную способность, выделения памяти и пиковый RSS; сравнивает
+с сохраненными базовыми значениями и завершается с ошибкой при регрессии.
+Каждый участок каждого сценария замеряется в отдельном процессе, чтобы
+пиковый RSS относился только к нему. Работает без окна на обычной Linux машине.
+
+Запуск:
+    python -m benchmarks.run_benchmarks                   # сравнение с базой
+    python -m benchmarks.run_benchmarks --save-baseline   # обновление базы
+    python -m benchmarks.run_benchmarks --recorded clip.mp4
+"""
+
+import os
+
+# Kivy разбирает sys.argv при импорте
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from src.core.motion_tracker import MotionTracker
+from src.core.frame_sources import KivyCameraSource, open_source
+from benchmarks.synthetic import synthetic_rgba_frames
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+
+RESOLUTIONS = {
+    '320x240': (320, 240),
+    '640x480': (640, 480),
+    '1280x720': (1280, 720)
+}
+
+# Плотность движения: число движущихся объектов в кадре
+DENSITIES = {
+    'static': 0,
+    'single': 1,
+    'busy': 8
+}
+
+WARMUP_FRAMES = 10
+
+# Сравниваемые метрики и минимальный абсолютный прирост, считающийся регрессией
+REGRESSION_FLOORS = {
+    'p50_ms': 0.1,
+    'p95_ms': 0.2,
+    'alloc_peak_bytes': 4096
+}
+
+class FakeTexture:
+    """Текстура с данными в памяти вместо GPU (для замера _texture_to_numpy)"""
+
+    def __init__(self, rgba: np.ndarray):
+        self.size = (rgba.shape[1], rgba.shape[0])
+        # bytearray: bytes() от него создает копию (от bytes вернул бы тот же объект)
+        self._pixels = bytearray(rgba.tobytes())
+
+    @property
+    def pixels(self) -> bytes:
+        # Как и Kivy, каждый доступ возвращает новую копию данных
+        return bytes(self._pixels)
+
+class FakeCamera:
+    """Камера Kivy с подменяемой текстурой (для KivyCameraSource)"""
+
+    def __init__(self):
+        self.texture = None
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+def peak_rss_mb() -> float:
+    """Пиковый RSS процесса в МБ (ru_maxrss в Linux - в КБ)
+
+    Процесс замеряет один участок одного сценария (см. run_isolated).
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def time_calls(func: Callable, items: List) -> np.ndarray:
+    """Задержки вызовов в мс после прогрева"""
+    for item in items[:WARMUP_FRAMES]:
+        func(item)
+    latencies = np.empty(len(items) - WARMUP_FRAMES)
+    for i, item in enumerate(items[WARMUP_FRAMES:]):
+        start = time.perf_counter()
+        func(item)
+        latencies[i] = (time.perf_counter() - start) * 1000.0
+    return latencies
+
+def allocations_per_call(func: Callable, items: List) -> float:
+    """Наибольший пик выделений Python/NumPy за один вызов (tracemalloc)"""
+    tracemalloc.start()
+    for item in items[WARMUP_FRAMES:]:
+        tracemalloc.reset_peak()
+        func(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return float(peak)
+
+def summarize(latencies: np.ndarray, allocated: float) -> Dict:
+    p50, p95, p99 = np.percentile(latencies, (50, 95, 99))
+    return {
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'throughput_fps': round(1000.0 / float(latencies.mean()), 1),
+        'alloc_peak_bytes': int(allocated),
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    }
+
+def make_tracker() -> MotionTracker:
+    tracker = MotionTracker()
+    tracker.set_detector('mog2')
+    return tracker
+
+def bench_texture_to_numpy(rgba_frames: List[np.ndarray]) -> Dict:
+    """Текстура -> кадр"""
+    tracker = make_tracker()
+    textures = [FakeTexture(rgba) for rgba in rgba_frames]
+
+    def texture_to_numpy(texture):
+        # Слот кольца возвращается, как это делает стадия детекции
+        tracker.frame_acquirer.release(tracker._texture_to_numpy(texture))
+
+    latencies = time_calls(texture_to_numpy, textures)
+    return summarize(latencies, allocations_per_call(texture_to_numpy, textures))
+
+def bench_process_frame(rgba_frames: List[np.ndarray]) -> Dict:
+    """Обработка кадра"""
+    tracker = make_tracker()
+    frames = [tracker.frame_acquirer.from_rgba(rgba).copy() for rgba in rgba_frames]
+    latencies = time_calls(tracker._process_frame, frames)
+    return summarize(latencies, allocations_per_call(tracker._process_frame, frames))
+
+def bench_full_loop(rgba_frames: List[np.ndarray]) -> Dict:
+    """Полный цикл без потоков теми же методами, что и стадии конвейера:
+    чтение источника -> детекция -> публикация"""
+    tracker = make_tracker()
+    camera = FakeCamera()
+    source = KivyCameraSource()
+    source.camera = camera
+    tracker.set_source(source)
+    textures = [FakeTexture(rgba) for rgba in rgba_frames]
+
+    def full_loop(texture):
+        camera.texture = texture
+        tracker.process_next_frame()
+
+    latencies = time_calls(full_loop, textures)
+    return summarize(latencies, allocations_per_call(full_loop, textures))
+
+BENCHES = {
+    'texture_to_numpy': bench_texture_to_numpy,
+    'process_frame': bench_process_frame,
+    'full_loop': bench_full_loop
+}
+
+def synthetic_cases(frames: int) -> Dict[str, Callable[[], List[np.ndarray]]]:
+    """Сценарии генерируются по одному, чтобы не держать все кадры в памяти"""
+    cases = {}
+    for res_name, resolution in RESOLUTIONS.items():
+        for density_name, objects in DENSITIES.items():
+            cases[f'synthetic/{res_name}/{density_name}'] = (
+                lambda resolution=resolution, objects=objects:
+                list(synthetic_rgba_frames(resolution, frames, objects=objects, seed=42)))
+    return cases
+
+def recorded_case(path: str, frames: int) -> List[np.ndarray]:
+    """RGBA кадры из видеофайла или последовательности изображений"""
+    import cv2
+
+    source = open_source(path)
+    if source is None:
+        return []
+    rgba_frames = []
+    while source.has_frame() and len(rgba_frames) < frames:
+        image = source.read()
+        if image is not None:
+            rgba_frames.append(cv2.cvtColor(image, cv2.COLOR_BGR2RGBA))
+    source.close()
+    return rgba_frames
+
+def run_isolated(case: str, bench: str, args) -> Optional[Dict]:
+    """Участок сценария в отдельном процессе; None - сценарий пропущен или ошибка"""
+    command = [sys.executable, '-m', 'benchmarks.run_benchmarks', '--case', case,
+               '--bench', bench, '--frames', str(args.frames)]
+    for path in args.recorded:
+        command += ['--recorded', path]
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    completed = subprocess.run(command, cwd=root, stdout=subprocess.PIPE, text=True)
+    if completed.returncode != 0:
+        print(f"{case} {bench}: ошибка процесса ({completed.returncode})")
+        return None
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Список регрессий относительно базы"""
+    regressions = []
+    for case, benches in results.items():
+        for bench, metrics in benches.items():
+            base = baseline.get(case, {}).get(bench)
+            if not base:
+                continue
+            for metric, floor in REGRESSION_FLOORS.items():
+                # Для малых значений относительный допуск меньше шума измерений
+                limit = max(base[metric] * (1.0 + tolerance), base[metric] + floor)
+                if metrics[metric] > limit:
+                    regressions.append(f"{case} {bench} {metric}: "
+                                       f"{metrics[metric]} > {base[metric]} (+{tolerance:.0%})")
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Бенчмарки горячего пути детекции')
+    parser.add_argument('--frames', type=int, default=120, help='кадров на сценарий')
+    parser.add_argument('--recorded', action='append', default=[],
+                        help='видеофайл или каталог изображений (можно несколько)')
+    parser.add_argument('--only', default='', help='подстрока имени сценария')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='допустимое ухудшение относительно базы')
+    parser.add_argument('--json', action='store_true', help='вывод результатов в JSON')
+    # Внутренние: один участок одного сценария в дочернем процессе
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    parser.add_argument('--bench', choices=BENCHES, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    cases = synthetic_cases(args.frames)
+    for path in args.recorded:
+        cases[f'recorded/{os.path.basename(path)}'] = (
+            lambda path=path: recorded_case(path, args.frames))
+
+    if args.case:
+        rgba_frames = cases[args.case]()
+        if len(rgba_frames) <= WARMUP_FRAMES:
+            print(json.dumps(None))
+        else:
+            print(json.dumps(BENCHES[args.bench](rgba_frames)))
+        return 0
+
+    results = {}
+    for name in cases:
+        if args.only not in name:
+            continue
+        benches = {}
+        for bench in BENCHES:
+            metrics = run_isolated(name, bench, args)
+            if metrics is not None:
+                benches[bench] = metrics
+        if not benches:
+            print(f"{name}: недостаточно кадров, пропущено")
+            continue
+        results[name] = benches
+        if not args.json:
+            for bench, m in results[name].items():
+                print(f"{name:<32} {bench:<17} p50 {m['p50_ms']:>8.3f}  p95 {m['p95_ms']:>8.3f}  "
+                      f"p99 {m['p99_ms']:>8.3f} мс  {m['throughput_fps']:>8.1f} FPS  "
+                      f"alloc {m['alloc_peak_bytes']:>9} Б  RSS {m['peak_rss_mb']:.1f} МБ")
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+
+    if args.save_baseline:
+        baseline = dict(results)
+        baseline['_machine'] = {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'numpy': np.__version__
+        }
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"База сохранена: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("База не найдена, сравнение пропущено (--save-baseline для создания)")
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nРЕГРЕССИИ ПРОИЗВОДИТЕЛЬНОСТИ:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+
+    print("\nРегрессий нет")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Синтетические последовательности кадров для бенчмарков
+"""
+
+import numpy as np
+from typing import Iterator, Tuple
+
+def synthetic_rgba_frames(resolution: Tuple[int, int] = (640, 480), count: int = 200,
+                          objects: int = 1, noise: int = 8, seed: int = 0) -> Iterator[np.ndarray]:
+    """Генерация RGBA кадров с движущимися прямоугольниками и шумом"""
+    width, height = resolution
+    rng = np.random.default_rng(seed)
+
+    background = rng.integers(40, 200, size=(height, width, 4), dtype=np.uint8)
+    background[:, :, 3] = 255
+
+    size = max(8, min(width, height) // 8)
+    positions = rng.integers(0, [width - size, height - size], size=(objects, 2))
+    velocities = rng.integers(-6, 7, size=(objects, 2))
+
+    for _ in range(count):
+        frame = background.copy()
+        if noise:
+            jitter = rng.integers(0, noise, size=(height, width), dtype=np.uint8)
+            frame[:, :, 1] = np.clip(frame[:, :, 1].astype(np.int16) + jitter, 0, 255)
+
+        for (x, y) in positions:
+            frame[y:y + size, x:x + size, :3] = 255
+
+        positions += velocities
+        bounce = (positions < 0) | (positions > [width - size, height - size])
+        velocities[bounce] *= -1
+        np.clip(positions, 0, [width - size, height - size], out=positions)
+
+        yield frame
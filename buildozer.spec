@@ -20,7 +20,7 @@ version = 1.0.0
 
 # (list) Application requirements
 # comma separated e.g. requirements = sqlite3,kivy
-requirements = python3,kivy
+requirements = python3,kivy,numpy,opencv,sqlite3,pyserial,usb4a,usbserial4a
 
 # (str) Supported orientation (landscape, portrait or all)
 orientation = portrait
@@ -1,117 +1,97 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Простое Android приложение Motion Tracker
-Минимальная версия для тестирования сборки
+Android приложение Motion Tracker
+Интерфейс показывается сразу, OpenCV и трекер загружаются в фоне
 """
 
+import os
 from kivy.app import App
-from kivy.uix.boxlayout import BoxLayout
-from kivy.uix.button import Button
-from kivy.uix.label import Label
 from kivy.clock import Clock
 from kivy.logger import Logger
 from kivy.core.window import Window
 
+from src.core.controller import AppController
+from src.core.startup import StagedStartup, StartupReport, core_stages, mark_first_processed
+from src.ui.main_screen import MainScreen
+
+# Версия для истории отчетов запуска (как в buildozer.spec)
+APP_VERSION = '1.0.0'
+
 class MotionTrackerApp(App):
-    """Простое приложение Motion Tracker для Android"""
-    
+    """Приложение Motion Tracker для Android"""
+
     def build(self):
         """Создание основного интерфейса приложения"""
-        Logger.info("MotionTracker: Запуск простого приложения")
-        
+        Logger.info("MotionTracker: Запуск приложения")
+        self.report = StartupReport()
+
         # Настройка окна
         Window.clearcolor = (0.1, 0.1, 0.1, 1)
-        
-        # Создание главного экрана
-        layout = BoxLayout(orientation='vertical', padding=10, spacing=10)
-        
-        # Заголовок
-        title = Label(
-            text='Motion Tracker',
-            font_size='24sp',
-            bold=True,
-            color=(1, 1, 1, 1),
-            size_hint_y=0.2
-        )
-        layout.add_widget(title)
-        
-        # Кнопки
-        button_layout = BoxLayout(orientation='horizontal', size_hint_y=0.3, spacing=10)
-        
-        start_btn = Button(
-            text='СТАРТ',
-            background_color=(0, 0.7, 0, 1),
-            font_size='18sp',
-            bold=True
-        )
-        start_btn.bind(on_press=self.toggle_tracking)
-        self.start_btn = start_btn
-        button_layout.add_widget(start_btn)
-        
-        reset_btn = Button(
-            text='СБРОС',
-            background_color=(0.7, 0.7, 0, 1),
-            font_size='18sp',
-            bold=True
-        )
-        reset_btn.bind(on_press=self.reset_tracking)
-        button_layout.add_widget(reset_btn)
-        
-        layout.add_widget(button_layout)
-        
-        # Статус
-        self.status_label = Label(
-            text='Готов к работе',
-            font_size='16sp',
-            color=(0.8, 0.8, 0.8, 1),
-            size_hint_y=0.2
-        )
-        layout.add_widget(self.status_label)
-        
-        # Информация
-        info_label = Label(
-            text='Простое приложение для тестирования\nсборки Android APK',
-            font_size='14sp',
-            color=(0.6, 0.6, 0.6, 1),
-            size_hint_y=0.3
+
+        # Главный экран без камеры: OpenCV и numpy еще не загружены
+        self.screen = MainScreen()
+        # Трекер, камера и OTG: кнопки экрана работают через контроллер
+        self.controller = AppController(self.screen)
+        self.screen.controller = self.controller
+        self.startup = StagedStartup(
+            core_stages(self.report),
+            self.report,
+            on_progress=self.screen.set_loading_progress,
+            on_ready=self._on_core_ready,
+            on_error=self._on_core_error
         )
-        layout.add_widget(info_label)
-        
-        return layout
-    
-    def toggle_tracking(self, instance):
-        """Переключение трекинга"""
-        if self.start_btn.text == 'СТАРТ':
-            self.start_btn.text = 'СТОП'
-            self.start_btn.background_color = (0.7, 0, 0, 1)
-            self.status_label.text = 'Трекинг: АКТИВЕН'
-            Logger.info("MotionTracker: Трекинг запущен")
-        else:
-            self.start_btn.text = 'СТАРТ'
-            self.start_btn.background_color = (0, 0.7, 0, 1)
-            self.status_label.text = 'Трекинг: ОСТАНОВЛЕН'
-            Logger.info("MotionTracker: Трекинг остановлен")
-    
-    def reset_tracking(self, instance):
-        """Сброс трекинга"""
-        self.start_btn.text = 'СТАРТ'
-        self.start_btn.background_color = (0, 0.7, 0, 1)
-        self.status_label.text = 'Трекинг: СБРОШЕН'
-        Logger.info("MotionTracker: Трекинг сброшен")
-    
+        return self.screen
+
     def on_start(self):
         """Вызывается при запуске приложения"""
+        self.report.mark('ui_ready')
+        # Загрузка ядра после отрисовки первого кадра интерфейса
+        Clock.schedule_once(lambda dt: self.startup.start(), 0)
         Logger.info("MotionTracker: Приложение запущено")
-    
+
+    def _on_core_ready(self, results: dict):
+        """OpenCV и трекер загружены (поток интерфейса)"""
+        tracker = results['tracker']
+        # Отметка приходит из потока трекера: запись отчета - в потоке интерфейса
+        mark_first_processed(tracker, self.report,
+                             lambda report: Clock.schedule_once(lambda dt: self._save_report(report)))
+        if self.controller.attach_tracker(tracker) and self.screen.camera_widget:
+            self.screen.camera_widget.bind(texture=self._on_first_frame)
+        self.screen.enable_features()
+
+    def _on_core_error(self, stage: str, error: Exception):
+        """Ошибка фоновой загрузки"""
+        self.screen.set_loading_progress(f'ошибка ({stage})', self.startup.progress)
+
+    def _on_first_frame(self, instance, texture):
+        """Первый кадр камеры на экране: отчет запуска готов"""
+        if texture is None:
+            return
+        instance.unbind(texture=self._on_first_frame)
+        self.report.mark('first_frame')
+        self._save_report(self.report)
+
+    def _save_report(self, report: StartupReport):
+        """Запись отчета запуска (повторная запись обновляет отчет этого запуска)"""
+        Logger.info(f"MotionTracker: Время запуска: {report.summary()}")
+        report.save(os.path.join(self.user_data_dir, 'startup_report.json'), APP_VERSION)
+
     def on_pause(self):
         """Вызывается при паузе приложения"""
+        # Камера и потоки не работают в фоне
+        self.controller.pause()
         Logger.info("MotionTracker: Приложение приостановлено")
         return True
-    
+
     def on_resume(self):
         """Вызывается при возобновлении приложения"""
+        self.controller.resume()
         Logger.info("MotionTracker: Приложение возобновлено")
 
+    def on_stop(self):
+        """Вызывается при завершении приложения"""
+        self.controller.shutdown()
+
 if __name__ == '__main__':
-    MotionTrackerApp().run()
\ No newline at end of file
+    MotionTrackerApp().run()
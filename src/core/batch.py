@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Пакетная обработка записей без окна Kivy
+Повторный анализ видеофайлов и последовательностей изображений
+
+Запуск: python -m src.core.batch clip1.mp4 clip2.mp4 --workers 4 --frames
+"""
+
+import os
+
+# Kivy разбирает sys.argv при импорте; в пакетном режиме аргументы принадлежат нам
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+import argparse
+import json
+import multiprocessing
+import queue
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List, Optional
+
+from kivy.logger import Logger
+
+from .motion_tracker import MotionTracker
+from .frame_sources import FrameSource, open_source
+
+def configure_tracker(tracker: MotionTracker, options: Dict):
+    """Применение настроек детекции из словаря options"""
+    tracker.set_detector(options.get('detector', 'mog2'))
+    tracker.set_sensitivity(options.get('sensitivity', 50))
+    tracker.set_min_area(options.get('min_area', 500))
+    tracker.set_processing_scale(options.get('scale', 1.0), options.get('coarse_to_fine'))
+
+def process_source(source: FrameSource, tracker: MotionTracker) -> Iterator[Dict]:
+    """Обработка всех кадров источника так быстро, как позволяет CPU"""
+    if not tracker.set_source(source):
+        return
+
+    index = 0
+    while source.has_frame():
+        result = tracker.process_next_frame()
+        if result is None:
+            continue
+
+        snapshot = tracker.stats
+        yield {
+            'frame': index,
+            'position_ms': round(source.position_ms, 1),
+            'motion': result.motion_detected,
+            'blob_count': len(result.blobs),
+            'blobs': [[int(b['x']), int(b['y']), int(b['w']), int(b['h']), float(b['area'])]
+                      for b in result.blobs],
+            'active_sectors': list(snapshot.active_sectors),
+            'track_ids': snapshot.tracks['id'].tolist()
+        }
+        index += 1
+
+    source.close()
+
+RecordCallback = Callable[[Dict], None]
+
+def process_file(path: str, options: Optional[Dict] = None,
+                 on_record: Optional[RecordCallback] = None) -> Dict:
+    """Обработка одного файла; возвращает сводку
+
+    Покадровые результаты передаются on_record по мере получения,
+    не накапливаясь в памяти.
+    """
+    options = options or {}
+    summary = {'path': path, 'frames': 0, 'motion_frames': 0, 'motion_events': 0}
+
+    source = open_source(path, fps=options.get('fps', 30.0))
+    if source is None:
+        summary['error'] = 'не удалось открыть источник'
+        return summary
+
+    tracker = MotionTracker()
+    configure_tracker(tracker, options)
+
+    previous_motion = False
+    start = time.perf_counter()
+
+    for record in process_source(source, tracker):
+        summary['frames'] += 1
+        if record['motion']:
+            summary['motion_frames'] += 1
+            if not previous_motion:
+                summary['motion_events'] += 1
+        previous_motion = record['motion']
+        if on_record is not None:
+            record['path'] = path
+            on_record(record)
+
+    elapsed = time.perf_counter() - start
+    summary['elapsed_s'] = round(elapsed, 3)
+    summary['fps'] = round(summary['frames'] / elapsed, 1) if elapsed > 0 else 0.0
+    return summary
+
+def _process_file_to_queue(path: str, options: Optional[Dict], records) -> Dict:
+    """Обработка файла в процессе пула: кадры уходят в очередь родителя"""
+    return process_file(path, options, records.put)
+
+def _file_summary(future, path: str) -> Dict:
+    try:
+        return future.result()
+    except Exception as e:
+        Logger.error(f"Batch: Ошибка обработки {path}: {e}")
+        return {'path': path, 'error': str(e)}
+
+def process_files(paths: List[str], options: Optional[Dict] = None, workers: int = 1,
+                  on_record: Optional[RecordCallback] = None) -> Iterator[Dict]:
+    """Обработка набора файлов, при workers > 1 - в пуле процессов
+
+    Сводки возвращаются по завершении файлов; покадровые результаты
+    передаются on_record в этом процессе, пока файлы обрабатываются.
+    """
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield process_file(path, options, on_record)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        if on_record is None:
+            futures = {executor.submit(process_file, path, options): path for path in paths}
+            for future in as_completed(futures):
+                yield _file_summary(future, futures[future])
+            return
+
+        # Кадры из процессов пула идут через очередь менеджера, а не
+        # копятся в сводке до конца файла
+        with multiprocessing.Manager() as manager:
+            records = manager.Queue()
+            futures = {executor.submit(_process_file_to_queue, path, options, records): path
+                       for path in paths}
+            while futures:
+                # Кадры файла попадают в очередь до завершения его задачи:
+                # очередь дочитывается до выдачи сводки
+                done = [future for future in futures if future.done()]
+                try:
+                    while True:
+                        on_record(records.get(block=not done, timeout=0.1))
+                except queue.Empty:
+                    pass
+                for future in done:
+                    yield _file_summary(future, futures.pop(future))
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Пакетная детекция движения в записях')
+    parser.add_argument('paths', nargs='+', help='видеофайлы, каталоги или glob-шаблоны изображений')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--detector', default='mog2')
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--coarse-to-fine', action='store_true')
+    parser.add_argument('--min-area', type=int, default=500)
+    parser.add_argument('--sensitivity', type=int, default=50)
+    parser.add_argument('--fps', type=float, default=30.0, help='FPS для последовательностей изображений')
+    parser.add_argument('--frames', action='store_true', help='выводить покадровые результаты')
+    args = parser.parse_args(argv)
+
+    options = {
+        'detector': args.detector,
+        'scale': args.scale,
+        'coarse_to_fine': args.coarse_to_fine,
+        'min_area': args.min_area,
+        'sensitivity': args.sensitivity,
+        'fps': args.fps
+    }
+
+    # Результаты - JSON по строке на кадр (по мере обработки) и на файл
+    on_record = None
+    if args.frames:
+        on_record = lambda record: print(json.dumps(record, ensure_ascii=False))
+
+    failed = False
+    for summary in process_files(args.paths, options, args.workers, on_record):
+        print(json.dumps(summary, ensure_ascii=False))
+        failed |= 'error' in summary
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
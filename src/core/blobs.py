@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Векторная оценка маски переднего плана
+Пятна движения одним структурированным массивом вместо цикла по контурам
+"""
+
+import numpy as np
+from typing import Optional, Tuple
+
+try:
+    import cv2
+except ImportError:
+    # Без OpenCV компоненты связности ищутся на NumPy (медленнее)
+    cv2 = None
+
+# Пятно движения в координатах полного разрешения кадра
+BLOB_DTYPE = np.dtype([
+    ('x', np.int32),      # Левый верхний угол рамки
+    ('y', np.int32),
+    ('w', np.int32),      # Размер рамки
+    ('h', np.int32),
+    ('area', np.float32),  # Площадь в пикселях полного разрешения
+    ('cx', np.float32),   # Центр масс
+    ('cy', np.float32)
+])
+
+EMPTY_BLOBS = np.zeros(0, dtype=BLOB_DTYPE)
+EMPTY_BLOBS.flags.writeable = False
+
+# Столбцы статистики компонент (как cv2.CC_STAT_*)
+STAT_LEFT, STAT_TOP, STAT_WIDTH, STAT_HEIGHT, STAT_AREA = range(5)
+
+def connected_components(mask: np.ndarray, connectivity: int = 8) -> Tuple[int, np.ndarray, np.ndarray]:
+    """connectedComponentsWithStats на NumPy: число меток, статистика, центры
+
+    Маска разбивается на серии ненулевых пикселей по строкам; серии
+    соседних строк, касающиеся друг друга, объединяются (union-find).
+    Метка 0 - фон; порядок остальных меток может отличаться от OpenCV.
+    """
+    height, width = mask.shape
+    padded = np.zeros((height, width + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask > 0
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    ends = np.nonzero(edges == -1)[1]  # Конец серии (не включая)
+    runs = len(starts)
+
+    # Серии предыдущей строки, касающиеся каждой серии: ключ строка*stride + столбец
+    # упорядочен так же, как серии, а диапазон поиска не выходит за строку
+    stride = width + 2
+    reach = 1 if connectivity == 8 else 0
+    start_keys = rows * stride + starts
+    end_keys = rows * stride + ends
+    first = np.searchsorted(end_keys, start_keys - stride - reach, side='right')
+    last = np.searchsorted(start_keys, end_keys - stride + reach, side='left')
+    counts = np.maximum(last - first, 0)
+    lower = np.repeat(np.arange(runs), counts)
+    upper = (np.repeat(first, counts) + np.arange(counts.sum()) -
+             np.repeat(np.cumsum(counts) - counts, counts))
+
+    # Объединение: корень с большим номером подвешивается к меньшему
+    parent = np.arange(runs)
+    while len(lower):
+        a = parent[lower]
+        b = parent[upper]
+        pending = a != b
+        if not pending.any():
+            break
+        np.minimum.at(parent, np.maximum(a, b)[pending], np.minimum(a, b)[pending])
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+
+    roots, component = np.unique(parent, return_inverse=True)
+    count = len(roots) + 1
+    lengths = ends - starts
+
+    stats = np.zeros((count, 5), dtype=np.int32)
+    centroids = np.zeros((count, 2), dtype=np.float64)
+    left = np.full(count - 1, width)
+    top = np.full(count - 1, height)
+    right = np.zeros(count - 1, dtype=np.intp)
+    bottom = np.zeros(count - 1, dtype=np.intp)
+    np.minimum.at(left, component, starts)
+    np.maximum.at(right, component, ends)
+    np.minimum.at(top, component, rows)
+    np.maximum.at(bottom, component, rows)
+    area = np.bincount(component, lengths, minlength=count - 1)
+
+    stats[0] = (0, 0, width, height, height * width - int(lengths.sum()))
+    stats[1:, STAT_LEFT] = left
+    stats[1:, STAT_TOP] = top
+    stats[1:, STAT_WIDTH] = right - left
+    stats[1:, STAT_HEIGHT] = bottom - top + 1
+    stats[1:, STAT_AREA] = area
+    if count > 1:
+        centroids[1:, 0] = np.bincount(component, lengths * (starts + ends - 1) / 2.0) / area
+        centroids[1:, 1] = np.bincount(component, lengths * rows) / area
+    return count, stats, centroids
+
+class BlobExtractor:
+    """Поиск пятен движения через connectedComponentsWithStats (без OpenCV - на NumPy)"""
+
+    def __init__(self, connectivity: int = 8):
+        self.connectivity = connectivity
+        self._labels: Optional[np.ndarray] = None
+
+    def extract(self, mask: np.ndarray, min_area: float, scale: float = 1.0) -> np.ndarray:
+        """Пятна с площадью больше min_area (в пикселях полного разрешения)"""
+        area_factor = 1.0 / (scale * scale)
+
+        # Быстрый путь: если переднего плана меньше min_area, пятен быть не может
+        if np.count_nonzero(mask) * area_factor <= min_area:
+            return EMPTY_BLOBS
+
+        if cv2 is None:
+            count, stats, centroids = connected_components(mask, self.connectivity)
+        else:
+            if self._labels is None or self._labels.shape != mask.shape:
+                self._labels = np.empty(mask.shape, dtype=np.int32)
+            count, _, stats, centroids = cv2.connectedComponentsWithStats(
+                mask, labels=self._labels, connectivity=self.connectivity, ltype=cv2.CV_32S)
+
+        # Метка 0 - фон
+        stats = stats[1:count]
+        centroids = centroids[1:count]
+        areas = stats[:, STAT_AREA] * area_factor
+        keep = areas > min_area
+
+        blobs = np.empty(int(keep.sum()), dtype=BLOB_DTYPE)
+        inverse = 1.0 / scale
+        blobs['x'] = stats[keep, STAT_LEFT] * inverse
+        blobs['y'] = stats[keep, STAT_TOP] * inverse
+        blobs['w'] = stats[keep, STAT_WIDTH] * inverse
+        blobs['h'] = stats[keep, STAT_HEIGHT] * inverse
+        blobs['area'] = areas[keep]
+        blobs['cx'] = centroids[keep, 0] * inverse
+        blobs['cy'] = centroids[keep, 1] * inverse
+        return blobs
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Контроллер приложения
+Владеет трекером, камерой и OTG менеджером, ведет их жизненный цикл по
+событиям приложения и передает результаты экрану одним каналом обновлений
+"""
+
+from typing import List, Optional, Tuple
+from kivy.logger import Logger
+
+class AppController:
+    """Связь главного экрана с MotionTracker и OTGManager
+
+    Экран вызывает команды контроллера (поток интерфейса). Снимки трекера
+    и события устройств приходят из их потоков и передаются экрану только
+    через его UIUpdater (update_detection, update_otg_status, set_tracking).
+    OTG менеджер создается при первом обращении; автоматически подключаются
+    только ESP32, USB камера открывается по запросу use_otg_camera. На паузе приложения
+    потоки останавливаются и камера освобождается, при возобновлении
+    восстанавливается прежнее состояние.
+    """
+
+    def __init__(self, screen, camera_index: int = 0, resolution: Tuple[int, int] = (640, 480)):
+        self.screen = screen
+        self.camera_index = camera_index
+        self.resolution = resolution
+        self.tracker = None
+        self.camera_source = None
+        self.otg_manager = None
+        self.otg_camera_id: Optional[str] = None  # USB камера - источник трекера; None - камера устройства
+        self.sensitivity = 50
+
+        # Состояние до паузы приложения
+        self.is_paused = False
+        self.resume_tracking = False
+        self.resume_otg = False
+        self.resume_devices: List[str] = []  # Устройства OTG, подключенные до паузы
+
+    @property
+    def is_tracking(self) -> bool:
+        return self.tracker is not None and self.tracker.is_running
+
+    def attach_tracker(self, tracker) -> bool:
+        """Трекер создан фоновой загрузкой: подписка и запуск камеры"""
+        self.tracker = tracker
+        tracker.set_sensitivity(self.sensitivity)
+        tracker.add_stats_listener(self._on_tracker_stats)
+        if self.is_paused:
+            # Загрузка завершилась в фоне: камера откроется при возобновлении
+            return True
+        return self._open_camera()
+
+    def _open_camera(self) -> bool:
+        """Камера устройства как источник трекера и изображение экрана"""
+        if self.camera_source is None:
+            from .frame_sources import KivyCameraSource
+            self.camera_source = KivyCameraSource(index=self.camera_index, resolution=self.resolution)
+
+        if not self.tracker.set_source(self.camera_source):
+            Logger.error(f"AppController: Не удалось открыть камеру {self.camera_index}")
+            self.screen.set_camera_status(False)
+            return False
+
+        # Экран показывает ту же камеру, что читает трекер
+        self.screen.attach_camera(self.camera_source.camera)
+        self.screen.set_camera_status(True)
+        return True
+
+    def _open_source(self) -> bool:
+        """Источник трекера: выбранная USB камера или камера устройства"""
+        if self.otg_camera_id is not None:
+            source = self.otg_manager.get_camera_source(self.otg_camera_id) if self.otg_manager else None
+            if source is not None and self.tracker.set_source(source):
+                return True
+            Logger.warning("AppController: USB камера недоступна, источник - камера устройства")
+            self.otg_camera_id = None
+        return self._open_camera()
+    
+    def _switch_source(self, select) -> bool:
+        """Смена источника трекера с перезапуском трекинга"""
+        was_tracking = self.is_tracking
+        if was_tracking:
+            self.tracker.stop()
+        selected = select()
+        if was_tracking:
+            self.tracker.start()
+        self.screen.set_tracking(self.is_tracking)
+        return selected
+    
+    def use_otg_camera(self, device_id: Optional[str] = None) -> bool:
+        """USB камера OTG (по умолчанию первая найденная) как источник трекера
+        
+        Источник камеры сразу запускает захват и декодирование, поэтому
+        камера подключается только здесь, а не при обнаружении.
+        """
+        if self.tracker is None:
+            Logger.warning("AppController: Трекер еще загружается")
+            return False
+        manager = self.get_otg_manager()
+        if device_id is None:
+            cameras = manager.registry.of_type('camera')
+            if not cameras:
+                Logger.warning("AppController: USB камера не найдена")
+                return False
+            device_id = cameras[0].device_id
+        
+        source = manager.get_camera_source(device_id)
+        if source is None and manager.connect_device(device_id):
+            source = manager.get_camera_source(device_id)
+        if source is None:
+            Logger.error(f"AppController: Не удалось подключить USB камеру {device_id}")
+            return False
+        
+        def select() -> bool:
+            if not self.tracker.set_source(source):
+                return False
+            self.otg_camera_id = device_id
+            return True
+        return self._switch_source(select)
+    
+    def use_device_camera(self) -> bool:
+        """Возврат к камере устройства; USB камера отключается"""
+        if self.tracker is None or self.otg_camera_id is None:
+            return False
+        camera_id, self.otg_camera_id = self.otg_camera_id, None
+        selected = self._switch_source(self._open_camera)
+        self.otg_manager.disconnect_device(camera_id, by_user=False)
+        return selected
+    
+    def _on_tracker_stats(self, snapshot):
+        """Снимок статистики с пятнами и треками кадра (поток публикации трекера)"""
+        self.screen.update_detection(snapshot)
+
+    def start_tracking(self) -> bool:
+        """Запуск трекинга"""
+        if self.tracker is None:
+            Logger.warning("AppController: Трекер еще загружается")
+            return False
+        if self.camera_source is None and not self._open_camera():
+            return False
+
+        started = self.tracker.start()
+        self.screen.set_tracking(self.is_tracking)
+        return started
+
+    def stop_tracking(self):
+        """Остановка трекинга; изображение камеры остается на экране"""
+        if not self.is_tracking:
+            return
+        self.tracker.stop()
+        # Трекер закрывает источник при остановке: предпросмотр продолжается
+        if self.camera_source:
+            self.camera_source.open()
+        self.screen.set_tracking(False)
+
+    def toggle_tracking(self) -> bool:
+        """Переключение трекинга; возвращает новое состояние"""
+        if self.is_tracking:
+            self.stop_tracking()
+        else:
+            self.start_tracking()
+        return self.is_tracking
+
+    def reset(self) -> bool:
+        """Остановка трекинга и сброс модели фона, треков и статистики"""
+        if self.tracker is None:
+            return False
+        self.stop_tracking()
+        return self.tracker.reset()
+
+    def calibrate(self) -> bool:
+        """Новая модель фона: текущая сцена считается неподвижной
+
+        Во время трекинга движок меняет стадия детекции перед следующим
+        кадром, а снимок статистики публикует стадия публикации.
+        """
+        if self.tracker is None:
+            Logger.warning("AppController: Трекер еще загружается")
+            return False
+        return self.tracker.set_detector(self.tracker.detector_name)
+
+    def set_sensitivity(self, value: int):
+        """Чувствительность детекции (0-100), в том числе до загрузки трекера"""
+        self.sensitivity = max(0, min(100, int(value)))
+        if self.tracker is not None:
+            self.tracker.set_sensitivity(self.sensitivity)
+
+    def get_otg_manager(self):
+        """OTG менеджер создается и запускается при первом обращении"""
+        if self.otg_manager is None:
+            from .otg_manager import OTGManager
+            self.otg_manager = OTGManager()
+            self.otg_manager.add_device_listener(self._on_device_event)
+            if not self.is_paused:
+                self.otg_manager.start_monitoring()
+        return self.otg_manager
+
+    def get_otg_devices(self) -> List:
+        """Устройства в реестре OTG (запускает мониторинг)"""
+        return self.get_otg_manager().registry.snapshot()
+
+    def _on_device_event(self, event: str, device):
+        """Событие реестра OTG (поток мониторинга или hotplug)"""
+        # USB камеры не подключаются сами: их источник тратит CPU на захват
+        if (event == 'attached' and device.device_type == 'esp32' and
+                not self.otg_manager.is_user_disconnected(device.device_id)):
+            self.otg_manager.connect_device(device.device_id)
+        self.screen.update_otg_status(self.otg_manager.get_connected_devices())
+
+    def pause(self):
+        """Пауза приложения: остановка потоков и освобождение камеры"""
+        if self.is_paused:
+            return
+        self.is_paused = True
+        self.resume_tracking = self.is_tracking
+
+        if self.tracker is not None:
+            self.tracker.stop()
+        if self.camera_source is not None:
+            self.camera_source.release()
+
+        otg_manager = self.otg_manager
+        self.resume_otg = otg_manager is not None and otg_manager.is_monitoring
+        if self.resume_otg:
+            self.resume_devices = [device.device_id for device in otg_manager.get_connected_devices()]
+            otg_manager.stop_monitoring()
+            # Отключение на время паузы, а не по запросу пользователя
+            otg_manager.disconnect_all(by_user=False)
+
+        Logger.info("AppController: Приостановлено")
+
+    def resume(self):
+        """Возобновление: камера, трекинг и OTG в состоянии до паузы"""
+        if not self.is_paused:
+            return
+        self.is_paused = False
+
+        if self.resume_otg:
+            # Устройства остаются в реестре: переподключаем бывшие подключенными
+            # (в том числе выбранную USB камеру - до открытия источника трекера)
+            for device_id in self.resume_devices:
+                self.otg_manager.connect_device(device_id)
+            self.resume_devices = []
+            self.otg_manager.start_monitoring()
+            self.screen.update_otg_status(self.otg_manager.get_connected_devices())
+
+        if self.tracker is not None and self._open_source() and self.resume_tracking:
+            self.tracker.start()
+        self.screen.set_tracking(self.is_tracking)
+
+        Logger.info("AppController: Возобновлено")
+
+    def shutdown(self):
+        """Завершение приложения"""
+        if self.tracker is not None:
+            self.tracker.stop()
+            self.tracker.remove_stats_listener(self._on_tracker_stats)
+        if self.camera_source is not None:
+            self.camera_source.release()
+        if self.otg_manager is not None:
+            self.otg_manager.stop_monitoring()
+            self.otg_manager.disconnect_all(by_user=False)
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Движки детекции движения
+Реестр взаимозаменяемых детекторов с публикацией стоимости кадра
+"""
+
+import time
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Sequence
+from kivy.logger import Logger
+
+try:
+    import cv2
+except ImportError:
+    # Сборки без OpenCV (как main_simple.py) используют только NumPy движки
+    cv2 = None
+
+# Реестр движков: имя -> класс
+DETECTOR_REGISTRY: Dict[str, type] = {}
+
+# Порядок предпочтения по качеству детекции (от лучшего к худшему)
+DEFAULT_PREFERENCE = ('mog2', 'knn', 'running_avg', 'diff')
+
+def register_detector(cls):
+    """Декоратор регистрации движка детекции"""
+    DETECTOR_REGISTRY[cls.name] = cls
+    return cls
+
+class MotionDetector:
+    """Базовый интерфейс движка детекции движения"""
+
+    name = 'base'
+    title = 'Base'
+    needs_color = False      # Требуется ли цветной кадр
+    requires_opencv = False  # Требуется ли OpenCV
+
+    # Коэффициент сглаживания средней стоимости кадра
+    COST_SMOOTHING = 0.1
+
+    def __init__(self, sensitivity: int = 50):
+        self.sensitivity = sensitivity
+        self.cost_ms = 0.0  # Сглаженная стоимость обработки кадра, мс
+        self.frames = 0
+        self.set_sensitivity(sensitivity)
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """Доступен ли движок в текущей сборке"""
+        return cv2 is not None or not cls.requires_opencv
+
+    def apply(self, frame: np.ndarray) -> np.ndarray:
+        """Получение маски переднего плана с учетом стоимости кадра"""
+        start = time.perf_counter()
+        mask = self._apply(frame)
+        elapsed = (time.perf_counter() - start) * 1000.0
+
+        if self.frames == 0:
+            self.cost_ms = elapsed
+        else:
+            self.cost_ms += (elapsed - self.cost_ms) * self.COST_SMOOTHING
+        self.frames += 1
+        return mask
+
+    def _apply(self, frame: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def set_sensitivity(self, sensitivity: int):
+        """Установка чувствительности (0-100)"""
+        self.sensitivity = max(0, min(100, sensitivity))
+
+    def reset(self):
+        """Сброс модели фона"""
+        self.frames = 0
+        self.cost_ms = 0.0
+
+    @property
+    def max_fps(self) -> float:
+        """Максимальный FPS, который позволяет стоимость кадра"""
+        return 1000.0 / self.cost_ms if self.cost_ms > 0 else float('inf')
+
+@register_detector
+class MOG2Detector(MotionDetector):
+    """Смесь гауссиан MOG2 (OpenCV)"""
+
+    name = 'mog2'
+    title = 'MOG2'
+    requires_opencv = True
+
+    def __init__(self, sensitivity: int = 50):
+        self.subtractor = None
+        self._mask: Optional[np.ndarray] = None
+        super().__init__(sensitivity)
+        self.reset()
+
+    def _apply(self, frame: np.ndarray) -> np.ndarray:
+        if self._mask is None or self._mask.shape != frame.shape[:2]:
+            self._mask = np.empty(frame.shape[:2], dtype=np.uint8)
+        return self.subtractor.apply(frame, fgmask=self._mask)
+
+    def _threshold(self) -> int:
+        return int(50 * (100 - self.sensitivity) / 100)
+
+    def set_sensitivity(self, sensitivity: int):
+        super().set_sensitivity(sensitivity)
+        if self.subtractor is not None:
+            self.subtractor.setVarThreshold(self._threshold())
+
+    def reset(self):
+        super().reset()
+        self.subtractor = cv2.createBackgroundSubtractorMOG2(
+            detectShadows=True,
+            varThreshold=50
+        )
+        self.subtractor.setVarThreshold(self._threshold())
+
+@register_detector
+class KNNDetector(MotionDetector):
+    """Вычитание фона методом k ближайших соседей (OpenCV)"""
+
+    name = 'knn'
+    title = 'KNN'
+    requires_opencv = True
+
+    def __init__(self, sensitivity: int = 50):
+        self.subtractor = None
+        self._mask: Optional[np.ndarray] = None
+        super().__init__(sensitivity)
+        self.reset()
+
+    def _apply(self, frame: np.ndarray) -> np.ndarray:
+        if self._mask is None or self._mask.shape != frame.shape[:2]:
+            self._mask = np.empty(frame.shape[:2], dtype=np.uint8)
+        return self.subtractor.apply(frame, fgmask=self._mask)
+
+    def _threshold(self) -> float:
+        # 400 (значение OpenCV по умолчанию) при чувствительности 50%
+        return max(1.0, 800.0 * (100 - self.sensitivity) / 100)
+
+    def set_sensitivity(self, sensitivity: int):
+        super().set_sensitivity(sensitivity)
+        if self.subtractor is not None:
+            self.subtractor.setDist2Threshold(self._threshold())
+
+    def reset(self):
+        super().reset()
+        self.subtractor = cv2.createBackgroundSubtractorKNN(detectShadows=True)
+        self.subtractor.setDist2Threshold(self._threshold())
+
+@register_detector
+class FrameDiffDetector(MotionDetector):
+    """Разница соседних кадров (дешевый движок OpenCV)"""
+
+    name = 'diff'
+    title = 'DIFF'
+    requires_opencv = True
+
+    def __init__(self, sensitivity: int = 50):
+        self.threshold = 25
+        self._previous: Optional[np.ndarray] = None
+        self._gray: Optional[np.ndarray] = None
+        self._diff: Optional[np.ndarray] = None
+        self._mask: Optional[np.ndarray] = None
+        super().__init__(sensitivity)
+
+    def _to_gray(self, frame: np.ndarray) -> np.ndarray:
+        if frame.ndim == 2:
+            return frame
+        code = cv2.COLOR_BGR2GRAY if frame.shape[2] == 3 else cv2.COLOR_RGBA2GRAY
+        return cv2.cvtColor(frame, code, dst=self._gray)
+
+    def _apply(self, frame: np.ndarray) -> np.ndarray:
+        shape = frame.shape[:2]
+        if self._mask is None or self._mask.shape != shape:
+            self._gray = np.empty(shape, dtype=np.uint8)
+            self._diff = np.empty(shape, dtype=np.uint8)
+            self._mask = np.zeros(shape, dtype=np.uint8)
+            self._previous = np.empty(shape, dtype=np.uint8)
+            np.copyto(self._previous, self._to_gray(frame))
+            return self._mask
+
+        gray = self._to_gray(frame)
+        cv2.absdiff(gray, self._previous, dst=self._diff)
+        cv2.threshold(self._diff, self.threshold, 255, cv2.THRESH_BINARY, dst=self._mask)
+        np.copyto(self._previous, gray)
+        return self._mask
+
+    def set_sensitivity(self, sensitivity: int):
+        super().set_sensitivity(sensitivity)
+        self.threshold = max(1, int(50 * (100 - self.sensitivity) / 100))
+
+    def reset(self):
+        super().reset()
+        self._mask = None
+
+@register_detector
+class RunningAverageDetector(MotionDetector):
+    """Скользящее среднее фона на чистом NumPy (без OpenCV)"""
+
+    name = 'running_avg'
+    title = 'AVG'
+
+    def __init__(self, sensitivity: int = 50, alpha: float = 0.05):
+        self.alpha = alpha  # Скорость обновления фона
+        self.threshold = 25.0
+        self._background: Optional[np.ndarray] = None
+        self._diff: Optional[np.ndarray] = None
+        self._magnitude: Optional[np.ndarray] = None
+        self._foreground: Optional[np.ndarray] = None
+        self._mask: Optional[np.ndarray] = None
+        super().__init__(sensitivity)
+
+    def _apply(self, frame: np.ndarray) -> np.ndarray:
+        if frame.ndim == 3:
+            # Цвет не нужен: берем зеленый канал (BGR и RGBA) как представление
+            frame = frame[:, :, 1]
+
+        shape = frame.shape
+        if self._background is None or self._background.shape != shape:
+            self._background = frame.astype(np.float32)
+            self._diff = np.empty(shape, dtype=np.float32)
+            self._magnitude = np.empty(shape, dtype=np.float32)
+            self._foreground = np.empty(shape, dtype=bool)
+            self._mask = np.zeros(shape, dtype=np.uint8)
+            return self._mask
+
+        # diff = frame - background; background += alpha * diff
+        np.subtract(frame, self._background, out=self._diff)
+        np.abs(self._diff, out=self._magnitude)
+        np.greater(self._magnitude, self.threshold, out=self._foreground)
+        self._diff *= self.alpha
+        self._background += self._diff
+        np.multiply(self._foreground, 255, out=self._mask, casting='unsafe')
+        return self._mask
+
+    def set_sensitivity(self, sensitivity: int):
+        super().set_sensitivity(sensitivity)
+        self.threshold = max(1.0, 50.0 * (100 - self.sensitivity) / 100)
+
+    def reset(self):
+        super().reset()
+        self._background = None
+
+def available_detectors() -> List[str]:
+    """Имена движков, доступных в текущей сборке"""
+    return [name for name, cls in DETECTOR_REGISTRY.items() if cls.is_available()]
+
+def default_detector(preference: Sequence[str] = DEFAULT_PREFERENCE) -> str:
+    """Лучший по порядку предпочтения движок, доступный в текущей сборке"""
+    available = available_detectors()
+    return next((name for name in preference if name in available), available[0])
+
+def create_detector(name: str, sensitivity: int = 50) -> Optional[MotionDetector]:
+    """Создание движка детекции по имени"""
+    cls = DETECTOR_REGISTRY.get(name)
+    if cls is None:
+        Logger.error(f"Detectors: Неизвестный движок: {name}")
+        return None
+    if not cls.is_available():
+        Logger.error(f"Detectors: Движок {name} недоступен без OpenCV")
+        return None
+    return cls(sensitivity=sensitivity)
+
+def measure_detector_costs(frames: Sequence[np.ndarray],
+                           names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """Измерение стоимости кадра (мс) каждого движка на образцах кадров"""
+    costs = {}
+    for name in names or available_detectors():
+        detector = create_detector(name)
+        if detector is None:
+            continue
+        for frame in frames:
+            detector.apply(frame)
+        costs[name] = detector.cost_ms
+    return costs
+
+def select_detector(costs: Dict[str, float], target_fps: float,
+                    preference: Sequence[str] = DEFAULT_PREFERENCE) -> Optional[str]:
+    """Выбор движка, укладывающегося в целевой FPS
+
+    Из движков, чья стоимость кадра укладывается в бюджет 1000/target_fps мс,
+    выбирается первый по порядку предпочтения; если в бюджет не укладывается
+    ни один, выбирается самый быстрый.
+    """
+    if not costs:
+        return None
+
+    budget_ms = 1000.0 / target_fps if target_fps > 0 else float('inf')
+    for name in preference:
+        if name in costs and costs[name] <= budget_ms:
+            return name
+
+    fastest = min(costs, key=costs.get)
+    Logger.warning(f"Detectors: Ни один движок не укладывается в {target_fps} FPS, "
+                   f"выбран самый быстрый: {fastest}")
+    return fastest
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Реестр OTG устройств с вторичными индексами
+Поиск по типу, состоянию подключения и VID/PID без перебора устройств
+"""
+
+import collections
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+UsbId = Tuple[int, int]
+
+class DeviceMatcher:
+    """Предкомпилированная таблица определения типа устройства
+
+    Порядок типов в конфигурации - приоритет, как при последовательной
+    проверке: точный VID/PID, затем VID, затем подстрока названия продукта.
+    Результаты запоминаются по (VID, PID, продукт).
+    """
+
+    def __init__(self, config: Dict[str, Dict]):
+        self.usb_ids: Dict[UsbId, Tuple[int, str]] = {}
+        self.vendor_ids: Dict[int, Tuple[int, str]] = {}
+        self.cache: Dict[Tuple[int, int, str], Optional[str]] = {}
+        self.priority: Dict[str, int] = {}
+
+        groups = []
+        for priority, (device_type, entry) in enumerate(config.items()):
+            self.priority[device_type] = priority
+            for usb_id in entry.get('usb_ids', ()):
+                self.usb_ids.setdefault(tuple(usb_id), (priority, device_type))
+            for vendor_id in entry.get('vendor_ids', ()):
+                self.vendor_ids.setdefault(vendor_id, (priority, device_type))
+            names = [re.escape(name.lower()) for name in entry.get('product_names', ())]
+            if names:
+                groups.append(f"(?P<g{priority}>{'|'.join(names)})")
+
+        # Все названия одним выражением: группа совпадения - тип устройства
+        self.types = list(config.keys())
+        self.names = re.compile('|'.join(groups)) if groups else None
+
+    def identify(self, vendor_id: int, product_id: int, product: str) -> Optional[str]:
+        key = (vendor_id, product_id, product)
+        if key in self.cache:
+            return self.cache[key]
+
+        exact = self.usb_ids.get((vendor_id, product_id))
+        if exact is not None:
+            device_type = exact[1]
+        else:
+            candidates = []
+            vendor = self.vendor_ids.get(vendor_id)
+            if vendor is not None:
+                candidates.append(vendor)
+            if self.names is not None and product:
+                # Для каждого типа - самое раннее совпадение в строке
+                for match in self.names.finditer(product.lower()):
+                    priority = int(match.lastgroup[1:])
+                    candidates.append((priority, self.types[priority]))
+            device_type = min(candidates)[1] if candidates else None
+
+        if len(self.cache) >= 1024:
+            self.cache.clear()
+        self.cache[key] = device_type
+        return device_type
+
+class DeviceRegistry:
+    """Устройства по device_id и вторичные индексы
+
+    Индексы - словари device_id -> устройство (упорядоченные множества),
+    поэтому добавление, удаление и смена состояния стоят O(1), а выборки -
+    O(размер результата). Порядок last_seen поддерживается перемещением
+    в конец при обновлении, устаревшие устройства находятся с начала.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.devices: Dict[str, object] = {}  # Основной индекс; изменять только через реестр
+        self.by_type: Dict[str, Dict[str, object]] = collections.defaultdict(dict)
+        self.connected_by_type: Dict[str, Dict[str, object]] = collections.defaultdict(dict)
+        self.connected: Dict[str, object] = {}
+        self.by_usb_id: Dict[UsbId, Dict[str, object]] = collections.defaultdict(dict)
+        self.by_last_seen: collections.OrderedDict = collections.OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.devices)
+
+    def __contains__(self, device_id: str) -> bool:
+        return device_id in self.devices
+
+    def get(self, device_id: str):
+        return self.devices.get(device_id)
+
+    def add(self, device) -> bool:
+        """Регистрация устройства; False - device_id уже занят"""
+        with self.lock:
+            if device.device_id in self.devices:
+                return False
+            device_id = device.device_id
+            self.devices[device_id] = device
+            self.by_type[device.device_type][device_id] = device
+            self.by_usb_id[(device.vendor_id, device.product_id)][device_id] = device
+            self.by_last_seen[device_id] = device
+            device.registry = self
+            if device.connected:
+                self._index_connected(device, True)
+            return True
+
+    def remove(self, device_id: str):
+        """Удаление устройства из всех индексов; None - не зарегистрировано"""
+        with self.lock:
+            device = self.devices.pop(device_id, None)
+            if device is None:
+                return None
+            self._discard(self.by_type, device.device_type, device_id)
+            self._discard(self.by_usb_id, (device.vendor_id, device.product_id), device_id)
+            self._index_connected(device, False)
+            del self.by_last_seen[device_id]
+            device.registry = None
+            return device
+
+    @staticmethod
+    def _discard(index: Dict, key, device_id: str):
+        bucket = index.get(key)
+        if bucket is not None:
+            bucket.pop(device_id, None)
+            if not bucket:
+                del index[key]
+
+    def _index_connected(self, device, connected: bool):
+        device_id = device.device_id
+        if connected:
+            self.connected[device_id] = device
+            self.connected_by_type[device.device_type][device_id] = device
+        else:
+            self.connected.pop(device_id, None)
+            self._discard(self.connected_by_type, device.device_type, device_id)
+
+    def set_connected(self, device, connected: bool):
+        """Обновление индекса подключенных (вызывает OTGDevice.connected)"""
+        with self.lock:
+            if self.devices.get(device.device_id) is device:
+                self._index_connected(device, connected)
+
+    def touch(self, device):
+        """Устройство видно на шине: в конец порядка last_seen"""
+        with self.lock:
+            if device.device_id in self.by_last_seen:
+                self.by_last_seen.move_to_end(device.device_id)
+
+    def of_type(self, device_type: str, connected: bool = False) -> List:
+        """Устройства типа (только подключенные при connected)"""
+        index = self.connected_by_type if connected else self.by_type
+        with self.lock:
+            bucket = index.get(device_type)
+            return list(bucket.values()) if bucket else []
+
+    def get_connected(self) -> List:
+        with self.lock:
+            return list(self.connected.values())
+
+    def find(self, vendor_id: int, product_id: int) -> List:
+        """Устройства с данными VID/PID"""
+        with self.lock:
+            bucket = self.by_usb_id.get((vendor_id, product_id))
+            return list(bucket.values()) if bucket else []
+
+    def stale(self, before: float) -> List:
+        """Устройства, не появлявшиеся на шине с момента before (от старых к новым)"""
+        result = []
+        with self.lock:
+            for device in self.by_last_seen.values():
+                if device.last_seen >= before:
+                    break
+                result.append(device)
+        return result
+
+    def snapshot(self) -> List:
+        """Копия списка устройств для перебора без блокировки"""
+        with self.lock:
+            return list(self.devices.values())
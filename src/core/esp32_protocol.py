@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Компактный двоичный протокол команд OTGManager <-> ESP32
+Заголовок struct, тип сообщения, номер, CRC, пакеты команд и подтверждения
+"""
+
+import binascii
+import collections
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Сообщение (полезная нагрузка кадра транспорта):
+#   заголовок <BHB: тип (младшие 4 бита) и флаги (старшие 4 бита),
+#   номер сообщения uint16, число записей; записи; CRC-16/CCITT заголовка и записей
+HEADER = struct.Struct('<BHB')
+CRC = struct.Struct('<H')
+
+# Типы сообщений
+MSG_COMMANDS = 0x1   # Пакет команд приложение -> ESP32
+MSG_ACK = 0x2        # Подтверждение: номер сообщения и статус
+MSG_TELEMETRY = 0x3  # Телеметрия ESP32 (JSON или key=value в теле)
+
+# Флаги
+FLAG_ACK_REQUESTED = 0x1
+
+ACK_BODY = struct.Struct('<HB')
+
+# Команды: код операции (uint8) и параметры фиксированного формата
+OP_PING = 0x01
+OP_MOTION = 0x02   # Состояние движения: 0/1
+OP_TRACK = 0x10    # ID трека uint16, x и y в процентах кадра
+OP_SERVO = 0x11    # Канал, угол в градусах (int16)
+OP_LED = 0x12      # Индекс, R, G, B
+OP_TEXT = 0x7F     # Произвольная текстовая команда: длина uint8 и байты
+
+COMMAND_FORMATS: Dict[int, Tuple[str, struct.Struct]] = {
+    OP_PING: ('PING', struct.Struct('<B')),
+    OP_MOTION: ('MOTION', struct.Struct('<BB')),
+    OP_TRACK: ('TRACK', struct.Struct('<BHBB')),
+    OP_SERVO: ('SERVO', struct.Struct('<BBh')),
+    OP_LED: ('LED', struct.Struct('<BBBBB'))
+}
+OPCODES = {name: opcode for opcode, (name, _) in COMMAND_FORMATS.items()}
+TEXT_HEADER = struct.Struct('<BB')
+MAX_TEXT = 255
+
+# Записей в одном сообщении; больше - делится на несколько сообщений
+MAX_COMMANDS = 64
+MAX_RECORD = TEXT_HEADER.size + MAX_TEXT
+# Байт в сообщении (заголовок, записи, CRC): полезная нагрузка кадра транспорта
+MAX_MESSAGE = 4096
+
+Command = Tuple
+
+class ProtocolError(ValueError):
+    """Поврежденное или неизвестное сообщение"""
+
+class Message:
+    """Разобранное сообщение протокола"""
+
+    __slots__ = ('type', 'flags', 'seq', 'commands', 'body', 'ack_seq', 'status')
+
+    def __init__(self, msg_type: int, flags: int, seq: int):
+        self.type = msg_type
+        self.flags = flags
+        self.seq = seq
+        self.commands: List[Command] = []
+        self.body = b''      # Тело телеметрии
+        self.ack_seq = -1    # Подтверждаемый номер (MSG_ACK)
+        self.status = 0
+
+def parse_text_command(command: str) -> Command:
+    """Текстовая команда ('TRACK:3:50:40') -> кортеж (код, параметры...)
+
+    Текст длиннее MAX_TEXT байт UTF-8 - ProtocolError.
+    """
+    parts = command.split(':')
+    opcode = OPCODES.get(parts[0])
+    if opcode is not None:
+        _, fmt = COMMAND_FORMATS[opcode]
+        # Формат без кода операции: число параметров и их диапазоны
+        if len(parts) - 1 == len(fmt.format) - 2:
+            try:
+                params = tuple(int(value) for value in parts[1:])
+                fmt.pack(opcode, *params)
+                return (opcode,) + params
+            except (ValueError, struct.error):
+                pass
+    text = command.encode('utf-8')
+    if len(text) > MAX_TEXT:
+        # Обрезка могла бы разрезать многобайтовый символ UTF-8
+        raise ProtocolError(f"Текстовая команда длиннее {MAX_TEXT} байт: {len(text)}")
+    return (OP_TEXT, text)
+
+def format_command(command: Command) -> str:
+    """Кортеж команды -> текстовая форма (для журнала и интерфейса)"""
+    if command[0] == OP_TEXT:
+        return command[1].decode('utf-8', errors='replace')
+    name, _ = COMMAND_FORMATS[command[0]]
+    return ':'.join([name] + [str(value) for value in command[1:]])
+
+def record_size(command: Command) -> int:
+    """Размер записи команды в сообщении, байт"""
+    if command[0] == OP_TEXT:
+        return TEXT_HEADER.size + len(command[1])
+    return COMMAND_FORMATS[command[0]][1].size
+
+def command_key(command: Command):
+    """Ключ объединения: команды одного объекта (трек, канал, светодиод) заменяют друг друга"""
+    opcode = command[0]
+    if opcode in (OP_TRACK, OP_SERVO, OP_LED):
+        return opcode, command[1]
+    if opcode == OP_MOTION:
+        return opcode
+    return None
+
+class BinaryCodec:
+    """Кодирование и разбор сообщений с предвыделенным буфером
+
+    Подтверждения: сообщения с FLAG_ACK_REQUESTED хранятся до MSG_ACK;
+    неподтвержденные за ack_timeout команды возвращает expired() для
+    повторной отправки (не более max_retries раз). Команда, чей ключ
+    (command_key) ушел в более позднем сообщении, не повторяется: старое
+    состояние не должно затереть новое.
+    """
+
+    def __init__(self, require_acks: bool = False, ack_timeout: float = 0.5, max_retries: int = 2,
+                 max_message: int = MAX_MESSAGE):
+        self.require_acks = require_acks
+        self.ack_timeout = ack_timeout
+        self.max_retries = max_retries
+        self.max_message = max(max_message, HEADER.size + MAX_RECORD + CRC.size)
+
+        self.buffer = bytearray(HEADER.size + MAX_COMMANDS * MAX_RECORD + CRC.size)
+        self.seq = 0
+
+        # Номер -> (время отправки, пары (команда, попытка)); поток записи
+        # добавляет, поток чтения подтверждает
+        self.unacked: collections.OrderedDict = collections.OrderedDict()
+        self.last_sent: Dict = {}  # Ключ команды -> номер последнего сообщения с ней
+        self.lock = threading.Lock()
+        self.stats = {
+            'messages_sent': 0,
+            'commands_sent': 0,
+            'acked': 0,
+            'retries': 0,
+            'lost': 0,
+            'superseded': 0,
+            'crc_errors': 0,
+            'rtt_ms': 0.0
+        }
+
+    def _next_seq(self) -> int:
+        self.seq = (self.seq + 1) & 0xFFFF
+        return self.seq
+
+    def encode_batch(self, commands: Sequence[Command], flags: int = 0,
+                     seq: Optional[int] = None) -> memoryview:
+        """Пакет до MAX_COMMANDS команд в одно сообщение
+
+        Возвращает представление внутреннего буфера, действительное
+        до следующего вызова кодировщика.
+        """
+        buffer = self.buffer
+        seq = self._next_seq() if seq is None else seq
+        HEADER.pack_into(buffer, 0, MSG_COMMANDS | (flags << 4), seq, len(commands))
+        offset = HEADER.size
+
+        for command in commands:
+            opcode = command[0]
+            if opcode == OP_TEXT:
+                text = command[1]
+                TEXT_HEADER.pack_into(buffer, offset, OP_TEXT, len(text))
+                offset += TEXT_HEADER.size
+                buffer[offset:offset + len(text)] = text
+                offset += len(text)
+            else:
+                fmt = COMMAND_FORMATS[opcode][1]
+                fmt.pack_into(buffer, offset, *command)
+                offset += fmt.size
+
+        CRC.pack_into(buffer, offset, binascii.crc_hqx(memoryview(buffer)[:offset], 0xFFFF))
+        return memoryview(buffer)[:offset + CRC.size]
+
+    def _chunks(self, items: Sequence[Tuple[Command, int]]) -> List[Sequence[Tuple[Command, int]]]:
+        """Деление на сообщения: не больше MAX_COMMANDS команд и max_message байт"""
+        limit = self.max_message - HEADER.size - CRC.size
+        chunks = []
+        start = 0
+        size = 0
+        for index, (command, _) in enumerate(items):
+            record = record_size(command)
+            if index - start == MAX_COMMANDS or size + record > limit:
+                chunks.append(items[start:index])
+                start = index
+                size = 0
+            size += record
+        if start < len(items):
+            chunks.append(items[start:])
+        return chunks
+
+    def encode_messages(self, items: Sequence[Tuple[Command, int]]) -> List[bytes]:
+        """Пары (команда, попытка) -> сообщения не длиннее max_message
+
+        При require_acks сообщения запоминаются до подтверждения.
+        """
+        flags = FLAG_ACK_REQUESTED if self.require_acks else 0
+        messages = []
+        now = time.monotonic()
+        for chunk in self._chunks(items):
+            messages.append(bytes(self.encode_batch([command for command, _ in chunk], flags)))
+            if self.require_acks:
+                with self.lock:
+                    self.unacked[self.seq] = (now, chunk)
+                    for command, _ in chunk:
+                        key = command_key(command)
+                        if key is not None:
+                            self.last_sent[key] = self.seq
+            self.stats['messages_sent'] += 1
+            self.stats['commands_sent'] += len(chunk)
+        return messages
+
+    def encode_ack(self, seq: int, status: int = 0) -> bytes:
+        """Подтверждение сообщения seq"""
+        buffer = self.buffer
+        HEADER.pack_into(buffer, 0, MSG_ACK, self._next_seq(), 0)
+        ACK_BODY.pack_into(buffer, HEADER.size, seq, status)
+        end = HEADER.size + ACK_BODY.size
+        CRC.pack_into(buffer, end, binascii.crc_hqx(memoryview(buffer)[:end], 0xFFFF))
+        return bytes(buffer[:end + CRC.size])
+
+    def encode_telemetry(self, body: bytes) -> bytes:
+        """Телеметрия (используется эмулятором ESP32)"""
+        message = HEADER.pack(MSG_TELEMETRY, self._next_seq(), 0) + body
+        return message + CRC.pack(binascii.crc_hqx(message, 0xFFFF))
+
+    def decode(self, payload: bytes) -> Message:
+        """Разбор сообщения с проверкой CRC"""
+        if len(payload) < HEADER.size + CRC.size:
+            raise ProtocolError(f"Короткое сообщение: {len(payload)} байт")
+        view = memoryview(payload)
+        end = len(payload) - CRC.size
+        if binascii.crc_hqx(view[:end], 0xFFFF) != CRC.unpack_from(payload, end)[0]:
+            self.stats['crc_errors'] += 1
+            raise ProtocolError("Неверная CRC")
+
+        type_flags, seq, count = HEADER.unpack_from(payload)
+        message = Message(type_flags & 0x0F, type_flags >> 4, seq)
+        offset = HEADER.size
+
+        if message.type == MSG_ACK:
+            self._check_length(offset, ACK_BODY.size, end)
+            message.ack_seq, message.status = ACK_BODY.unpack_from(payload, offset)
+        elif message.type == MSG_TELEMETRY:
+            message.body = bytes(view[offset:end])
+        elif message.type == MSG_COMMANDS:
+            for _ in range(count):
+                self._check_length(offset, 1, end)
+                opcode = payload[offset]
+                if opcode == OP_TEXT:
+                    self._check_length(offset, TEXT_HEADER.size, end)
+                    length = payload[offset + 1]
+                    offset += TEXT_HEADER.size
+                    self._check_length(offset, length, end)
+                    message.commands.append((OP_TEXT, bytes(view[offset:offset + length])))
+                    offset += length
+                elif opcode in COMMAND_FORMATS:
+                    fmt = COMMAND_FORMATS[opcode][1]
+                    self._check_length(offset, fmt.size, end)
+                    message.commands.append(fmt.unpack_from(payload, offset))
+                    offset += fmt.size
+                else:
+                    raise ProtocolError(f"Неизвестная команда 0x{opcode:02X}")
+        else:
+            raise ProtocolError(f"Неизвестный тип сообщения {message.type}")
+        return message
+
+    @staticmethod
+    def _check_length(offset: int, size: int, end: int):
+        if offset + size > end:
+            raise ProtocolError("Запись выходит за границу сообщения")
+
+    def _forget_keys(self, seq: int, chunk):
+        """Ключи сообщения seq больше не ждут подтверждения (под self.lock)"""
+        for command, _ in chunk:
+            key = command_key(command)
+            if key is not None and self.last_sent.get(key) == seq:
+                del self.last_sent[key]
+
+    def acknowledge(self, seq: int) -> bool:
+        """Учет подтверждения; False - номер не ожидался"""
+        with self.lock:
+            entry = self.unacked.pop(seq, None)
+            if entry is not None:
+                self._forget_keys(seq, entry[1])
+        if entry is None:
+            return False
+        rtt_ms = (time.monotonic() - entry[0]) * 1000.0
+        self.stats['acked'] += 1
+        if self.stats['acked'] == 1:
+            self.stats['rtt_ms'] = rtt_ms
+        else:
+            self.stats['rtt_ms'] += (rtt_ms - self.stats['rtt_ms']) * 0.1
+        return True
+
+    def next_timeout(self, now: Optional[float] = None) -> Optional[float]:
+        """Секунд до истечения старейшего подтверждения; None - ожиданий нет"""
+        with self.lock:
+            if not self.unacked:
+                return None
+            sent_at, _ = next(iter(self.unacked.values()))
+        now = time.monotonic() if now is None else now
+        return max(0.0, sent_at + self.ack_timeout - now)
+
+    def expired(self, now: Optional[float] = None) -> List[Tuple[Command, int]]:
+        """Команды неподтвержденных вовремя сообщений с номером следующей попытки
+
+        Команды, чей ключ отправлен в более позднем сообщении, отбрасываются.
+        """
+        now = time.monotonic() if now is None else now
+        resend = []
+        while True:
+            with self.lock:
+                if not self.unacked:
+                    break
+                seq, (sent_at, chunk) = next(iter(self.unacked.items()))
+                if now - sent_at < self.ack_timeout:
+                    break
+                del self.unacked[seq]
+                # Ключ ушел в более позднем сообщении: повтор затер бы новое состояние
+                current = [command_key(command) is None
+                           or self.last_sent.get(command_key(command)) == seq
+                           for command, _ in chunk]
+                self._forget_keys(seq, chunk)
+            self.stats['retries'] += 1
+            for (command, attempt), is_current in zip(chunk, current):
+                if not is_current:
+                    self.stats['superseded'] += 1
+                elif attempt >= self.max_retries:
+                    self.stats['lost'] += 1
+                else:
+                    resend.append((command, attempt + 1))
+        return resend
+
+    def get_stats(self) -> Dict:
+        stats = dict(self.stats)
+        stats['unacked'] = len(self.unacked)
+        return stats
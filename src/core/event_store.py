@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Журнал событий движения на SQLite
+WAL режим, пакетная запись фоновым потоком, индексы по времени и секторам
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+from kivy.logger import Logger
+
+try:
+    import cv2
+except ImportError:
+    # Без OpenCV события пишутся без миниатюр
+    cv2 = None
+
+from .blobs import BLOB_DTYPE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    score REAL NOT NULL,
+    blob_count INTEGER NOT NULL,
+    sectors TEXT NOT NULL,
+    blobs BLOB NOT NULL,
+    thumbnail BLOB
+);
+CREATE INDEX IF NOT EXISTS events_timestamp ON events (timestamp);
+
+-- Сектор -> события: покрывающий индекс для запросов "сектор за период"
+CREATE TABLE IF NOT EXISTS event_sectors (
+    sector INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    event_id INTEGER NOT NULL,
+    PRIMARY KEY (sector, timestamp, event_id)
+) WITHOUT ROWID;
+"""
+
+class EventStore:
+    """Хранилище событий движения с фоновой пакетной записью
+
+    Поток публикации только ставит событие в очередь; вставки выполняет
+    поток записи пачками в одной транзакции. Чтение идет через отдельные
+    соединения: в режиме WAL читатели не блокируют писателя.
+    """
+
+    def __init__(self, path: str, batch_size: int = 256, flush_interval: float = 1.0,
+                 min_interval: float = 0.5, thumbnails: bool = True,
+                 thumbnail_width: int = 160, max_queue: int = 10000):
+        self.path = path
+        self.batch_size = batch_size          # Событий в одной транзакции
+        self.flush_interval = flush_interval  # Макс. задержка записи, сек
+        self.min_interval = min_interval      # Мин. интервал между событиями, сек
+        self.thumbnails = thumbnails and cv2 is not None
+        self.thumbnail_width = thumbnail_width
+        self.jpeg_quality = 70
+
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.events_written = 0
+        self.events_dropped = 0
+        self.last_event_time = 0.0
+
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+        self._local = threading.local()  # Соединения для чтения по потокам
+        # Все открытые соединения чтения: close закрывает и чужие
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=5.0, check_same_thread=check_same_thread)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def open(self) -> bool:
+        """Создание схемы и запуск потока записи"""
+        if self.is_open:
+            return True
+        try:
+            connection = self._connect()
+            connection.executescript(SCHEMA)
+            connection.close()
+        except Exception as e:
+            Logger.error(f"EventStore: Ошибка открытия {self.path}: {e}")
+            return False
+
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._writer_loop, name='EventStore')
+        self.thread.daemon = True
+        self.thread.start()
+        Logger.info(f"EventStore: Журнал событий {self.path}")
+        return True
+
+    def close(self, timeout: float = 5.0):
+        """Остановка потока записи и закрытие соединений чтения всех потоков
+
+        События из очереди дописываются. Чтение после close откроет
+        новое соединение.
+        """
+        self.stop_event.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=timeout)
+        self.thread = None
+
+        with self._readers_lock:
+            readers, self._readers = self._readers, []
+            self._local = threading.local()
+        for connection in readers:
+            try:
+                connection.close()
+            except Exception as e:
+                Logger.error(f"EventStore: Ошибка закрытия соединения: {e}")
+
+    def accepts(self, timestamp: float) -> bool:
+        """Будет ли записано событие в момент timestamp (ограничение частоты)"""
+        return self.is_open and timestamp - self.last_event_time >= self.min_interval
+
+    def make_thumbnail(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        """Уменьшенная копия кадра для миниатюры (сжатие - в потоке записи)"""
+        if not self.thumbnails:
+            return None
+        height, width = frame.shape[:2]
+        scale = self.thumbnail_width / float(width)
+        return cv2.resize(frame, (self.thumbnail_width, max(1, int(height * scale))),
+                          interpolation=cv2.INTER_AREA)
+
+    def record(self, timestamp: float, sectors: Sequence[int], blobs: np.ndarray,
+               score: float, thumbnail: Optional[np.ndarray] = None) -> bool:
+        """Постановка события в очередь записи без блокировки"""
+        if not self.accepts(timestamp):
+            return False
+        try:
+            self.queue.put_nowait((timestamp, list(sectors), blobs, score, thumbnail))
+            self.last_event_time = timestamp
+            return True
+        except queue.Full:
+            self.events_dropped += 1
+            return False
+
+    def _writer_loop(self):
+        """Поток записи: пачки событий в одной транзакции"""
+        connection = self._connect()
+        try:
+            while not (self.stop_event.is_set() and self.queue.empty()):
+                batch = self._next_batch()
+                if batch:
+                    self._write_batch(connection, batch)
+        finally:
+            connection.close()
+
+    def _next_batch(self) -> List:
+        """Ожидание первого события и добор пачки до batch_size или flush_interval"""
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0 or self.stop_event.is_set():
+                timeout = 0
+            try:
+                batch.append(self.queue.get(timeout=timeout) if timeout else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_batch(self, connection: sqlite3.Connection, batch: List):
+        try:
+            with connection:
+                for timestamp, sectors, blobs, score, thumbnail in batch:
+                    jpeg = None
+                    if thumbnail is not None:
+                        ok, encoded = cv2.imencode('.jpg', thumbnail,
+                                                   (cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality))
+                        jpeg = encoded.tobytes() if ok else None
+
+                    cursor = connection.execute(
+                        'INSERT INTO events (timestamp, score, blob_count, sectors, blobs, thumbnail) '
+                        'VALUES (?, ?, ?, ?, ?, ?)',
+                        (timestamp, score, len(blobs), ','.join(map(str, sectors)),
+                         np.ascontiguousarray(blobs, dtype=BLOB_DTYPE).tobytes(), jpeg))
+                    connection.executemany(
+                        'INSERT INTO event_sectors (sector, timestamp, event_id) VALUES (?, ?, ?)',
+                        [(sector, timestamp, cursor.lastrowid) for sector in sectors])
+            self.events_written += len(batch)
+
+        except Exception as e:
+            self.events_dropped += len(batch)
+            Logger.error(f"EventStore: Ошибка записи {len(batch)} событий: {e}")
+
+    def _reader(self) -> sqlite3.Connection:
+        """Соединение для чтения в текущем потоке"""
+        local = self._local
+        connection = getattr(local, 'connection', None)
+        if connection is None:
+            # Соединение используется только своим потоком, но закрывает его close
+            connection = self._connect(check_same_thread=False)
+            with self._readers_lock:
+                self._readers.append(connection)
+            local.connection = connection
+        return connection
+
+    @staticmethod
+    def _filter(start: Optional[float], end: Optional[float],
+                sector: Optional[int]) -> tuple:
+        """Условие WHERE и параметры выборки по времени и сектору"""
+        if sector is not None:
+            # Поиск по индексу (sector, timestamp) таблицы event_sectors
+            clauses = ['id IN (SELECT event_id FROM event_sectors WHERE sector = ? '
+                       'AND timestamp >= ? AND timestamp <= ?)']
+            return clauses, [sector, start if start is not None else float('-inf'),
+                             end if end is not None else float('inf')]
+
+        clauses, params = [], []
+        if start is not None:
+            clauses.append('timestamp >= ?')
+            params.append(start)
+        if end is not None:
+            clauses.append('timestamp <= ?')
+            params.append(end)
+        return clauses, params
+
+    def query(self, start: Optional[float] = None, end: Optional[float] = None,
+              sector: Optional[int] = None, limit: int = 100,
+              with_thumbnails: bool = False) -> List[Dict]:
+        """События за период (и в секторе), от новых к старым"""
+        clauses, params = self._filter(start, end, sector)
+        columns = 'id, timestamp, score, blob_count, sectors, blobs'
+        if with_thumbnails:
+            columns += ', thumbnail'
+        sql = f'SELECT {columns} FROM events'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY timestamp DESC LIMIT ?'
+
+        try:
+            rows = self._reader().execute(sql, params + [limit]).fetchall()
+        except Exception as e:
+            Logger.error(f"EventStore: Ошибка запроса: {e}")
+            return []
+
+        events = []
+        for row in rows:
+            blobs = np.frombuffer(row[5], dtype=BLOB_DTYPE)
+            event = {
+                'id': row[0],
+                'timestamp': row[1],
+                'score': row[2],
+                'blob_count': row[3],
+                'sectors': [int(s) for s in row[4].split(',') if s],
+                'boxes': np.stack((blobs['x'], blobs['y'], blobs['w'], blobs['h']), axis=1).tolist()
+            }
+            if with_thumbnails:
+                event['thumbnail'] = row[6]
+            events.append(event)
+        return events
+
+    def count(self, start: Optional[float] = None, end: Optional[float] = None,
+              sector: Optional[int] = None) -> int:
+        """Число событий за период (и в секторе)"""
+        if sector is not None:
+            sql = 'SELECT COUNT(*) FROM event_sectors WHERE sector = ? AND timestamp >= ? AND timestamp <= ?'
+            params = [sector, start if start is not None else float('-inf'),
+                      end if end is not None else float('inf')]
+        else:
+            clauses, params = self._filter(start, end, None)
+            sql = 'SELECT COUNT(*) FROM events' + (' WHERE ' + ' AND '.join(clauses) if clauses else '')
+        try:
+            return int(self._reader().execute(sql, params).fetchone()[0])
+        except Exception as e:
+            Logger.error(f"EventStore: Ошибка запроса: {e}")
+            return 0
+
+    def get_thumbnail(self, event_id: int) -> Optional[bytes]:
+        """JPEG миниатюра события"""
+        try:
+            row = self._reader().execute('SELECT thumbnail FROM events WHERE id = ?',
+                                         (event_id,)).fetchone()
+            return row[0] if row else None
+        except Exception as e:
+            Logger.error(f"EventStore: Ошибка чтения миниатюры: {e}")
+            return None
+
+    def delete_before(self, timestamp: float) -> int:
+        """Удаление событий старше timestamp (ограничение размера журнала)"""
+        try:
+            connection = self._reader()
+            with connection:
+                connection.execute('DELETE FROM event_sectors WHERE timestamp < ?', (timestamp,))
+                return connection.execute('DELETE FROM events WHERE timestamp < ?',
+                                          (timestamp,)).rowcount
+        except Exception as e:
+            Logger.error(f"EventStore: Ошибка удаления событий: {e}")
+            return 0
+
+    def get_stats(self) -> Dict:
+        return {
+            'events_written': self.events_written,
+            'events_dropped': self.events_dropped,
+            'queued': self.queue.qsize()
+        }
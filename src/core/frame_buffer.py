@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Слой получения кадров без лишних копий
+Кольцевые буферы предвыделенных кадров для горячего цикла
+"""
+
+import collections
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from kivy.logger import Logger
+
+try:
+    import cv2
+except ImportError:
+    # Без OpenCV преобразование цвета выполняется на NumPy
+    cv2 = None
+
+# Веса яркости (BT.601) для каналов R, G, B
+LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+def to_bgr(image: np.ndarray, pixel_format: str, dst: np.ndarray) -> np.ndarray:
+    """'rgba' или 'gray' -> BGR в буфер dst"""
+    if cv2 is not None:
+        code = cv2.COLOR_RGBA2BGR if pixel_format == 'rgba' else cv2.COLOR_GRAY2BGR
+        return cv2.cvtColor(image, code, dst=dst)
+    np.copyto(dst, image[:, :, 2::-1] if pixel_format == 'rgba' else image[:, :, None])
+    return dst
+
+def to_gray(image: np.ndarray, pixel_format: str, dst: np.ndarray) -> np.ndarray:
+    """'rgba' или 'bgr' -> яркость в буфер dst"""
+    if cv2 is not None:
+        code = cv2.COLOR_RGBA2GRAY if pixel_format == 'rgba' else cv2.COLOR_BGR2GRAY
+        return cv2.cvtColor(image, code, dst=dst)
+    weights = LUMA_WEIGHTS if pixel_format == 'rgba' else LUMA_WEIGHTS[::-1]
+    np.rint(image[:, :, :3] @ weights, out=dst, casting='unsafe')
+    return dst
+
+class FrameRingBuffer:
+    """Кольцевой буфер предвыделенных кадров одной формы
+
+    Слот занят, пока кадр не возвращен через release(): потребитель
+    (детекция) возвращает его после обработки, очередь - при вытеснении.
+    Если свободных слотов нет, выдается новый буфер, а занятые слоты не
+    перезаписываются.
+    """
+
+    def __init__(self, slots: int = 3):
+        self.slots = max(1, slots)
+        self.buffers: List[np.ndarray] = []
+        self.shape: Optional[Tuple[int, ...]] = None
+        self.free: collections.deque = collections.deque()
+        self.in_use: Dict[int, int] = {}  # id(буфер) -> слот
+        self.lock = threading.Lock()
+        self.bytes_allocated = 0  # Байты, выделенные при последнем вызове acquire
+        self.overflows = 0        # Кадры вне кольца: все слоты были заняты
+
+    def set_slots(self, slots: int):
+        """Изменение числа слотов (буферы перевыделяются на следующем кадре)"""
+        with self.lock:
+            self.slots = max(1, slots)
+            self.shape = None
+
+    def acquire(self, shape: Tuple[int, ...]) -> np.ndarray:
+        """Получение свободного слота буфера нужной формы"""
+        with self.lock:
+            self.bytes_allocated = 0
+
+            if shape != self.shape:
+                # Форма кадра изменилась - перевыделяем все слоты один раз;
+                # занятые старые буферы остаются у потребителей
+                self.buffers = [np.empty(shape, dtype=np.uint8) for _ in range(self.slots)]
+                self.shape = shape
+                self.free = collections.deque(range(self.slots))
+                self.in_use = {}
+                self.bytes_allocated = sum(buf.nbytes for buf in self.buffers)
+
+            if not self.free:
+                buffer = np.empty(shape, dtype=np.uint8)
+                self.bytes_allocated += buffer.nbytes
+                self.overflows += 1
+                return buffer
+
+            slot = self.free.popleft()
+            buffer = self.buffers[slot]
+            self.in_use[id(buffer)] = slot
+            return buffer
+
+    def release(self, buffer: np.ndarray):
+        """Возврат слота; кадры не из кольца игнорируются"""
+        with self.lock:
+            slot = self.in_use.pop(id(buffer), None)
+            if slot is not None and self.buffers[slot] is buffer:
+                self.free.append(slot)
+
+class FrameAcquirer:
+    """Преобразование данных текстуры или источника в кадр для детектора"""
+
+    # Режимы цвета:
+    # 'bgr'     - полная BGR копия (для детекторов, которым нужен цвет)
+    # 'gray'    - яркость (luma) в одноканальный буфер
+    # 'channel' - один канал RGBA (по умолчанию зеленый) в одноканальный буфер
+    # 'rgba'    - представление поверх данных текстуры без копирования
+    COLOR_MODES = ('bgr', 'gray', 'channel', 'rgba')
+
+    def __init__(self, color_mode: str = 'gray', slots: int = 3, channel: int = 1):
+        self.color_mode = 'gray'
+        self.channel = channel
+        self.ring = FrameRingBuffer(slots)
+
+        # Статистика выделений памяти на последнем кадре
+        self.readback_bytes = 0   # Байты, скопированные из GPU (texture.pixels)
+        self.allocated_bytes = 0  # Байты, выделенные самим слоем
+
+        self.set_color_mode(color_mode)
+
+    def set_color_mode(self, color_mode: str):
+        """Установка режима цвета"""
+        if color_mode not in self.COLOR_MODES:
+            Logger.warning(f"FrameAcquirer: Неизвестный режим цвета: {color_mode}")
+            return
+        self.color_mode = color_mode
+
+    @property
+    def bytes_per_frame(self) -> int:
+        """Всего байт, выделенных на последнем кадре"""
+        return self.readback_bytes + self.allocated_bytes
+
+    def from_texture(self, texture) -> Optional[np.ndarray]:
+        """Получение кадра из текстуры Kivy"""
+        if not texture:
+            return None
+
+        # texture.pixels выполняет чтение из GPU в новый объект bytes -
+        # это единственная копия, которую нельзя избежать
+        pixels = texture.pixels
+        if not pixels:
+            return None
+
+        width, height = texture.size
+        rgba = np.frombuffer(pixels, dtype=np.uint8).reshape((height, width, 4))
+        self.readback_bytes = len(pixels)
+        return self.from_rgba(rgba)
+
+    def from_rgba(self, rgba: np.ndarray) -> np.ndarray:
+        """Получение кадра из RGBA массива"""
+        return self.from_image(rgba, 'rgba')
+
+    def from_image(self, image: np.ndarray, pixel_format: str,
+                   readback_bytes: Optional[int] = None) -> np.ndarray:
+        """Получение кадра из изображения формата 'rgba', 'bgr' или 'gray'"""
+        if readback_bytes is not None:
+            self.readback_bytes = readback_bytes
+        height, width = image.shape[:2]
+
+        if self.color_mode == 'rgba' or pixel_format == self.color_mode:
+            # Без копирования: детектор работает прямо с данными источника
+            self.allocated_bytes = 0
+            return image
+
+        if self.color_mode == 'bgr':
+            frame = to_bgr(image, pixel_format, self.ring.acquire((height, width, 3)))
+        elif pixel_format == 'gray':
+            # Уже одноканальный кадр - подходит для 'channel' без копирования
+            self.allocated_bytes = 0
+            return image
+        elif self.color_mode == 'gray':
+            frame = to_gray(image, pixel_format, self.ring.acquire((height, width)))
+        else:
+            # Один канал через шаговое представление, копия в непрерывный буфер
+            # (зеленый канал имеет индекс 1 и в RGBA, и в BGR)
+            frame = self.ring.acquire((height, width))
+            np.copyto(frame, image[:, :, self.channel])
+
+        self.allocated_bytes = self.ring.bytes_allocated
+        return frame
+
+    def release(self, frame: np.ndarray):
+        """Кадр больше не нужен: его слот можно переиспользовать"""
+        self.ring.release(frame)
+
+    def get_stats(self) -> Dict:
+        """Статистика выделений памяти"""
+        return {
+            'color_mode': self.color_mode,
+            'readback_bytes': self.readback_bytes,
+            'allocated_bytes': self.allocated_bytes,
+            'bytes_per_frame': self.bytes_per_frame,
+            'ring_overflows': self.ring.overflows
+        }
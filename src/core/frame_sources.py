@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Источники кадров для MotionTracker
+Камера Kivy, внешняя USB (UVC) камера, видеофайл и последовательность изображений
+"""
+
+import glob
+import os
+import sys
+import threading
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from kivy.logger import Logger
+
+from .pipeline import LatestQueue
+
+try:
+    import cv2
+except ImportError:
+    # Без OpenCV доступна только камера Kivy
+    cv2 = None
+
+def opencv_available(source: str) -> bool:
+    """Проверка OpenCV для источников на cv2.VideoCapture и imread"""
+    if cv2 is None:
+        Logger.error(f"{source}: Источник недоступен без OpenCV")
+        return False
+    return True
+
+class FrameSource:
+    """Базовый источник кадров"""
+
+    # Формат пикселей, который возвращает read(): 'rgba', 'bgr' или 'gray'
+    pixel_format = 'bgr'
+    # Источник реального времени (кадры идут сами) или файл (читается по запросу)
+    realtime = False
+
+    def __init__(self):
+        self.size: Tuple[int, int] = (0, 0)  # Ширина, высота
+        self.fps = 30.0
+        self.frame_index = 0
+        self.read_bytes = 0  # Байты, выделенные при последнем чтении
+        self.is_open = False
+        self.frame_callback: Optional[Callable] = None
+
+    @property
+    def frame_events_supported(self) -> bool:
+        """Сообщает ли источник о новых кадрах через frame_callback"""
+        return False
+
+    def set_frame_callback(self, callback: Optional[Callable]):
+        """Обработчик уведомлений о новых кадрах"""
+        self.frame_callback = callback
+
+    def open(self) -> bool:
+        """Открытие источника"""
+        raise NotImplementedError
+
+    def has_frame(self) -> bool:
+        """Готов ли кадр к чтению"""
+        return self.is_open
+
+    def read(self) -> Optional[np.ndarray]:
+        """Чтение следующего кадра в формате pixel_format; None - кадров нет"""
+        raise NotImplementedError
+
+    @property
+    def position_ms(self) -> float:
+        """Позиция текущего кадра в миллисекундах"""
+        return self.frame_index * 1000.0 / self.fps if self.fps > 0 else 0.0
+
+    def close(self):
+        """Закрытие источника"""
+        self.is_open = False
+
+class KivyCameraSource(FrameSource):
+    """Камера устройства через Kivy (текстура RGBA)"""
+
+    pixel_format = 'rgba'
+    realtime = True
+
+    def __init__(self, index: int = 0, resolution: Tuple[int, int] = (640, 480)):
+        super().__init__()
+        self.index = index
+        self.resolution = resolution
+        self.camera = None
+
+    @property
+    def frame_events_supported(self) -> bool:
+        return self.camera is not None
+
+    def _on_texture(self, *args):
+        if self.frame_callback:
+            self.frame_callback()
+
+    def open(self) -> bool:
+        if self.camera is not None:
+            # Повторный запуск после close()
+            self.camera.start()
+            self.is_open = True
+            return True
+
+        try:
+            from kivy.core.camera import Camera as KivyCamera
+
+            self.camera = KivyCamera(index=self.index, resolution=self.resolution)
+
+            # Кадры обрабатываются по мере поступления вместо опроса текстуры
+            self.camera.bind(on_texture=self._on_texture)
+            self.size = self.resolution
+            self.is_open = True
+            return True
+
+        except Exception as e:
+            Logger.error(f"KivyCameraSource: Ошибка открытия камеры {self.index}: {e}")
+            return False
+
+    def has_frame(self) -> bool:
+        return self.camera is not None and bool(self.camera.texture)
+
+    def read(self) -> Optional[np.ndarray]:
+        texture = self.camera.texture if self.camera else None
+        if not texture:
+            return None
+
+        # texture.pixels выполняет чтение из GPU в новый объект bytes
+        pixels = texture.pixels
+        if not pixels:
+            return None
+
+        width, height = texture.size
+        self.size = (width, height)
+        self.read_bytes = len(pixels)
+        self.frame_index += 1
+        return np.frombuffer(pixels, dtype=np.uint8).reshape((height, width, 4))
+
+    def close(self):
+        if self.camera:
+            self.camera.stop()
+        super().close()
+
+    def release(self):
+        """Освобождение камеры для других приложений; open() создаст ее заново"""
+        if self.camera:
+            self.camera.stop()
+            self.camera.unbind(on_texture=self._on_texture)
+            # Камера Android освобождается при удалении объекта
+            self.camera = None
+        super().close()
+
+def find_video_device(vendor_id: int, product_id: int) -> Optional[str]:
+    """Узел /dev/videoN USB камеры с данными VID/PID (Linux sysfs)"""
+    root = '/sys/class/video4linux'
+    try:
+        names = sorted(os.listdir(root), key=lambda name: (len(name), name))
+    except OSError:
+        return None
+
+    for name in names:
+        try:
+            # device - интерфейс USB; VID/PID - у родительского устройства
+            with open(os.path.join(root, name, 'device', '..', 'idVendor')) as f:
+                device_vendor = int(f.read().strip(), 16)
+            with open(os.path.join(root, name, 'device', '..', 'idProduct')) as f:
+                device_product = int(f.read().strip(), 16)
+            # Второй узел UVC камеры (index 1) - метаданные, не кадры
+            with open(os.path.join(root, name, 'index')) as f:
+                node_index = int(f.read().strip())
+        except (OSError, ValueError):
+            continue
+        if (device_vendor, device_product) == (vendor_id, product_id) and node_index == 0:
+            return f'/dev/{name}'
+    return None
+
+class UvcCameraSource(FrameSource):
+    """Внешняя USB (UVC) камера через cv2.VideoCapture
+
+    Камера запрашивается в MJPEG с нужными разрешением и частотой;
+    фактические значения читаются обратно после согласования. Поток
+    захвата только забирает сжатые кадры, декодирование выполняет
+    отдельный поток, read() отдает последний декодированный кадр.
+    """
+
+    pixel_format = 'bgr'
+    realtime = True
+
+    FOURCC = 'MJPG'
+
+    # Подряд неудачных чтений до признания камеры отключенной
+    MAX_READ_FAILURES = 30
+    QUEUE_TIMEOUT = 0.5
+
+    def __init__(self, location: Union[int, str], resolution: Tuple[int, int] = (1280, 720),
+                 fps: float = 30.0, grayscale: bool = False):
+        super().__init__()
+        self.location = location
+        self.resolution = resolution
+        self.requested_fps = fps
+        self.fps = fps
+        self.grayscale = grayscale  # Декодирование сразу в оттенки серого (дешевле)
+        self.pixel_format = 'gray' if grayscale else 'bgr'
+        self.capture = None
+        self.mjpeg = False          # Камера отдает сжатые кадры (декодируем сами)
+
+        # Сжатые кадры от потока захвата: декодируется только последний
+        self.raw_queue = LatestQueue(maxsize=2)
+        self.lock = threading.Lock()
+        self.latest: Optional[np.ndarray] = None
+        self.frames_decoded = 0
+        self.decode_errors = 0
+        self.compressed_bytes = 0
+
+        self.stop_event = threading.Event()
+        self.threads: List[threading.Thread] = []
+
+    @property
+    def frame_events_supported(self) -> bool:
+        return True
+
+    def _open_capture(self):
+        if sys.platform.startswith('linux') and 'ANDROID_ARGUMENT' not in os.environ:
+            return cv2.VideoCapture(self.location, cv2.CAP_V4L2)
+        return cv2.VideoCapture(self.location)
+
+    def open(self) -> bool:
+        if self.is_open:
+            return True
+        if self.capture is not None:
+            # Повторное открытие после потери камеры
+            self.close()
+        if not opencv_available('UvcCameraSource'):
+            return False
+        try:
+            capture = self._open_capture()
+            if not capture.isOpened():
+                Logger.error(f"UvcCameraSource: Не удалось открыть камеру {self.location}")
+                return False
+
+            # Согласование формата: порядок важен для V4L2 (формат до размера)
+            width, height = self.resolution
+            capture.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*self.FOURCC))
+            capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            capture.set(cv2.CAP_PROP_FPS, self.requested_fps)
+
+            fourcc = int(capture.get(cv2.CAP_PROP_FOURCC))
+            fourcc = ''.join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4))
+            self.mjpeg = fourcc == self.FOURCC
+            if self.mjpeg:
+                # Сжатые кадры без декодирования в потоке захвата
+                capture.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+
+            self.size = (int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)) or width,
+                         int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)) or height)
+            self.fps = capture.get(cv2.CAP_PROP_FPS) or self.requested_fps
+            self.capture = capture
+
+        except Exception as e:
+            Logger.error(f"UvcCameraSource: Ошибка открытия камеры {self.location}: {e}")
+            return False
+
+        self.stop_event.clear()
+        self.raw_queue = LatestQueue(maxsize=2)
+        self.latest = None
+        self.threads = [
+            threading.Thread(target=self._capture_loop, args=(capture, self.raw_queue), name='UvcCapture'),
+            threading.Thread(target=self._decode_loop, args=(self.raw_queue,), name='UvcDecode')
+        ]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+        self.is_open = True
+        Logger.info(f"UvcCameraSource: Камера {self.location}: {self.size[0]}x{self.size[1]} "
+                    f"@ {self.fps:.0f} FPS, {fourcc}")
+        return True
+
+    def _capture_loop(self, capture, raw_queue: LatestQueue):
+        """Поток захвата: сжатые кадры в очередь декодирования"""
+        failures = 0
+        while not self.stop_event.is_set():
+            ok, raw = capture.read()
+            if not ok or raw is None:
+                failures += 1
+                if failures >= self.MAX_READ_FAILURES:
+                    Logger.warning(f"UvcCameraSource: Камера {self.location} не отдает кадры")
+                    break
+                self.stop_event.wait(0.01)
+                continue
+            failures = 0
+            raw_queue.put(raw)
+
+        self.is_open = False
+        raw_queue.close()
+
+    def _decode_loop(self, raw_queue: LatestQueue):
+        """Поток декодирования: последний сжатый кадр -> BGR или оттенки серого"""
+        flags = cv2.IMREAD_GRAYSCALE if self.grayscale else cv2.IMREAD_COLOR
+        while not self.stop_event.is_set():
+            raw = raw_queue.get(self.QUEUE_TIMEOUT)
+            if raw is None:
+                if raw_queue.closed:
+                    return
+                continue
+
+            if raw.ndim == 3:
+                # Бэкенд уже декодировал кадр (камера без MJPEG)
+                frame = cv2.cvtColor(raw, cv2.COLOR_BGR2GRAY) if self.grayscale else raw
+            else:
+                frame = cv2.imdecode(raw.reshape(-1), flags)
+                if frame is None:
+                    self.decode_errors += 1
+                    continue
+                self.compressed_bytes = raw.nbytes
+
+            with self.lock:
+                self.latest = frame
+                self.frames_decoded += 1
+            if self.frame_callback:
+                self.frame_callback()
+
+    def has_frame(self) -> bool:
+        return self.latest is not None
+
+    def read(self) -> Optional[np.ndarray]:
+        # Каждый декодированный кадр - новый массив, отдается без копирования
+        with self.lock:
+            frame, self.latest = self.latest, None
+        if frame is None:
+            return None
+
+        self.size = (frame.shape[1], frame.shape[0])
+        self.read_bytes = frame.nbytes
+        self.frame_index += 1
+        return frame
+
+    def close(self):
+        self.stop_event.set()
+        self.raw_queue.close()
+        for thread in self.threads:
+            if thread.is_alive() and thread is not threading.current_thread():
+                thread.join(timeout=1.0)
+        self.threads = []
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+        self.latest = None
+        super().close()
+
+    def get_stats(self) -> Dict:
+        return {
+            'location': self.location,
+            'resolution': f'{self.size[0]}x{self.size[1]}',
+            'fps': self.fps,
+            'mjpeg': self.mjpeg,
+            'frames_decoded': self.frames_decoded,
+            'frames_dropped': self.raw_queue.dropped,
+            'decode_errors': self.decode_errors,
+            'compressed_bytes': self.compressed_bytes
+        }
+
+class VideoFileSource(FrameSource):
+    """Видеофайл через cv2.VideoCapture"""
+
+    pixel_format = 'bgr'
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self.capture = None
+
+    def open(self) -> bool:
+        if not opencv_available('VideoFileSource'):
+            return False
+        self.capture = cv2.VideoCapture(self.path)
+        if not self.capture.isOpened():
+            Logger.error(f"VideoFileSource: Не удалось открыть {self.path}")
+            return False
+
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 30.0
+        self.size = (int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                     int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.frame_index = 0
+        self.is_open = True
+        return True
+
+    def read(self) -> Optional[np.ndarray]:
+        if not self.is_open:
+            return None
+
+        # Новый буфер на каждый кадр: предыдущий кадр может еще быть
+        # в конвейере; в детектор попадает копия из кольцевого буфера
+        ok, frame = self.capture.read()
+        if not ok:
+            self.is_open = False
+            return None
+
+        self.read_bytes = frame.nbytes
+        self.frame_index += 1
+        return frame
+
+    def close(self):
+        if self.capture is not None:
+            self.capture.release()
+        super().close()
+
+class ImageSequenceSource(FrameSource):
+    """Последовательность изображений (каталог или glob-шаблон)"""
+
+    pixel_format = 'bgr'
+
+    IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+
+    def __init__(self, pattern: str, fps: float = 30.0):
+        super().__init__()
+        self.pattern = pattern
+        self.fps = fps
+        self.paths: List[str] = []
+
+    def open(self) -> bool:
+        if not opencv_available('ImageSequenceSource'):
+            return False
+        if os.path.isdir(self.pattern):
+            self.paths = sorted(
+                os.path.join(self.pattern, name) for name in os.listdir(self.pattern)
+                if name.lower().endswith(self.IMAGE_EXTENSIONS)
+            )
+        else:
+            self.paths = sorted(glob.glob(self.pattern))
+
+        if not self.paths:
+            Logger.error(f"ImageSequenceSource: Нет изображений: {self.pattern}")
+            return False
+
+        self.frame_index = 0
+        self.is_open = True
+        return True
+
+    def has_frame(self) -> bool:
+        return self.is_open and self.frame_index < len(self.paths)
+
+    def read(self) -> Optional[np.ndarray]:
+        while self.has_frame():
+            path = self.paths[self.frame_index]
+            self.frame_index += 1
+            frame = cv2.imread(path, cv2.IMREAD_COLOR)
+            if frame is None:
+                Logger.warning(f"ImageSequenceSource: Пропущен файл {path}")
+                continue
+            self.size = (frame.shape[1], frame.shape[0])
+            self.read_bytes = frame.nbytes
+            return frame
+
+        self.is_open = False
+        return None
+
+def open_source(location: str, fps: float = 30.0) -> Optional[FrameSource]:
+    """Источник для пути: видеофайл, каталог или glob-шаблон изображений"""
+    if os.path.isdir(location) or any(ch in location for ch in '*?['):
+        source = ImageSequenceSource(location, fps=fps)
+    else:
+        source = VideoFileSource(location)
+    return source if source.open() else None
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+История движения в кольцевом буфере на NumPy
+O(1) добавление, окна без копирования и быстрые агрегаты
+"""
+
+import numpy as np
+from typing import Dict, Optional
+
+# Запись истории одного обработанного кадра
+HISTORY_DTYPE = np.dtype([
+    ('timestamp', np.float64),   # Время кадра (time.time())
+    ('motion', np.bool_),        # Было ли движение
+    ('score', np.float32),       # Доля кадра, занятая пятнами движения
+    ('blob_count', np.int32),
+    ('latency_ms', np.float32)   # Задержка обработки кадра
+])
+
+class MotionHistory:
+    """Кольцевой буфер истории кадров фиксированного размера
+
+    Каждая запись пишется дважды (в позиции i и i + capacity), поэтому
+    любые последние n <= capacity записей лежат в памяти непрерывно
+    и отдаются как представление без копирования. Метки времени
+    дублируются в отдельном непрерывном массиве: поиск окна по полю
+    структурированного массива (с шагом записи) копировал бы его.
+    """
+
+    def __init__(self, capacity: int = 18000):
+        # По умолчанию - 10 минут при 30 FPS
+        self.capacity = max(1, capacity)
+        self._buffer = np.zeros(2 * self.capacity, dtype=HISTORY_DTYPE)
+        self._timestamps = np.zeros(2 * self.capacity, dtype=np.float64)
+        self._index = 0   # Позиция следующей записи
+        self._count = 0   # Сколько записей заполнено
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, timestamp: float, motion: bool, score: float,
+               blob_count: int, latency_ms: float):
+        """Добавление записи за O(1)"""
+        record = (timestamp, motion, score, blob_count, latency_ms)
+        self._buffer[self._index] = record
+        self._buffer[self._index + self.capacity] = record
+        self._timestamps[self._index] = timestamp
+        self._timestamps[self._index + self.capacity] = timestamp
+        self._index = (self._index + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def clear(self):
+        """Очистка истории"""
+        self._index = 0
+        self._count = 0
+
+    def last(self, n: Optional[int] = None) -> np.ndarray:
+        """Последние n записей (по умолчанию все) - представление без копирования"""
+        n = self._count if n is None else max(0, min(n, self._count))
+        end = self._index + self.capacity
+        return self._buffer[end - n:end]
+
+    def _window_start(self, seconds: float, now: Optional[float] = None) -> int:
+        """Индекс первой записи окна в self._buffer / self._timestamps"""
+        end = self._index + self.capacity
+        timestamps = self._timestamps[end - self._count:end]
+        if now is None:
+            now = timestamps[-1]
+        return end - self._count + int(np.searchsorted(timestamps, now - seconds, side='left'))
+
+    def window(self, seconds: float, now: Optional[float] = None) -> np.ndarray:
+        """Записи за последние seconds секунд - представление без копирования"""
+        if not self._count:
+            return self.last()
+        return self._buffer[self._window_start(seconds, now):self._index + self.capacity]
+
+    def motion_rate_per_minute(self, seconds: float = 60.0, now: Optional[float] = None) -> float:
+        """Число начал движения в минуту за окно"""
+        records = self.window(seconds, now)
+        if len(records) < 2:
+            return 0.0
+        motion = records['motion']
+        onsets = int(np.count_nonzero(motion[1:] & ~motion[:-1])) + int(motion[0])
+        span = records['timestamp'][-1] - records['timestamp'][0]
+        return onsets * 60.0 / max(float(span), 1.0)
+
+    def fps(self, seconds: float = 2.0) -> float:
+        """Частота обработанных кадров за последние seconds секунд"""
+        if not self._count:
+            return 0.0
+        end = self._index + self.capacity
+        start = self._window_start(seconds)
+        if end - start < 2:
+            return 0.0
+        span = float(self._timestamps[end - 1] - self._timestamps[start])
+        return (end - start - 1) / span if span > 0 else 0.0
+
+    def percentiles(self, field: str, q=(50, 95, 99), seconds: Optional[float] = None) -> Dict[int, float]:
+        """Перцентили поля ('score', 'latency_ms', 'blob_count') за окно"""
+        records = self.last() if seconds is None else self.window(seconds)
+        if not len(records):
+            return {p: 0.0 for p in q}
+        values = np.percentile(records[field], q)
+        return {p: float(v) for p, v in zip(q, values)}
+
+    def summary(self, seconds: float = 60.0) -> Dict:
+        """Сводка для интерфейса и экспорта"""
+        records = self.window(seconds)
+        return {
+            'frames': len(records),
+            'motion_ratio': float(records['motion'].mean()) if len(records) else 0.0,
+            'motion_per_minute': self.motion_rate_per_minute(seconds),
+            'latency_ms': self.percentiles('latency_ms', seconds=seconds)
+        }
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Морфологическая очистка маски переднего плана
+Кэш структурирующих элементов и предвыделенные выходные буферы
+"""
+
+import numpy as np
+from typing import Dict, Optional, Tuple
+from kivy.logger import Logger
+
+try:
+    import cv2
+except ImportError:
+    # Без OpenCV эрозия и дилатация выполняются сдвигами на NumPy
+    cv2 = None
+
+# Формы ядра (значения - cv2.MORPH_ELLIPSE, MORPH_RECT, MORPH_CROSS)
+KERNEL_SHAPES = {
+    'ellipse': 2,
+    'rect': 0,
+    'cross': 1
+}
+
+# Кэш ядер: (форма, размер) -> (ядро, составное ядро для объединенного прохода)
+_kernel_cache: Dict[Tuple[str, int], Tuple[np.ndarray, np.ndarray]] = {}
+
+def structuring_element(shape: str, size: int) -> np.ndarray:
+    """Ядро size x size той же формы, что cv2.getStructuringElement"""
+    if cv2 is not None:
+        return cv2.getStructuringElement(KERNEL_SHAPES[shape], (size, size))
+
+    center = size // 2
+    if shape == 'rect' or center == 0:
+        return np.ones((size, size), dtype=np.uint8)
+    kernel = np.zeros((size, size), dtype=np.uint8)
+    if shape == 'cross':
+        kernel[center, :] = 1
+        kernel[:, center] = 1
+        return kernel
+    for row in range(size):
+        dy = row - center
+        dx = int(round(center * np.sqrt((center * center - dy * dy) / float(center * center))))
+        kernel[row, max(center - dx, 0):min(center + dx + 1, size)] = 1
+    return kernel
+
+def _morph(src: np.ndarray, kernel: np.ndarray, dst: np.ndarray, reduce, border: int):
+    """Минимум или максимум по сдвигам ядра; граница не влияет на результат"""
+    kh, kw = kernel.shape
+    height, width = src.shape
+    padded = np.pad(src, ((kh // 2, kh - 1 - kh // 2), (kw // 2, kw - 1 - kw // 2)),
+                    constant_values=border)
+    offsets = np.argwhere(kernel)
+    dy, dx = offsets[0]
+    np.copyto(dst, padded[dy:dy + height, dx:dx + width])
+    for dy, dx in offsets[1:]:
+        reduce(dst, padded[dy:dy + height, dx:dx + width], out=dst)
+    return dst
+
+def erode(src: np.ndarray, kernel: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    if cv2 is not None:
+        return cv2.erode(src, kernel, dst=dst)
+    return _morph(src, kernel, dst, np.minimum, 255)
+
+def dilate(src: np.ndarray, kernel: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    if cv2 is not None:
+        return cv2.dilate(src, kernel, dst=dst)
+    return _morph(src, kernel, dst, np.maximum, 0)
+
+def get_kernels(shape: str, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Структурирующий элемент и его дилатация самим собой (K и K+K)"""
+    key = (shape, size)
+    if key not in _kernel_cache:
+        kernel = structuring_element(shape, size)
+        # Дилатация на K, затем снова на K равна одной дилатации на K+K
+        padded = np.zeros((2 * size - 1, 2 * size - 1), dtype=np.uint8)
+        offset = size // 2
+        padded[offset:offset + size, offset:offset + size] = kernel
+        composite = dilate(padded, kernel, np.empty_like(padded))
+        _kernel_cache[key] = (kernel, composite)
+    return _kernel_cache[key]
+
+class MorphologyStage:
+    """Открытие и закрытие маски без выделения памяти в установившемся режиме"""
+
+    def __init__(self, size: int = 3, shape: str = 'ellipse', merged: bool = False):
+        self.size = 3
+        self.shape = 'ellipse'
+        self.merged = merged  # Объединить открытие и закрытие в один проход
+        self.kernel, self.composite = get_kernels(self.shape, self.size)
+
+        # Выходные буферы шагов открытия и закрытия
+        self._open: Optional[np.ndarray] = None
+        self._close: Optional[np.ndarray] = None
+
+        self.configure(size, shape, merged)
+
+    def configure(self, size: int, shape: str, merged: Optional[bool] = None):
+        """Установка размера и формы ядра"""
+        if shape not in KERNEL_SHAPES or size < 1 or size % 2 == 0:
+            Logger.warning(f"MorphologyStage: Недопустимое ядро: {shape} {size}")
+            return
+        self.size = size
+        self.shape = shape
+        if merged is not None:
+            self.merged = merged
+        self.kernel, self.composite = get_kernels(shape, size)
+
+    def _buffers(self, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        if self._open is None or self._open.shape != mask.shape:
+            self._open = np.empty_like(mask)
+            self._close = np.empty_like(mask)
+        return self._open, self._close
+
+    def apply(self, mask: np.ndarray) -> np.ndarray:
+        """Открытие, затем закрытие маски; результат в собственном буфере"""
+        opened, closed = self._buffers(mask)
+
+        if self.merged:
+            # open + close = erode(K), dilate(K), dilate(K), erode(K);
+            # две дилатации подряд объединены в одну на составном ядре
+            erode(mask, self.kernel, opened)
+            dilate(opened, self.composite, closed)
+            erode(closed, self.kernel, opened)
+            return opened
+
+        if cv2 is None:
+            # Открытие (эрозия, дилатация) и закрытие (дилатация, эрозия)
+            # через те же два буфера
+            erode(mask, self.kernel, closed)
+            dilate(closed, self.kernel, opened)
+            dilate(opened, self.kernel, closed)
+            return erode(closed, self.kernel, opened)
+
+        cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel, dst=opened)
+        cv2.morphologyEx(opened, cv2.MORPH_CLOSE, self.kernel, dst=closed)
+        return closed
@@ -5,13 +5,49 @@
 Адаптированная версия оригинального трекера
 """
 
-import cv2
 import numpy as np
 import threading
 import time
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional
 from kivy.logger import Logger
 
+from .frame_buffer import FrameAcquirer
+from .pyramid import DetectionPyramid
+from .scheduler import FrameScheduler
+from .pipeline import FramePipeline, PipelineItem
+from .sectors import SectorGrid, Polygon
+from .blobs import BlobExtractor, EMPTY_BLOBS
+from .morphology import MorphologyStage
+from .object_tracker import ObjectTracker
+from .history import MotionHistory
+from .profiling import StageProfiler
+from .recorder import MotionRecorder
+from .event_store import EventStore
+from .stats import StatsListener, StatsPublisher, TrackerStats
+from .frame_sources import FrameSource, KivyCameraSource, UvcCameraSource
+from .detectors import (MotionDetector, create_detector, default_detector,
+                        measure_detector_costs, select_detector)
+
+# Стадии горячего пути, замеряемые профилировщиком
+PROFILE_STAGES = ('readback', 'convert', 'downscale', 'detector', 'morphology',
+                  'sectors', 'blobs', 'refine', 'process_frame', 'tracking', 'publish')
+
+class DetectionResult:
+    """Результат детекции одного кадра, передаваемый на стадию публикации"""
+    
+    __slots__ = ('motion_detected', 'sector_scores', 'blobs', 'thumbnail', 'processing_ms',
+                 'frame_size')
+    
+    def __init__(self, motion_detected: bool, sector_scores: np.ndarray, blobs: np.ndarray,
+                 thumbnail: Optional[np.ndarray] = None, processing_ms: float = 0.0,
+                 frame_size: Tuple[int, int] = (0, 0)):
+        self.motion_detected = motion_detected
+        self.sector_scores = sector_scores
+        self.blobs = blobs  # Структурированный массив BLOB_DTYPE
+        self.thumbnail = thumbnail  # Уменьшенный кадр для журнала событий
+        self.processing_ms = processing_ms  # Время стадии детекции этого кадра
+        self.frame_size = frame_size  # Размер кадра, в координатах которого пятна
+
 class MotionTracker:
     """Класс для детекции движения на Android"""
     
@@ -19,49 +55,125 @@ class MotionTracker:
         self.is_running = False
         self.is_paused = False
         self.camera = None
-        self.background_subtractor = None
+        self.source: Optional[FrameSource] = None
+        self.detector: Optional[MotionDetector] = None
+        # MOG2, а в сборке без OpenCV - движок на NumPy
+        self.detector_name = default_detector()
+        # Движок, выбранный во время трекинга: его ставит стадия детекции
+        self._pending_detector: Optional[Tuple[str, MotionDetector]] = None
         self.motion_detected = False
-        self.motion_history = []
         self.max_history = 50
         
-        # Статистика
-        self.stats = {
-            'frames_processed': 0,
-            'motion_detections': 0,
-            'fps': 0,
-            'last_motion_time': 0
-        }
+        # История кадров: 10 минут при 30 FPS
+        self.history = MotionHistory(capacity=18000)
+        
+        # Статистика: неизменяемый снимок, заменяется раз в кадр
+        self.stats_publisher = StatsPublisher(TrackerStats())
+        self._motion_detections = 0
+        self._last_motion_time = 0.0
         
         # Настройки детекции
         self.sensitivity = 50  # Чувствительность (0-100)
         self.min_area = 500   # Минимальная площадь для детекции
         
-        # Поток обработки
-        self.processing_thread = None
+        # Получение кадров: MOG2 не требует цвета, поэтому по умолчанию
+        # работаем с яркостью и не создаем BGR копию
+        self.frame_acquirer = FrameAcquirer(color_mode='gray')
+        
+        # Разрешение обработки (1, 1/2, 1/4) и уточнение по тайлам
+        self.pyramid = DetectionPyramid(scale=1.0, coarse_to_fine=False)
+        
+        # Морфологическая очистка маски: кэш ядер и выходные буферы
+        self.morphology = MorphologyStage(size=3, shape='ellipse', merged=False)
+        
+        # Пятна движения последнего кадра (BLOB_DTYPE)
+        self.blob_extractor = BlobExtractor()
+        self.blobs = EMPTY_BLOBS
+        
+        # Треки объектов с постоянными ID и подписчики на их обновление
+        self.object_tracker = ObjectTracker(max_distance=80.0, max_misses=10)
+        self.track_listeners: List[Callable[[np.ndarray], None]] = []
+        self.frame_size = (0, 0)
+        
+        # Области интереса и сетка секторов
+        self.sectors = SectorGrid(rows=3, cols=3)
+        
+        # Планировщик кадров: дедлайны и снижение частоты в простое
+        self.scheduler = FrameScheduler(target_fps=30.0, idle_fps=5.0, idle_timeout=10.0)
+        
+        # Конвейер обработки: захват -> детекция -> публикация.
+        # Модель фона хранит состояние между кадрами, поэтому детекция
+        # выполняется одним потоком; захват идет параллельно с ней
+        self.pipeline = FramePipeline(
+            wait=self._wait_for_frame,
+            capture=self._capture_frame,
+            detect=self._detect_frame,
+            publish=self._publish_result,
+            release=self.frame_acquirer.release,
+            detect_workers=1,
+            queue_size=1
+        )
         self.stop_event = threading.Event()
+        self._frame_count = 0
+        
+        # Замеры стадий горячего пути (всегда включены, накладные расходы - микросекунды)
+        self.profiler = StageProfiler(PROFILE_STAGES)
+        
+        # Запись клипов по движению (включается enable_recording)
+        self.recorder: Optional[MotionRecorder] = None
+        
+        # Журнал событий движения на диске (включается enable_event_store)
+        self.event_store: Optional[EventStore] = None
+        
+        # Слоты кольцевого буфера: кадр в захвате, в очереди и в детекции
+        self.frame_acquirer.ring.set_slots(self.pipeline.queue_size + self.pipeline.detect_workers + 1)
         
         Logger.info("MotionTracker: Инициализирован")
     
     def initialize_camera(self, camera_index: int = 0) -> bool:
         """Инициализация камеры"""
+        # Для Android используем Camera API через Kivy
+        source = KivyCameraSource(index=camera_index, resolution=(640, 480))
+        if not self.set_source(source):
+            return False
+        
+        self.camera = source.camera
+        Logger.info(f"MotionTracker: Камера {camera_index} инициализирована")
+        return True
+    
+    def initialize_uvc_camera(self, location, resolution: Tuple[int, int] = (1280, 720),
+                              fps: float = 30.0) -> bool:
+        """Инициализация внешней USB камеры (индекс или /dev/videoN) без чтения текстуры"""
+        source = UvcCameraSource(location, resolution=resolution, fps=fps)
+        if not self.set_source(source):
+            return False
+        
+        Logger.info(f"MotionTracker: USB камера {location} инициализирована")
+        return True
+    
+    def set_source(self, source: FrameSource) -> bool:
+        """Установка источника кадров (камера, видеофайл, изображения)"""
         try:
-            # Для Android используем Camera API через Kivy
-            from kivy.core.camera import Camera as KivyCamera
+            if not source.is_open and not source.open():
+                return False
             
-            self.camera = KivyCamera(index=camera_index, resolution=(640, 480))
-            self.camera.play = True
+            if self.source and self.source is not source:
+                self.source.close()
+            self.source = source
+            self.camera = None
+            
+            # Обрабатываем кадры по мере поступления, если источник о них сообщает
+            source.set_frame_callback(self.scheduler.notify_frame)
+            self.scheduler.frame_events_supported = source.frame_events_supported
             
             # Инициализируем детектор фона
-            self.background_subtractor = cv2.createBackgroundSubtractorMOG2(
-                detectShadows=True,
-                varThreshold=50
-            )
+            if not self.detector and not self.set_detector(self.detector_name):
+                return False
             
-            Logger.info(f"MotionTracker: Камера {camera_index} инициализирована")
             return True
             
         except Exception as e:
-            Logger.error(f"MotionTracker: Ошибка инициализации камеры: {e}")
+            Logger.error(f"MotionTracker: Ошибка инициализации источника кадров: {e}")
             return False
     
     def start(self) -> bool:
@@ -70,17 +182,23 @@ class MotionTracker:
             Logger.warning("MotionTracker: Трекинг уже запущен")
             return False
         
-        if not self.camera:
+        if not self.source:
             Logger.error("MotionTracker: Камера не инициализирована")
             return False
         
+        if not self.source.is_open and not self.source.open():
+            Logger.error("MotionTracker: Не удалось открыть источник кадров")
+            return False
+        
         self.is_running = True
         self.stop_event.clear()
+        self.scheduler.reset()
+        self._frame_count = 0
         
-        # Запускаем поток обработки
-        self.processing_thread = threading.Thread(target=self._processing_loop)
-        self.processing_thread.daemon = True
-        self.processing_thread.start()
+        # Запускаем конвейер обработки
+        self.pipeline.start()
+        if self.recorder:
+            self.recorder.start()
         
         Logger.info("MotionTracker: Трекинг запущен")
         return True
@@ -92,12 +210,21 @@ class MotionTracker:
         
         self.is_running = False
         self.stop_event.set()
+        self.scheduler.wake()
+        self.pipeline.stop(timeout=2.0)
+        if self.recorder:
+            self.recorder.stop()
+        self.profiler.close()
         
-        if self.processing_thread and self.processing_thread.is_alive():
-            self.processing_thread.join(timeout=2.0)
+        # Движок, выбранный после последнего кадра, ставим сразу
+        pending = self._pending_detector
+        if pending is not None:
+            self._pending_detector = None
+            self._install_detector(*pending)
+            self.stats_publisher.publish(self.stats_publisher.snapshot._replace(detector=pending[0]))
         
-        if self.camera:
-            self.camera.play = False
+        if self.source:
+            self.source.close()
         
         Logger.info("MotionTracker: Трекинг остановлен")
     
@@ -111,103 +238,195 @@ class MotionTracker:
         self.is_paused = False
         Logger.info("MotionTracker: Трекинг возобновлен")
     
-    def _processing_loop(self):
-        """Основной цикл обработки кадров"""
-        frame_count = 0
-        start_time = time.time()
+    def reset(self) -> bool:
+        """Сброс модели фона, треков, истории и статистики (при остановленном трекинге)"""
+        if self.is_running:
+            Logger.warning("MotionTracker: Сброс во время трекинга невозможен")
+            return False
+        
+        self.set_detector(self.detector_name)
+        self.object_tracker.reset()
+        self.history.clear()
+        self.blobs = EMPTY_BLOBS
+        self.motion_detected = False
+        self._frame_count = 0
+        self._motion_detections = 0
+        self._last_motion_time = 0.0
+        self.stats_publisher.publish(TrackerStats(detector=self.detector_name))
+        
+        Logger.info("MotionTracker: Трекинг сброшен")
+        return True
+    
+    def _wait_for_frame(self) -> bool:
+        """Ожидание свежего кадра для стадии захвата"""
+        if self.is_paused or not self.is_running:
+            self.stop_event.wait(0.1)
+            return False
+        
+        # Ждем дедлайн и свежий кадр; устаревшие кадры отбрасываются
+        if not self.scheduler.wait_for_frame(self.stop_event):
+            return False
         
-        while self.is_running and not self.stop_event.is_set():
-            if self.is_paused:
-                time.sleep(0.1)
-                continue
+        if not self.source or not self.source.has_frame():
+            self.stop_event.wait(self.scheduler.frame_interval)
+            return False
+        
+        return True
+    
+    def _capture_frame(self) -> Optional[np.ndarray]:
+        """Стадия захвата: получение кадра из источника"""
+        self.scheduler.begin_frame()
+        frame = self._read_source_frame()
+        
+        # Время захвата вычитается из паузы до следующего кадра
+        self.scheduler.end_frame()
+        return frame
+    
+    def _read_source_frame(self) -> Optional[np.ndarray]:
+        """Чтение кадра из источника и приведение к режиму цвета детектора"""
+        try:
+            start = self.profiler.now()
+            image = self.source.read()
+            if image is None:
+                return None
+            start = self.profiler.mark('readback', start)
+            
+            frame = self.frame_acquirer.from_image(image, self.source.pixel_format,
+                                                   readback_bytes=self.source.read_bytes)
+            self.profiler.mark('convert', start)
+            
+            # Исходный цветной кадр уходит в запись без копирования
+            recorder = self.recorder
+            if recorder:
+                recorder.submit(image, self.source.pixel_format, time.monotonic())
+            return frame
             
+        except Exception as e:
+            Logger.error(f"MotionTracker: Ошибка чтения кадра: {e}")
+            return None
+    
+    def _publish_result(self, item: PipelineItem):
+        """Стадия публикации: обновление статистики по результату детекции"""
+        publish_start = self.profiler.now()
+        result = item.data
+        motion_detected = result.motion_detected
+        self.scheduler.report_motion(motion_detected)
+        active_sectors = np.flatnonzero(result.sector_scores > self.sectors.activity_threshold).tolist()
+        
+        # Записываем кадр в историю
+        width, height = result.frame_size
+        frame_area = width * height
+        score = float(result.blobs['area'].sum()) / frame_area if frame_area else 0.0
+        self.history.append(time.time(), motion_detected, score, len(result.blobs),
+                            (time.monotonic() - item.captured_at) * 1000.0)
+        
+        # Связываем пятна в треки и уведомляем подписчиков
+        start = self.profiler.now()
+        tracks = self.object_tracker.update(result.blobs, item.captured_at)
+        for listener in self.track_listeners:
             try:
-                # Получаем кадр от камеры
-                if not self.camera or not self.camera.texture:
-                    time.sleep(0.033)  # ~30 FPS
-                    continue
-                
-                # Конвертируем текстуру Kivy в numpy array
-                frame = self._texture_to_numpy(self.camera.texture)
-                if frame is None:
-                    continue
-                
-                # Обрабатываем кадр
-                motion_detected = self._process_frame(frame)
-                
-                # Обновляем статистику
-                frame_count += 1
-                self.stats['frames_processed'] = frame_count
-                
-                if motion_detected:
-                    self.stats['motion_detections'] += 1
-                    self.stats['last_motion_time'] = time.time()
-                
-                # Вычисляем FPS каждые 30 кадров
-                if frame_count % 30 == 0:
-                    elapsed = time.time() - start_time
-                    self.stats['fps'] = frame_count / elapsed if elapsed > 0 else 0
-                
-                # Контроль FPS
-                time.sleep(0.033)  # ~30 FPS
-                
+                listener(tracks)
             except Exception as e:
-                Logger.error(f"MotionTracker: Ошибка в цикле обработки: {e}")
-                time.sleep(0.1)
+                Logger.error(f"MotionTracker: Ошибка обработчика треков: {e}")
+        self.profiler.mark('tracking', start)
+        
+        self._frame_count += 1
+        if motion_detected:
+            self._motion_detections += 1
+            self._last_motion_time = time.time()
+            recorder = self.recorder
+            if recorder:
+                recorder.trigger(item.captured_at)
+            event_store = self.event_store
+            if event_store:
+                event_store.record(time.time(), active_sectors, result.blobs, score, result.thumbnail)
+        
+        # Один снимок на кадр; FPS по скользящему окну истории.
+        # Массивы кадра свежие, снимок отдает их подписчикам только для чтения
+        scheduler = self.scheduler
+        result.sector_scores.flags.writeable = False
+        result.blobs.flags.writeable = False
+        tracks.flags.writeable = False
+        self.stats_publisher.publish(TrackerStats(
+            frames_processed=self._frame_count,
+            motion_detections=self._motion_detections,
+            motion_detected=motion_detected,
+            fps=self.history.fps(seconds=2.0),
+            last_motion_time=self._last_motion_time,
+            bytes_per_frame=self.frame_acquirer.bytes_per_frame,
+            detector=self.detector_name,
+            detector_cost_ms=self.detector.cost_ms,
+            sectors=result.sector_scores,
+            active_sectors=tuple(active_sectors),
+            blob_count=len(result.blobs),
+            track_count=len(tracks),
+            blobs=result.blobs,
+            tracks=tracks,
+            frame_size=result.frame_size,
+            target_fps=scheduler.current_fps,
+            idle=scheduler.is_idle,
+            frames_dropped=scheduler.frames_dropped,
+            processing_ms=result.processing_ms,
+            capture_ms=scheduler.last_processing_time * 1000.0,
+            timestamp=time.time()
+        ))
+        self.profiler.mark('publish', publish_start)
     
     def _texture_to_numpy(self, texture) -> Optional[np.ndarray]:
         """Конвертация текстуры Kivy в numpy array"""
         try:
-            if not texture:
-                return None
-            
-            # Получаем данные текстуры
-            pixels = texture.pixels
-            if not pixels:
-                return None
-            
-            # Конвертируем в numpy array
-            # Kivy использует формат RGBA, OpenCV ожидает BGR
-            width, height = texture.size
-            frame = np.frombuffer(pixels, dtype=np.uint8)
-            frame = frame.reshape((height, width, 4))  # RGBA
-            
-            # Конвертируем RGBA в BGR
-            frame = cv2.cvtColor(frame, cv2.COLOR_RGBA2BGR)
-            
-            return frame
+            # Кадр пишется в предвыделенный кольцевой буфер;
+            # BGR копия создается только в режиме 'bgr'
+            return self.frame_acquirer.from_texture(texture)
             
         except Exception as e:
             Logger.error(f"MotionTracker: Ошибка конвертации текстуры: {e}")
             return None
     
+    def set_color_mode(self, color_mode: str):
+        """Установка режима цвета кадра ('bgr', 'gray', 'channel', 'rgba')"""
+        self.frame_acquirer.set_color_mode(color_mode)
+    
     def _process_frame(self, frame: np.ndarray) -> bool:
         """Обработка кадра для детекции движения"""
         try:
-            # Применяем детектор фона
-            fg_mask = self.background_subtractor.apply(frame)
+            # Применяем детектор фона на разрешении обработки;
+            # области вне ROI отрезаются до детектора
+            frame_start = start = self.profiler.now()
+            if frame.shape[1] != self.frame_size[0] or frame.shape[0] != self.frame_size[1]:
+                self.frame_size = (frame.shape[1], frame.shape[0])
+            small_frame = self.pyramid.downscale(frame)
+            start = self.profiler.mark('downscale', start)
+            fg_mask = self.detector.apply(self.sectors.crop(small_frame))
+            start = self.profiler.mark('detector', start)
             
             # Морфологические операции для очистки маски
-            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-            fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, kernel)
-            fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, kernel)
-            
-            # Находим контуры
-            contours, _ = cv2.findContours(fg_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            fg_mask = self.morphology.apply(fg_mask)
+            start = self.profiler.mark('morphology', start)
             
-            motion_detected = False
+            # Маска рамки ROI -> маска кадра; активность секторов одним проходом
+            fg_mask = self.sectors.expand(fg_mask)
+            self.sectors.score(fg_mask)
+            start = self.profiler.mark('sectors', start)
             
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                if area > self.min_area:
-                    motion_detected = True
-                    break
+            # Пятна движения одним проходом вместо цикла по контурам;
+            # площадь пересчитывается в полное разрешение, чтобы min_area не менял смысл
+            self.blobs = self.blob_extractor.extract(fg_mask, self.min_area, self.pyramid.scale)
+            motion_detected = len(self.blobs) > 0
+            start = self.profiler.mark('blobs', start)
             
-            # Обновляем историю движения
-            self.motion_history.append(motion_detected)
-            if len(self.motion_history) > self.max_history:
-                self.motion_history.pop(0)
+            # Уточнение на тайлах полного разрешения, где сработала грубая маска
+            if self.pyramid.coarse_to_fine:
+                if motion_detected:
+                    motion_detected = self.pyramid.refine(fg_mask, frame, self.min_area)
+                    if not motion_detected:
+                        # Уточнение отвергло грубые пятна: треки их не получат
+                        self.blobs = EMPTY_BLOBS
+                else:
+                    self.pyramid.remember(frame)
+                self.profiler.mark('refine', start)
             
+            self.profiler.mark('process_frame', frame_start)
             self.motion_detected = motion_detected
             return motion_detected
             
@@ -215,21 +434,219 @@ class MotionTracker:
             Logger.error(f"MotionTracker: Ошибка обработки кадра: {e}")
             return False
     
+    def _detect_frame(self, frame: np.ndarray) -> DetectionResult:
+        """Стадия детекции: обработка кадра и снимок результата"""
+        start = time.perf_counter()
+        pending = self._pending_detector
+        if pending is not None:
+            self._pending_detector = None
+            self._install_detector(*pending)
+        self.profiler.begin_frame()
+        motion_detected = self._process_frame(frame)
+        self.profiler.end_frame()
+        
+        # Миниатюра только для событий, которые журнал запишет
+        thumbnail = None
+        event_store = self.event_store
+        if motion_detected and event_store and event_store.accepts(time.time()):
+            thumbnail = event_store.make_thumbnail(frame)
+        return DetectionResult(motion_detected, self.sectors.scores.copy(), self.blobs, thumbnail,
+                               (time.perf_counter() - start) * 1000.0, self.frame_size)
+    
+    def process_next_frame(self) -> Optional[DetectionResult]:
+        """Синхронная обработка следующего кадра источника стадиями конвейера
+        
+        Чтение, детекция и публикация снимка в вызывающем потоке; для пакетной
+        обработки и замеров при остановленном трекере. None, если кадра нет.
+        """
+        captured_at = time.monotonic()
+        frame = self._read_source_frame()
+        if frame is None:
+            return None
+        
+        try:
+            result = self._detect_frame(frame)
+        finally:
+            self.frame_acquirer.release(frame)
+        self._publish_result(PipelineItem(self._frame_count, captured_at, result))
+        return result
+    
+    @property
+    def stats(self) -> TrackerStats:
+        """Последний снимок статистики (без блокировок и копирования)"""
+        return self.stats_publisher.snapshot
+    
+    def add_stats_listener(self, callback: StatsListener):
+        """Подписка на снимки статистики (вызывается в потоке публикации раз в кадр)"""
+        self.stats_publisher.add_listener(callback)
+    
+    def remove_stats_listener(self, callback: StatsListener):
+        """Отписка от снимков статистики"""
+        self.stats_publisher.remove_listener(callback)
+    
     def get_stats(self) -> Dict:
         """Получение статистики трекинга"""
-        return self.stats.copy()
+        stats = self.stats_publisher.snapshot.as_dict()
+        stats['pipeline'] = self.pipeline.get_stats()
+        stats['stages'] = self.profiler.get_stats()
+        if self.recorder:
+            stats['recorder'] = self.recorder.get_stats()
+        if self.event_store:
+            stats['events'] = self.event_store.get_stats()
+        return stats
+    
+    def set_profiling(self, enabled: bool = True, sample_every: int = 0, sample_frames: int = 1,
+                      mode: str = 'cprofile', output_dir: Optional[str] = None):
+        """Замеры стадий и выборочные дампы ('cprofile' или 'trace') каждые sample_every кадров"""
+        self.profiler.enabled = enabled
+        self.profiler.configure_sampling(sample_every if enabled else 0, sample_frames,
+                                         mode, output_dir)
+    
+    def reset_profiling(self):
+        """Сброс гистограмм стадий"""
+        self.profiler.reset()
+    
+    def enable_recording(self, output_dir: str, pre_roll: float = 3.0, cooldown: float = 5.0,
+                         fps: float = 15.0, clip_callback: Optional[Callable[[str], None]] = None) -> bool:
+        """Запись клипов по движению с предзаписью pre_roll секунд в output_dir"""
+        self.disable_recording()
+        if not MotionRecorder.is_available():
+            Logger.error("MotionTracker: Запись клипов недоступна без OpenCV")
+            return False
+        recorder = MotionRecorder(output_dir, pre_roll=pre_roll, cooldown=cooldown, fps=fps)
+        recorder.clip_callback = clip_callback
+        if self.is_running and not recorder.start():
+            return False
+        
+        self.recorder = recorder
+        return True
+    
+    def disable_recording(self):
+        """Выключение записи; открытый клип закрывается"""
+        if self.recorder:
+            self.recorder.stop()
+            self.recorder = None
+    
+    def enable_event_store(self, path: str, thumbnails: bool = True, min_interval: float = 0.5) -> bool:
+        """Запись событий движения в SQLite журнал path"""
+        self.disable_event_store()
+        event_store = EventStore(path, min_interval=min_interval, thumbnails=thumbnails)
+        if not event_store.open():
+            return False
+        
+        self.event_store = event_store
+        return True
+    
+    def disable_event_store(self):
+        """Выключение журнала; события из очереди дописываются"""
+        if self.event_store:
+            event_store = self.event_store
+            self.event_store = None
+            event_store.close()
+    
+    def get_events(self, seconds: Optional[float] = None, sector: Optional[int] = None,
+                   limit: int = 100) -> List[Dict]:
+        """События журнала за последние seconds секунд (и в секторе), от новых к старым"""
+        if not self.event_store:
+            return []
+        start = time.time() - seconds if seconds is not None else None
+        return self.event_store.query(start=start, sector=sector, limit=limit)
     
     def get_motion_status(self) -> bool:
         """Получение текущего статуса движения"""
         return self.motion_detected
     
+    def get_blobs(self) -> np.ndarray:
+        """Пятна движения последнего кадра: рамки, центры и площади (BLOB_DTYPE)"""
+        return self.blobs
+    
+    def get_tracks(self) -> np.ndarray:
+        """Текущие треки объектов (TRACK_DTYPE): ID, рамка, скорость, время"""
+        return self.object_tracker.tracks
+    
+    def add_track_listener(self, callback: Callable[[np.ndarray], None]):
+        """Подписка на обновление треков (например, для команд ESP32)"""
+        if callback not in self.track_listeners:
+            self.track_listeners.append(callback)
+    
+    def remove_track_listener(self, callback: Callable[[np.ndarray], None]):
+        """Отписка от обновления треков"""
+        if callback in self.track_listeners:
+            self.track_listeners.remove(callback)
+    
     def set_sensitivity(self, value: int):
         """Установка чувствительности детекции (0-100)"""
         self.sensitivity = max(0, min(100, value))
         # Адаптируем параметры детектора под чувствительность
-        if self.background_subtractor:
-            threshold = int(50 * (100 - self.sensitivity) / 100)
-            self.background_subtractor.setVarThreshold(threshold)
+        if self.detector:
+            self.detector.set_sensitivity(self.sensitivity)
+    
+    def set_detector(self, name: str) -> bool:
+        """Выбор движка детекции ('mog2', 'knn', 'diff', 'running_avg')"""
+        detector = create_detector(name, sensitivity=self.sensitivity)
+        if detector is None:
+            return False
+        
+        if self.pipeline.is_running:
+            # Движок заменит стадия детекции перед следующим кадром, а имя в
+            # снимке опубликует стадия публикации - единственный издатель
+            self._pending_detector = (name, detector)
+        else:
+            self._install_detector(name, detector)
+            self.stats_publisher.publish(self.stats_publisher.snapshot._replace(detector=name))
+        
+        Logger.info(f"MotionTracker: Движок детекции: {detector.title}")
+        return True
+    
+    def _install_detector(self, name: str, detector: MotionDetector):
+        """Установка движка (поток детекции или остановленный трекер)"""
+        # Чувствительность могла измениться, пока движок ждал установки
+        detector.set_sensitivity(self.sensitivity)
+        self.detector = detector
+        self.detector_name = name
+        
+        # BGR копию создаем только для движков, которым нужен цвет
+        self.frame_acquirer.set_color_mode('bgr' if detector.needs_color else 'gray')
+    
+    def select_detector_for_fps(self, frames: List[np.ndarray], target_fps: float) -> Optional[str]:
+        """Выбор движка, укладывающегося в целевой FPS, по замеру на образцах кадров"""
+        samples = [self.pyramid.downscale(frame).copy() for frame in frames]
+        name = select_detector(measure_detector_costs(samples), target_fps)
+        if name:
+            self.set_detector(name)
+        return name
+    
+    def set_processing_scale(self, scale: float, coarse_to_fine: Optional[bool] = None):
+        """Установка масштаба обработки (1, 0.5, 0.25) и режима уточнения"""
+        self.pyramid.set_scale(scale)
+        if coarse_to_fine is not None:
+            self.pyramid.coarse_to_fine = coarse_to_fine
+    
+    def set_frame_rate(self, target_fps: float, idle_fps: Optional[float] = None,
+                       idle_timeout: Optional[float] = None):
+        """Установка целевой частоты кадров и параметров режима простоя"""
+        self.scheduler.target_fps = max(1.0, target_fps)
+        if idle_fps is not None:
+            self.scheduler.idle_fps = max(0.5, idle_fps)
+        if idle_timeout is not None:
+            self.scheduler.idle_timeout = max(0.0, idle_timeout)
+    
+    def set_sector_grid(self, rows: int, cols: int):
+        """Установка размера сетки секторов"""
+        self.sectors.set_grid(rows, cols)
+    
+    def set_roi(self, include: Optional[List[Polygon]] = None,
+                exclude: Optional[List[Polygon]] = None):
+        """Установка областей интереса (полигоны в координатах 0..1)"""
+        self.sectors.set_roi(include, exclude)
+    
+    def get_sector_activity(self) -> List[List[float]]:
+        """Активность по секторам последнего кадра"""
+        return self.stats_publisher.snapshot.sectors.tolist()
+    
+    def set_morphology(self, size: int = 3, shape: str = 'ellipse', merged: Optional[bool] = None):
+        """Установка ядра морфологии ('ellipse', 'rect', 'cross') и объединения проходов"""
+        self.morphology.configure(size, shape, merged)
     
     def set_min_area(self, value: int):
         """Установка минимальной площади для детекции"""
@@ -237,4 +654,10 @@ class MotionTracker:
     
     def get_motion_history(self) -> List[bool]:
         """Получение истории движения"""
-        return self.motion_history.copy()
\ No newline at end of file
+        return self.history.last(self.max_history)['motion'].tolist()
+    
+    def get_history(self, seconds: Optional[float] = None) -> np.ndarray:
+        """Записи истории (HISTORY_DTYPE) за последние seconds секунд без копирования"""
+        if seconds is None:
+            return self.history.last()
+        return self.history.window(seconds)
\ No newline at end of file
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Трекинг объектов поверх пятен движения
+Связывание пятен между кадрами в треки с постоянными ID
+"""
+
+import numpy as np
+from typing import Optional, Tuple
+from kivy.logger import Logger
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    # Без SciPy используется жадное сопоставление
+    linear_sum_assignment = None
+
+# Трек объекта в координатах полного разрешения кадра
+TRACK_DTYPE = np.dtype([
+    ('id', np.int32),
+    ('x', np.int32),          # Рамка последнего сопоставленного пятна
+    ('y', np.int32),
+    ('w', np.int32),
+    ('h', np.int32),
+    ('cx', np.float32),       # Центр
+    ('cy', np.float32),
+    ('vx', np.float32),       # Скорость, пикселей в секунду
+    ('vy', np.float32),
+    ('first_seen', np.float64),
+    ('last_seen', np.float64),
+    ('hits', np.int32),       # Число кадров с сопоставлением
+    ('misses', np.int32)      # Кадров подряд без сопоставления
+])
+
+class ObjectTracker:
+    """Трекер по центрам или IoU с жадным или венгерским сопоставлением"""
+
+    def __init__(self, max_distance: float = 80.0, max_misses: int = 10,
+                 metric: str = 'centroid', method: str = 'greedy',
+                 min_iou: float = 0.1, velocity_smoothing: float = 0.5):
+        self.max_distance = max_distance  # Макс. смещение центра между кадрами, пикс.
+        self.max_misses = max_misses      # Кадров без сопоставления до удаления трека
+        self.metric = metric              # 'centroid' или 'iou'
+        self.method = method              # 'greedy' или 'hungarian'
+        self.min_iou = min_iou
+        self.velocity_smoothing = velocity_smoothing
+
+        self.tracks = np.zeros(0, dtype=TRACK_DTYPE)
+        self.next_id = 1
+        self.last_timestamp: Optional[float] = None
+        self._timestamp: Optional[float] = None
+
+        if method == 'hungarian' and linear_sum_assignment is None:
+            Logger.warning("ObjectTracker: SciPy недоступен, используем жадное сопоставление")
+            self.method = 'greedy'
+
+    def reset(self):
+        """Сброс всех треков"""
+        self.tracks = np.zeros(0, dtype=TRACK_DTYPE)
+        self.last_timestamp = None
+
+    def _cost_matrix(self, blobs: np.ndarray) -> Tuple[np.ndarray, float]:
+        """Матрица стоимости треки x пятна и порог допустимой стоимости"""
+        tracks = self.tracks
+        if self.metric == 'iou':
+            tx1 = tracks['x'][:, None].astype(np.float32)
+            ty1 = tracks['y'][:, None].astype(np.float32)
+            tx2 = tx1 + tracks['w'][:, None]
+            ty2 = ty1 + tracks['h'][:, None]
+            bx1 = blobs['x'][None, :].astype(np.float32)
+            by1 = blobs['y'][None, :].astype(np.float32)
+            bx2 = bx1 + blobs['w'][None, :]
+            by2 = by1 + blobs['h'][None, :]
+
+            inter = (np.clip(np.minimum(tx2, bx2) - np.maximum(tx1, bx1), 0, None) *
+                     np.clip(np.minimum(ty2, by2) - np.maximum(ty1, by1), 0, None))
+            union = (tx2 - tx1) * (ty2 - ty1) + (bx2 - bx1) * (by2 - by1) - inter
+            iou = inter / np.maximum(union, 1.0)
+            return 1.0 - iou, 1.0 - self.min_iou
+
+        # Предсказываем положение трека по скорости: трек, пропустивший
+        # кадры, смещается за все время с последнего сопоставления
+        dt = self._timestamp - tracks['last_seen']
+        px = tracks['cx'] + tracks['vx'] * dt
+        py = tracks['cy'] + tracks['vy'] * dt
+        dx = px[:, None] - blobs['cx'][None, :]
+        dy = py[:, None] - blobs['cy'][None, :]
+        return np.hypot(dx, dy), self.max_distance
+
+    def _assign(self, cost: np.ndarray, limit: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Пары (индекс трека, индекс пятна) со стоимостью не выше limit"""
+        if self.method == 'hungarian':
+            rows, cols = linear_sum_assignment(cost)
+            keep = cost[rows, cols] <= limit
+            return rows[keep], cols[keep]
+
+        # Жадно без цикла по парам: за проход принимаются взаимно
+        # ближайшие пары (трек и пятно - минимумы строки и столбца друг
+        # друга), затем их строки и столбцы исключаются. Результат тот же,
+        # что у перебора пар по возрастанию стоимости; проходов обычно 1-3
+        cost = np.where(cost <= limit, cost, np.inf)
+        all_rows = np.arange(cost.shape[0])
+        rows = []
+        cols = []
+        while True:
+            best_cols = np.argmin(cost, axis=1)
+            best_rows = np.argmin(cost, axis=0)
+            mutual = ((best_rows[best_cols] == all_rows) &
+                      np.isfinite(cost[all_rows, best_cols]))
+            if not mutual.any():
+                break
+            pair_rows = np.flatnonzero(mutual)
+            pair_cols = best_cols[pair_rows]
+            rows.append(pair_rows)
+            cols.append(pair_cols)
+            cost[pair_rows, :] = np.inf
+            cost[:, pair_cols] = np.inf
+        if not rows:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        return np.concatenate(rows), np.concatenate(cols)
+
+    def update(self, blobs: np.ndarray, timestamp: float) -> np.ndarray:
+        """Обновление треков пятнами нового кадра (BLOB_DTYPE)"""
+        self._timestamp = timestamp
+        tracks = self.tracks.copy()
+
+        if len(tracks) and len(blobs):
+            cost, limit = self._cost_matrix(blobs)
+            rows, cols = self._assign(cost, limit)
+        else:
+            rows = cols = np.zeros(0, dtype=np.intp)
+
+        matched = np.zeros(len(tracks), dtype=bool)
+        matched[rows] = True
+        used = np.zeros(len(blobs), dtype=bool)
+        used[cols] = True
+
+        # Сопоставленные треки: положение, скорость, время
+        if len(rows):
+            matched_blobs = blobs[cols]
+            dt = timestamp - tracks['last_seen'][rows]
+            safe_dt = np.where(dt > 0, dt, 1.0)
+            vx = np.where(dt > 0, (matched_blobs['cx'] - tracks['cx'][rows]) / safe_dt, 0.0)
+            vy = np.where(dt > 0, (matched_blobs['cy'] - tracks['cy'][rows]) / safe_dt, 0.0)
+            alpha = self.velocity_smoothing
+            tracks['vx'][rows] = tracks['vx'][rows] * (1 - alpha) + vx * alpha
+            tracks['vy'][rows] = tracks['vy'][rows] * (1 - alpha) + vy * alpha
+            for field in ('x', 'y', 'w', 'h', 'cx', 'cy'):
+                tracks[field][rows] = matched_blobs[field]
+            tracks['last_seen'][rows] = timestamp
+            tracks['hits'][rows] += 1
+            tracks['misses'][rows] = 0
+
+        # Несопоставленные треки стареют и удаляются
+        tracks['misses'][~matched] += 1
+        tracks = tracks[tracks['misses'] <= self.max_misses]
+
+        # Новые треки из несопоставленных пятен
+        new_blobs = blobs[~used]
+        if len(new_blobs):
+            new_tracks = np.zeros(len(new_blobs), dtype=TRACK_DTYPE)
+            new_tracks['id'] = np.arange(self.next_id, self.next_id + len(new_blobs))
+            for field in ('x', 'y', 'w', 'h', 'cx', 'cy'):
+                new_tracks[field] = new_blobs[field]
+            new_tracks['first_seen'] = timestamp
+            new_tracks['last_seen'] = timestamp
+            new_tracks['hits'] = 1
+            self.next_id += len(new_blobs)
+            tracks = np.concatenate((tracks, new_tracks))
+
+        self.tracks = tracks
+        self.last_timestamp = timestamp
+        return tracks
+
+    def confirmed(self, min_hits: int = 3) -> np.ndarray:
+        """Треки, подтвержденные несколькими кадрами и видимые сейчас"""
+        tracks = self.tracks
+        return tracks[(tracks['hits'] >= min_hits) & (tracks['misses'] == 0)]
+
+def dwell_time(tracks: np.ndarray) -> np.ndarray:
+    """Время присутствия каждого трека в кадре, сек"""
+    return tracks['last_seen'] - tracks['first_seen']
+
+def format_track_command(track, frame_size: Tuple[int, int]) -> str:
+    """Команда для ESP32 по треку: 'TRACK:<id>:<x%>:<y%>' (центр в процентах кадра)"""
+    width, height = frame_size
+    x = int(round(100.0 * float(track['cx']) / max(1, width)))
+    y = int(round(100.0 * float(track['cy']) / max(1, height)))
+    return f"TRACK:{int(track['id'])}:{x}:{y}"
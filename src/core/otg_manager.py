@@ -7,30 +7,87 @@
 
 import threading
 import time
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set
 from kivy.logger import Logger
 
+from .serial_transport import SerialTransport, open_port, parse_telemetry
+from .esp32_protocol import BinaryCodec
+from .usb_hotplug import HotplugMonitor, create_hotplug_monitor
+from .device_registry import DeviceMatcher, DeviceRegistry
+
+if TYPE_CHECKING:
+    from .frame_sources import UvcCameraSource
+
 class OTGDevice:
     """Класс для представления OTG устройства"""
     
-    def __init__(self, device_id: str, device_type: str, name: str):
+    __slots__ = ('device_id', 'device_type', 'name', 'vendor_id', 'product_id',
+                 '_connected', 'last_seen', 'data', 'registry')
+    
+    def __init__(self, device_id: str, device_type: str, name: str,
+                 vendor_id: int = 0, product_id: int = 0):
         self.device_id = device_id
         self.device_type = device_type  # 'esp32', 'camera', 'other'
         self.name = name
-        self.connected = False
+        self.vendor_id = vendor_id
+        self.product_id = product_id
+        self._connected = False
         self.last_seen = time.time()
         self.data = {}
+        self.registry: Optional[DeviceRegistry] = None  # Реестр, чьи индексы обновлять
+    
+    @property
+    def connected(self) -> bool:
+        return self._connected
+    
+    @connected.setter
+    def connected(self, value: bool):
+        if value != self._connected:
+            self._connected = value
+            if self.registry is not None:
+                self.registry.set_connected(self, value)
+    
+    def touch(self):
+        """Отметка присутствия устройства"""
+        self.last_seen = time.time()
+        if self.registry is not None:
+            self.registry.touch(self)
     
     def update_data(self, data: Dict):
         """Обновление данных устройства"""
         self.data.update(data)
-        self.last_seen = time.time()
+        self.touch()
 
 class OTGManager:
     """Менеджер OTG устройств для Android"""
     
+    # Опрос шины без событий hotplug: интервал удваивается, пока ничего не меняется
+    POLL_INTERVAL_MIN = 2.0
+    POLL_INTERVAL_MAX = 30.0
+    
+    # С событиями hotplug: проверка состояния и редкое контрольное сканирование
+    STATUS_INTERVAL = 5.0
+    RESCAN_INTERVAL = 60.0
+    
+    # Устройство без открытого порта, не появлявшееся на шине столько секунд,
+    # удаляется из реестра (пропущенное событие отключения)
+    STALE_TIMEOUT = 3 * RESCAN_INTERVAL
+    
     def __init__(self):
-        self.devices = {}
+        self.registry = DeviceRegistry()
+        self.devices = self.registry.devices  # device_id -> OTGDevice, только чтение
+        self.lock = threading.RLock()  # Реестр меняют поток мониторинга и события hotplug
+        self.device_listeners: List[Callable[[str, OTGDevice], None]] = []
+        self.user_disconnected: Set[str] = set()  # Отключены по запросу: не подключать автоматически
+        self.hotplug: Optional[HotplugMonitor] = None
+        self.transports: Dict[str, SerialTransport] = {}
+        self.esp32_port: Optional[str] = None  # Порт ESP32 вручную (tty, pty, 'usb:VID:PID')
+        self.baud_rate = 115200
+        self.esp32_protocol = 'text'  # 'text' или 'binary' (esp32_protocol)
+        self.esp32_require_acks = False
+        self.camera_sources: Dict[str, 'UvcCameraSource'] = {}
+        self.camera_resolution = (1280, 720)  # Запрашиваемые у USB камеры режимы
+        self.camera_fps = 30.0
         self.is_monitoring = False
         self.monitor_thread = None
         self.stop_event = threading.Event()
@@ -38,6 +95,7 @@ class OTGManager:
         # Поддерживаемые типы устройств
         self.supported_devices = {
             'esp32': {
+                'usb_ids': [(0x303A, 0x1001)],  # Встроенный USB ESP32-S3/C3
                 'vendor_ids': [0x10C4, 0x1A86],  # CP2102, CH340
                 'product_names': ['CP2102', 'CH340', 'USB Serial']
             },
@@ -46,6 +104,7 @@ class OTGManager:
                 'product_names': ['USB Camera', 'Webcam']
             }
         }
+        self.matcher = DeviceMatcher(self.supported_devices)
         
         Logger.info("OTGManager: Инициализирован")
     
@@ -80,45 +139,147 @@ class OTGManager:
     
     def _monitoring_loop(self):
         """Основной цикл мониторинга устройств"""
-        while self.is_monitoring and not self.stop_event.is_set():
-            try:
-                # Сканируем подключенные устройства
-                self._scan_devices()
-                
-                # Проверяем состояние существующих устройств
-                self._check_device_status()
-                
-                # Пауза между сканированиями
-                time.sleep(2.0)
-                
-            except Exception as e:
-                Logger.error(f"OTGManager: Ошибка в цикле мониторинга: {e}")
-                time.sleep(1.0)
+        # События подключения приходят сразу; опрос шины - запасной вариант
+        self.hotplug = create_hotplug_monitor(self._on_hotplug)
+        if not self.hotplug:
+            Logger.info("OTGManager: События hotplug недоступны, опрос шины")
+        
+        poll_interval = self.POLL_INTERVAL_MIN
+        last_scan = time.monotonic()
+        self._scan_devices()
+        
+        try:
+            while self.is_monitoring and not self.stop_event.is_set():
+                try:
+                    if self.hotplug:
+                        # Реестр обновляется событиями; контрольное сканирование
+                        # только добавляет пропущенные устройства
+                        self.stop_event.wait(self.STATUS_INTERVAL)
+                        if time.monotonic() - last_scan >= self.RESCAN_INTERVAL:
+                            self._scan_devices(remove_missing=False)
+                            last_scan = time.monotonic()
+                    else:
+                        # Без изменений на шине опрашиваем все реже
+                        self.stop_event.wait(poll_interval)
+                        if self.stop_event.is_set():
+                            break
+                        changed = self._scan_devices()
+                        poll_interval = (self.POLL_INTERVAL_MIN if changed else
+                                         min(poll_interval * 2, self.POLL_INTERVAL_MAX))
+                    
+                    # Проверяем состояние существующих устройств
+                    self._evict_stale_devices()
+                    self._check_device_status()
+                    
+                except Exception as e:
+                    Logger.error(f"OTGManager: Ошибка в цикле мониторинга: {e}")
+                    self.stop_event.wait(1.0)
+        finally:
+            if self.hotplug:
+                self.hotplug.stop()
+                self.hotplug = None
     
-    def _scan_devices(self):
-        """Сканирование подключенных устройств"""
+    def _on_hotplug(self, action: str, info: Dict):
+        """Событие hotplug (поток источника событий)"""
+        if action == 'add':
+            self._device_attached(info)
+        elif action == 'remove':
+            self._device_detached(info['device_id'])
+    
+    def _scan_devices(self, remove_missing: bool = True) -> bool:
+        """Сканирование шины и сверка с реестром; True - реестр изменился"""
         try:
             # Для Android используем USB Host API
             devices = self._get_android_usb_devices()
+            if devices is None:
+                return False
+            
+            changed = False
+            seen = set()
+            for info in devices:
+                device_id = info.get('device_id')
+                if device_id:
+                    seen.add(device_id)
+                    changed |= self._device_attached(info)
             
-            for device in devices:
-                device_id = device.get('device_id')
-                if device_id and device_id not in self.devices:
-                    # Новое устройство
-                    device_type = self._identify_device_type(device)
-                    if device_type:
-                        otg_device = OTGDevice(
-                            device_id=device_id,
-                            device_type=device_type,
-                            name=device.get('name', 'Unknown Device')
-                        )
-                        self.devices[device_id] = otg_device
-                        Logger.info(f"OTGManager: Обнаружено устройство {device_type}: {device_id}")
+            # Устройства, пропавшие с шины
+            if remove_missing:
+                for device_id in list(self.devices):
+                    if device_id not in seen:
+                        changed |= self._device_detached(device_id)
+            
+            return changed
                         
         except Exception as e:
             Logger.error(f"OTGManager: Ошибка сканирования устройств: {e}")
+            return False
+    
+    def _device_attached(self, info: Dict) -> bool:
+        """Добавление устройства в реестр; True - устройство новое"""
+        device_id = info['device_id']
+        with self.lock:
+            device = self.registry.get(device_id)
+            if device is not None:
+                device.touch()
+                return False
+            
+            device_type = self._identify_device_type(info)
+            if not device_type:
+                return False
+            
+            device = OTGDevice(
+                device_id=device_id,
+                device_type=device_type,
+                name=info.get('name', 'Unknown Device'),
+                vendor_id=info.get('vendor_id', 0),
+                product_id=info.get('product_id', 0)
+            )
+            self.registry.add(device)
+        
+        Logger.info(f"OTGManager: Обнаружено устройство {device_type}: {device_id}")
+        self._notify_listeners('attached', device)
+        return True
+    
+    def _device_detached(self, device_id: str) -> bool:
+        """Удаление устройства из реестра; True - устройство было в реестре"""
+        with self.lock:
+            device = self.registry.remove(device_id)
+        if device is None:
+            return False
+        
+        self._close_transport(device_id)
+        self._close_camera(device_id)
+        device.connected = False
+        self.user_disconnected.discard(device_id)
+        Logger.info(f"OTGManager: Устройство отключено от шины: {device_id}")
+        self._notify_listeners('detached', device)
+        return True
+    
+    def _evict_stale_devices(self):
+        """Удаление устройств, давно не появлявшихся на шине"""
+        for device in self.registry.stale(time.time() - self.STALE_TIMEOUT):
+            if device.device_id not in self.transports and device.device_id not in self.camera_sources:
+                Logger.info(f"OTGManager: Устройство {device.device_id} устарело")
+                self._device_detached(device.device_id)
+    
+    def add_device_listener(self, callback: Callable[[str, OTGDevice], None]):
+        """Подписка на события реестра: ('attached' | 'detached' | 'connected' | 'disconnected', устройство)"""
+        if callback not in self.device_listeners:
+            self.device_listeners.append(callback)
     
-    def _get_android_usb_devices(self) -> List[Dict]:
+    def remove_device_listener(self, callback: Callable[[str, OTGDevice], None]):
+        """Отписка от событий реестра"""
+        if callback in self.device_listeners:
+            self.device_listeners.remove(callback)
+    
+    def _notify_listeners(self, event: str, device: OTGDevice):
+        for listener in list(self.device_listeners):
+            try:
+                listener(event, device)
+            except Exception as e:
+                Logger.error(f"OTGManager: Ошибка обработчика событий устройств: {e}")
+    
+    def _get_android_usb_devices(self) -> Optional[List[Dict]]:
         """Получение списка USB устройств через Android API"""
         devices = []
         
@@ -146,6 +307,7 @@ class OTGManager:
             devices = self._get_test_devices()
         except Exception as e:
             Logger.error(f"OTGManager: Ошибка получения USB устройств: {e}")
+            return None
         
         return devices
     
@@ -172,48 +334,56 @@ class OTGManager:
     
     def _identify_device_type(self, device: Dict) -> Optional[str]:
         """Определение типа устройства"""
-        vendor_id = device.get('vendor_id', 0)
-        product_name = device.get('product', '').lower()
-        
-        for device_type, config in self.supported_devices.items():
-            # Проверяем по vendor ID
-            if vendor_id in config['vendor_ids']:
-                return device_type
-            
-            # Проверяем по названию продукта
-            for name in config['product_names']:
-                if name.lower() in product_name:
-                    return device_type
-        
-        return None
+        return self.matcher.identify(device.get('vendor_id', 0), device.get('product_id', 0),
+                                     device.get('product') or '')
+    
+    def reload_device_types(self):
+        """Перекомпиляция таблицы типов после изменения supported_devices"""
+        self.matcher = DeviceMatcher(self.supported_devices)
     
     def _check_device_status(self):
         """Проверка состояния подключенных устройств"""
-        current_time = time.time()
-        timeout = 10.0  # Таймаут в секундах
-        
-        for device_id, device in list(self.devices.items()):
-            if current_time - device.last_seen > timeout:
-                # Устройство не отвечает
-                if device.connected:
-                    device.connected = False
-                    Logger.warning(f"OTGManager: Устройство {device_id} отключено")
-            else:
-                # Устройство активно
-                if not device.connected:
-                    device.connected = True
-                    Logger.info(f"OTGManager: Устройство {device_id} подключено")
+        for device in self.registry.snapshot():
+            # Присутствие на шине отслеживает реестр; connected - открытый канал:
+            # работающий транспорт ESP32 или открытая камера
+            if device.connected and not self._link_active(device.device_id):
+                Logger.warning(f"OTGManager: Устройство {device.device_id} не отвечает")
+                self._set_connected(device, False)
+    
+    def _link_active(self, device_id: str) -> bool:
+        """Открыт ли канал связи с устройством"""
+        transport = self.transports.get(device_id)
+        if transport:
+            return transport.is_running
+        camera = self.camera_sources.get(device_id)
+        if camera:
+            return camera.is_open
+        return False
+    
+    def _set_connected(self, device: OTGDevice, connected: bool):
+        """Смена состояния канала и уведомление подписчиков"""
+        if device.connected == connected:
+            return
+        device.connected = connected
+        device.data['connection_status'] = 'connected' if connected else 'disconnected'
+        Logger.info(f"OTGManager: Устройство {device.device_id} {'подключено' if connected else 'отключено'}")
+        self._notify_listeners('connected' if connected else 'disconnected', device)
+    
+    def is_user_disconnected(self, device_id: str) -> bool:
+        """Отключено ли устройство по запросу (автоподключение пропускает его)"""
+        return device_id in self.user_disconnected
     
     def get_connected_devices(self) -> List[OTGDevice]:
         """Получение списка подключенных устройств"""
-        return [device for device in self.devices.values() if device.connected]
+        return self.registry.get_connected()
     
     def get_device_by_type(self, device_type: str) -> List[OTGDevice]:
         """Получение устройств по типу"""
-        return [
-            device for device in self.devices.values() 
-            if device.device_type == device_type and device.connected
-        ]
+        return self.registry.of_type(device_type, connected=True)
+    
+    def get_devices_by_usb_id(self, vendor_id: int, product_id: int) -> List[OTGDevice]:
+        """Получение устройств по VID/PID"""
+        return self.registry.find(vendor_id, product_id)
     
     def connect_device(self, device_id: str) -> bool:
         """Подключение к устройству"""
@@ -222,6 +392,7 @@ class OTGManager:
             return False
         
         device = self.devices[device_id]
+        self.user_disconnected.discard(device_id)
         
         try:
             if device.device_type == 'esp32':
@@ -239,16 +410,35 @@ class OTGManager:
     def _connect_esp32(self, device: OTGDevice) -> bool:
         """Подключение к ESP32"""
         try:
-            # Здесь будет код для подключения к ESP32 через USB Serial
-            # Для Android это будет через USB Host API
-            Logger.info(f"OTGManager: Подключение к ESP32: {device.device_id}")
+            # На Android device_id - имя USB устройства для USB Host API
+            location = device.data.get('port') or self.esp32_port or device.device_id
+            Logger.info(f"OTGManager: Подключение к ESP32: {device.device_id} ({location})")
+            
+            self._close_transport(device.device_id)
+            port = open_port(location, self.baud_rate)
+            if port is None:
+                return False
+            
+            codec = None
+            if self.esp32_protocol == 'binary':
+                codec = BinaryCodec(require_acks=self.esp32_require_acks)
+            transport = SerialTransport(
+                port,
+                on_message=lambda payload: self._on_esp32_message(device, payload),
+                on_disconnect=lambda: self._on_esp32_disconnect(device),
+                codec=codec
+            )
+            transport.start()
+            self.transports[device.device_id] = transport
             
             # Обновляем данные устройства
             device.update_data({
-                'connection_status': 'connected',
-                'baud_rate': 115200,
+                'port': location,
+                'protocol': self.esp32_protocol,
+                'baud_rate': self.baud_rate,
                 'last_command': None
             })
+            self._set_connected(device, True)
             
             return True
             
@@ -256,17 +446,52 @@ class OTGManager:
             Logger.error(f"OTGManager: Ошибка подключения к ESP32: {e}")
             return False
     
+    def _on_esp32_message(self, device: OTGDevice, payload: bytes):
+        """Телеметрия ESP32 из потока чтения"""
+        try:
+            device.update_data(parse_telemetry(payload))
+        except Exception as e:
+            Logger.warning(f"OTGManager: Некорректная телеметрия {device.device_id}: {e}")
+    
+    def _on_esp32_disconnect(self, device: OTGDevice):
+        """Порт ESP32 закрылся из-за ошибки ввода-вывода"""
+        self.transports.pop(device.device_id, None)
+        Logger.warning(f"OTGManager: Связь с ESP32 {device.device_id} потеряна")
+        self._set_connected(device, False)
+    
+    def _close_transport(self, device_id: str):
+        """Остановка транспорта устройства"""
+        transport = self.transports.pop(device_id, None)
+        if transport:
+            transport.stop()
+    
     def _connect_camera(self, device: OTGDevice) -> bool:
         """Подключение к USB камере"""
         try:
-            Logger.info(f"OTGManager: Подключение к камере: {device.device_id}")
+            # OpenCV загружается только при подключении камеры
+            from .frame_sources import UvcCameraSource, find_video_device
             
-            # Обновляем данные устройства
+            # Узел камеры: задан вручную или найден по VID/PID
+            location = device.data.get('video') or find_video_device(device.vendor_id, device.product_id)
+            if location is None:
+                Logger.warning(f"OTGManager: Видеоустройство камеры {device.device_id} не найдено")
+                return False
+            Logger.info(f"OTGManager: Подключение к камере: {device.device_id} ({location})")
+            
+            self._close_camera(device.device_id)
+            source = UvcCameraSource(location, resolution=self.camera_resolution, fps=self.camera_fps)
+            if not source.open():
+                return False
+            self.camera_sources[device.device_id] = source
+            
+            # Обновляем данные устройства: согласованный режим камеры
             device.update_data({
-                'connection_status': 'connected',
-                'resolution': '640x480',
-                'fps': 30
+                'video': location,
+                'resolution': f'{source.size[0]}x{source.size[1]}',
+                'fps': source.fps,
+                'mjpeg': source.mjpeg
             })
+            self._set_connected(device, True)
             
             return True
             
@@ -274,21 +499,41 @@ class OTGManager:
             Logger.error(f"OTGManager: Ошибка подключения к камере: {e}")
             return False
     
-    def disconnect_device(self, device_id: str) -> bool:
-        """Отключение от устройства"""
+    def _close_camera(self, device_id: str):
+        """Остановка захвата с камеры"""
+        source = self.camera_sources.pop(device_id, None)
+        if source:
+            source.close()
+    
+    def get_camera_source(self, device_id: Optional[str] = None) -> Optional['UvcCameraSource']:
+        """Источник кадров подключенной USB камеры для MotionTracker.set_source"""
+        if device_id is not None:
+            return self.camera_sources.get(device_id)
+        for device in self.get_device_by_type('camera'):
+            source = self.camera_sources.get(device.device_id)
+            if source:
+                return source
+        return None
+    
+    def disconnect_device(self, device_id: str, by_user: bool = True) -> bool:
+        """Отключение от устройства; by_user - не подключать его снова автоматически"""
         if device_id not in self.devices:
             return False
         
         device = self.devices[device_id]
-        device.connected = False
+        if by_user:
+            self.user_disconnected.add(device_id)
+        self._close_transport(device_id)
+        self._close_camera(device_id)
+        self._set_connected(device, False)
         
         Logger.info(f"OTGManager: Отключение от устройства: {device_id}")
         return True
     
-    def disconnect_all(self):
+    def disconnect_all(self, by_user: bool = True):
         """Отключение от всех устройств"""
-        for device_id in list(self.devices.keys()):
-            self.disconnect_device(device_id)
+        for device_id in list(self.devices):
+            self.disconnect_device(device_id, by_user)
         
         Logger.info("OTGManager: Отключение от всех устройств")
     
@@ -313,16 +558,16 @@ class OTGManager:
             return False
     
     def _send_esp32_command(self, device: OTGDevice, command: str) -> bool:
-        """Отправка команды ESP32"""
+        """Отправка команды ESP32 (только постановка в очередь записи)"""
         try:
-            # Здесь будет код для отправки команды через USB Serial
-            Logger.info(f"OTGManager: Отправка команды ESP32: {command}")
+            transport = self.transports.get(device.device_id)
+            if transport is None or not transport.send(command):
+                Logger.warning(f"OTGManager: ESP32 {device.device_id} не подключен")
+                return False
             
             # Обновляем данные устройства
-            device.update_data({
-                'last_command': command,
-                'last_command_time': time.time()
-            })
+            device.data['last_command'] = command
+            device.data['last_command_time'] = time.time()
             
             return True
             
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Конвейер обработки кадров: захват -> детекция -> публикация
+Стадии связаны ограниченными очередями с политикой "побеждает последний кадр"
+"""
+
+import collections
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from kivy.logger import Logger
+
+class LatestQueue:
+    """Ограниченная очередь: при переполнении вытесняется самый старый элемент"""
+
+    def __init__(self, maxsize: int = 1, on_evict: Optional[Callable[[Any], None]] = None):
+        self.items = collections.deque(maxlen=max(1, maxsize))
+        self.condition = threading.Condition()
+        self.on_evict = on_evict  # Вызывается с вытесненным элементом
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, item):
+        """Добавление элемента без блокировки"""
+        with self.condition:
+            if len(self.items) == self.items.maxlen:
+                # Устаревший элемент вытесняется новым
+                self.dropped += 1
+                if self.on_evict:
+                    self.on_evict(self.items.popleft())
+            self.items.append(item)
+            self.condition.notify()
+
+    def get(self, timeout: Optional[float] = None):
+        """Получение элемента; None - если очередь закрыта или истек таймаут"""
+        with self.condition:
+            if not self.items and not self.closed:
+                self.condition.wait(timeout)
+            if self.items:
+                return self.items.popleft()
+            return None
+
+    def drain(self) -> List:
+        """Извлечение всех оставшихся элементов"""
+        with self.condition:
+            items = list(self.items)
+            self.items.clear()
+            return items
+
+    def close(self):
+        """Закрытие очереди и пробуждение ожидающих потоков"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+class PipelineItem:
+    """Элемент конвейера: кадр или результат с номером и временем захвата"""
+
+    __slots__ = ('seq', 'captured_at', 'data')
+
+    def __init__(self, seq: int, captured_at: float, data: Any):
+        self.seq = seq
+        self.captured_at = captured_at
+        self.data = data
+
+class StageStats:
+    """Счетчики стадии конвейера"""
+
+    # Коэффициент сглаживания средней задержки
+    SMOOTHING = 0.1
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.latency_ms = 0.0
+        self.max_latency_ms = 0.0
+
+    def record(self, latency_ms: float):
+        """Учет обработанного элемента"""
+        with self.lock:
+            if self.processed == 0:
+                self.latency_ms = latency_ms
+            else:
+                self.latency_ms += (latency_ms - self.latency_ms) * self.SMOOTHING
+            self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+            self.processed += 1
+
+    def record_error(self):
+        """Учет ошибки стадии"""
+        with self.lock:
+            self.errors += 1
+
+    def as_dict(self) -> Dict:
+        return {
+            'processed': self.processed,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'latency_ms': self.latency_ms,
+            'max_latency_ms': self.max_latency_ms
+        }
+
+class FramePipeline:
+    """Конвейер захват -> детекция (пул потоков) -> публикация"""
+
+    # Таймаут ожидания в очередях, чтобы потоки замечали остановку
+    QUEUE_TIMEOUT = 0.5
+
+    def __init__(self, capture: Callable[[], Any], detect: Callable[[Any], Any],
+                 publish: Callable[[PipelineItem], None], detect_workers: int = 1,
+                 queue_size: int = 1, wait: Optional[Callable[[], bool]] = None,
+                 release: Optional[Callable[[Any], None]] = None):
+        self.wait = wait          # Ждет готовности кадра; False - кадра нет
+        self.capture = capture    # Возвращает кадр или None, если кадра нет
+        self.detect = detect      # Кадр -> результат детекции
+        self.publish = publish    # Вызывается с PipelineItem результата
+        self.release = release    # Кадр больше не нужен: после детекции или вытеснения
+        self.detect_workers = max(1, detect_workers)
+        self.queue_size = queue_size
+
+        self.frame_queue = LatestQueue(queue_size, on_evict=self._release_item)
+        self.result_queue = LatestQueue(queue_size)
+        self.stages = {
+            'capture': StageStats(),
+            'detect': StageStats(),
+            'publish': StageStats()
+        }
+        self.end_to_end_ms = 0.0
+
+        self.threads: List[threading.Thread] = []
+        self.stop_event = threading.Event()
+        self._seq = 0
+        self._last_published_seq = -1
+
+    @property
+    def is_running(self) -> bool:
+        return any(thread.is_alive() for thread in self.threads)
+
+    def start(self):
+        """Запуск потоков всех стадий"""
+        self.stop_event.clear()
+        self._seq = 0
+        self._last_published_seq = -1
+        self.frame_queue = LatestQueue(self.queue_size, on_evict=self._release_item)
+        self.result_queue = LatestQueue(self.queue_size)
+
+        targets = [('capture', self._capture_loop)]
+        targets += [(f'detect-{i}', self._detect_loop) for i in range(self.detect_workers)]
+        targets += [('publish', self._publish_loop)]
+
+        self.threads = []
+        for name, target in targets:
+            thread = threading.Thread(target=target, name=f'FramePipeline-{name}')
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, timeout: float = 2.0):
+        """Остановка конвейера"""
+        self.stop_event.set()
+        self.frame_queue.close()
+        self.result_queue.close()
+
+        for thread in self.threads:
+            if thread.is_alive() and thread is not threading.current_thread():
+                thread.join(timeout=timeout)
+        self.threads = []
+
+        # Кадры, не дошедшие до детекции
+        for item in self.frame_queue.drain():
+            self._release_item(item)
+
+    def _release_item(self, item: PipelineItem):
+        if self.release is not None:
+            self.release(item.data)
+
+    def _capture_loop(self):
+        """Стадия захвата кадров"""
+        stats = self.stages['capture']
+        while not self.stop_event.is_set():
+            try:
+                # Ожидание кадра не входит в задержку стадии
+                if self.wait is not None and not self.wait():
+                    continue
+
+                start = time.monotonic()
+                frame = self.capture()
+                if frame is None:
+                    continue
+                stats.record((time.monotonic() - start) * 1000.0)
+
+                self.frame_queue.put(PipelineItem(self._seq, start, frame))
+                self._seq += 1
+            except Exception as e:
+                stats.record_error()
+                Logger.error(f"FramePipeline: Ошибка захвата: {e}")
+                self.stop_event.wait(0.1)
+
+    def _detect_loop(self):
+        """Стадия детекции (может выполняться несколькими потоками)"""
+        stats = self.stages['detect']
+        while not self.stop_event.is_set():
+            item = self.frame_queue.get(self.QUEUE_TIMEOUT)
+            if item is None:
+                continue
+            try:
+                start = time.monotonic()
+                result = self.detect(item.data)
+                stats.record((time.monotonic() - start) * 1000.0)
+
+                self.result_queue.put(PipelineItem(item.seq, item.captured_at, result))
+            except Exception as e:
+                stats.record_error()
+                Logger.error(f"FramePipeline: Ошибка детекции: {e}")
+            finally:
+                self._release_item(item)
+
+    def _publish_loop(self):
+        """Стадия публикации результатов"""
+        stats = self.stages['publish']
+        while not self.stop_event.is_set():
+            item = self.result_queue.get(self.QUEUE_TIMEOUT)
+            if item is None:
+                continue
+
+            # При нескольких потоках детекции результаты могут прийти не по порядку
+            if item.seq <= self._last_published_seq:
+                stats.dropped += 1
+                continue
+            self._last_published_seq = item.seq
+
+            try:
+                start = time.monotonic()
+                self.publish(item)
+                now = time.monotonic()
+                stats.record((now - start) * 1000.0)
+                self.end_to_end_ms = (now - item.captured_at) * 1000.0
+            except Exception as e:
+                stats.record_error()
+                Logger.error(f"FramePipeline: Ошибка публикации: {e}")
+
+    def get_stats(self) -> Dict:
+        """Задержки и счетчики отброшенных элементов по стадиям"""
+        stats = {name: stage.as_dict() for name, stage in self.stages.items()}
+        # Кадры, вытесненные из очередей более свежими, теряются на входе стадии
+        stats['detect']['dropped'] += self.frame_queue.dropped
+        stats['publish']['dropped'] += self.result_queue.dropped
+        stats['end_to_end_ms'] = self.end_to_end_ms
+        return stats
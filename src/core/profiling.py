@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Профилирование горячего пути по стадиям
+Постоянно включенные замеры в гистограммы фиксированного размера
+и выборочные дампы cProfile / трассировки по запросу
+"""
+
+import bisect
+import collections
+import cProfile
+import json
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from kivy.logger import Logger
+
+# Режимы выборочного профилирования:
+# 'cprofile' - cProfile потока детекции, файл .prof для pstats/snakeviz
+# 'trace'    - интервалы стадий всех потоков, JSON для chrome://tracing
+PROFILE_MODES = ('cprofile', 'trace')
+
+# Сколько путей последних дампов помнит профилировщик
+MAX_DUMPS = 100
+
+class LatencyHistogram:
+    """Гистограмма задержек с логарифмическими корзинами фиксированного размера"""
+
+    # Верхние границы корзин, мс: от 10 мкс до ~12 с с шагом 25%
+    EDGES = tuple(0.01 * 1.25 ** i for i in range(64))
+
+    def __init__(self):
+        # Последняя корзина - все, что больше EDGES[-1]
+        self.counts = np.zeros(len(self.EDGES) + 1, dtype=np.int64)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, latency_ms: float):
+        """Учет одного замера за O(log корзин) без выделения памяти"""
+        self.counts[bisect.bisect_left(self.EDGES, latency_ms)] += 1
+        self.count += 1
+        self.total_ms += latency_ms
+        if latency_ms > self.max_ms:
+            self.max_ms = latency_ms
+
+    def reset(self):
+        """Сброс замеров"""
+        self.counts[:] = 0
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def percentile(self, q: float) -> float:
+        """Перцентиль с линейной интерполяцией внутри корзины"""
+        if not self.count:
+            return 0.0
+        rank = max(1.0, q / 100.0 * self.count)
+        cumulative = np.cumsum(self.counts)
+        index = int(np.searchsorted(cumulative, rank, side='left'))
+        lower = self.EDGES[index - 1] if index > 0 else 0.0
+        upper = self.EDGES[index] if index < len(self.EDGES) else self.max_ms
+        below = cumulative[index - 1] if index > 0 else 0
+        fraction = (rank - below) / self.counts[index]
+        return min(lower + (upper - lower) * float(fraction), self.max_ms)
+
+    def get_stats(self) -> Dict:
+        return {
+            'count': self.count,
+            'mean_ms': self.total_ms / self.count if self.count else 0.0,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'max_ms': self.max_ms
+        }
+
+class StageProfiler:
+    """Замеры стадий обработки кадра и выборочное профилирование
+
+    Каждую гистограмму пишет только один поток (стадии захвата - поток
+    захвата, стадии детекции - поток детекции), поэтому блокировки
+    на горячем пути не нужны; get_stats читает счетчики без блокировки.
+    Дампы пишет фоновый поток, чтобы запись файла не задерживала кадр.
+    """
+
+    def __init__(self, stages: Sequence[str] = ()):
+        self.enabled = True
+        self.histograms: Dict[str, LatencyHistogram] = {
+            name: LatencyHistogram() for name in stages
+        }
+
+        # Выборочное профилирование: окно из sample_frames кадров
+        # каждые sample_every кадров (0 - выключено)
+        self.sample_every = 0
+        self.sample_frames = 1
+        self.sample_mode = 'cprofile'
+        self.output_dir = '.'
+        self.dumps: collections.deque = collections.deque(maxlen=MAX_DUMPS)  # Пути последних дампов
+
+        # Окно выборки открывает и закрывает поток детекции, а закрыть
+        # досрочно может configure_sampling из потока интерфейса
+        self._window_lock = threading.Lock()
+        self._frame_index = 0
+        self._window_left = 0
+        self._profile: Optional[cProfile.Profile] = None
+        self._spans: Optional[List[Tuple[str, float, float, int]]] = None
+        # Профиль, включенный в потоке детекции текущим кадром
+        self._enabled_profile: Optional[cProfile.Profile] = None
+
+        # Поток записи дампов запускается первым дампом и завершается close()
+        self._writer_lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_queue: Optional[queue.Queue] = None
+
+    @staticmethod
+    def now() -> float:
+        """Монотонное время высокого разрешения, сек"""
+        return time.perf_counter()
+
+    def mark(self, stage: str, start: float) -> float:
+        """Учет стадии, начатой в start; возвращает время начала следующей стадии"""
+        now = time.perf_counter()
+        if self.enabled:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms.setdefault(stage, LatencyHistogram())
+            histogram.record((now - start) * 1000.0)
+            spans = self._spans
+            if spans is not None:
+                spans.append((stage, start, now, threading.get_ident()))
+        return now
+
+    def reset(self):
+        """Сброс всех гистограмм"""
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Сводка по стадиям: число замеров, среднее, p50/p95/p99, максимум"""
+        return {name: histogram.get_stats()
+                for name, histogram in self.histograms.items() if histogram.count}
+
+    def configure_sampling(self, every: int = 0, frames: int = 1, mode: str = 'cprofile',
+                           output_dir: Optional[str] = None):
+        """Выборочное профилирование: frames кадров подряд каждые every кадров"""
+        if mode not in PROFILE_MODES:
+            Logger.warning(f"StageProfiler: Неизвестный режим профилирования: {mode}")
+            return
+        # Открытое окно закрывается с дампом в прежний каталог
+        with self._window_lock:
+            window = self._take_window()
+            self.sample_every = max(0, every)
+            self.sample_frames = max(1, frames)
+            self.sample_mode = mode
+            self._frame_index = 0
+        self._submit(*window)
+        if output_dir:
+            self.output_dir = output_dir
+
+    def begin_frame(self):
+        """Начало кадра в потоке детекции: открытие окна выборки по расписанию"""
+        if not self.sample_every:
+            return
+        with self._window_lock:
+            if self._window_left == 0 and self._frame_index % self.sample_every == 0:
+                self._window_left = self.sample_frames
+                if self.sample_mode == 'cprofile':
+                    self._profile = cProfile.Profile()
+                else:
+                    self._spans = []
+            self._frame_index += 1
+            profile = self._profile
+
+        # cProfile работает только в вызвавшем его потоке; end_frame выключает
+        # этот же профиль, даже если окно уже закрыто из другого потока
+        self._enabled_profile = profile
+        if profile is not None:
+            profile.enable()
+
+    def end_frame(self):
+        """Конец кадра в потоке детекции: запись дампа по окончании окна"""
+        profile = self._enabled_profile
+        if profile is not None:
+            self._enabled_profile = None
+            profile.disable()
+        if self._window_left == 0:
+            return
+
+        with self._window_lock:
+            if self._window_left == 0:
+                return
+            self._window_left -= 1
+            if self._window_left:
+                return
+            window = self._take_window()
+        self._submit(*window)
+
+    def close(self, timeout: float = 5.0):
+        """Дописать отправленные дампы и остановить поток записи"""
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+            if writer is None:
+                return
+            self._writer_queue.put(None)
+            self._writer_queue = None
+        writer.join(timeout)
+
+    def _take_window(self) -> Tuple[Optional[cProfile.Profile], Optional[List], int]:
+        """Закрытие окна (под _window_lock): профиль, интервалы и номер кадра для дампа"""
+        window = (self._profile, self._spans, self._frame_index)
+        self._profile = None
+        self._spans = None
+        self._window_left = 0
+        return window
+
+    def _submit(self, profile: Optional[cProfile.Profile], spans: Optional[List], frame_index: int):
+        """Передача закрытого окна выборки потоку записи (каталог - текущий)"""
+        if profile is None and not spans:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                # Своя очередь у каждого потока: close() останавливает только свой
+                self._writer_queue = queue.Queue()
+                self._writer = threading.Thread(target=self._writer_loop, args=(self._writer_queue,),
+                                                name='StageProfiler', daemon=True)
+                self._writer.start()
+            self._writer_queue.put((profile, spans, frame_index, self.output_dir))
+
+    def _writer_loop(self, dump_queue: queue.Queue):
+        """Поток записи дампов до сигнала остановки (None)"""
+        while True:
+            window = dump_queue.get()
+            if window is None:
+                return
+            self._dump(*window)
+
+    def _dump(self, profile: Optional[cProfile.Profile], spans: Optional[List], frame_index: int,
+              output_dir: str):
+        """Запись дампа закрытого окна выборки (поток записи)"""
+        try:
+            stamp = time.strftime('%Y%m%d-%H%M%S')
+            if profile is not None:
+                path = os.path.join(output_dir, f'profile-{stamp}-{frame_index}.prof')
+                profile.dump_stats(path)
+            else:
+                path = os.path.join(output_dir, f'trace-{stamp}-{frame_index}.json')
+                self._write_trace(path, spans)
+            self.dumps.append(path)
+            Logger.info(f"StageProfiler: Дамп профиля: {path}")
+
+        except Exception as e:
+            Logger.error(f"StageProfiler: Ошибка записи дампа: {e}")
+
+    @staticmethod
+    def _write_trace(path: str, spans: List[Tuple[str, float, float, int]]):
+        """Запись интервалов стадий в формате Chrome Trace Event"""
+        origin = spans[0][1]
+        events = [{
+            'name': stage,
+            'ph': 'X',
+            'ts': (start - origin) * 1e6,
+            'dur': (end - start) * 1e6,
+            'pid': os.getpid(),
+            'tid': thread_id
+        } for stage, start, end, thread_id in spans]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
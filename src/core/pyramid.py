@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Пирамида обработки кадров для детекции движения
+Уменьшенное разрешение детекции и уточнение по тайлам полного разрешения
+"""
+
+import numpy as np
+from typing import Optional, Tuple
+from kivy.logger import Logger
+
+try:
+    import cv2
+except ImportError:
+    # Без OpenCV уменьшение - усреднением блоков на NumPy
+    cv2 = None
+
+def area_downscale(frame: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """Уменьшение в целое число раз усреднением блоков (как INTER_AREA)"""
+    height, width = dst.shape[:2]
+    fy = frame.shape[0] // height
+    fx = frame.shape[1] // width
+    blocks = frame[:height * fy, :width * fx].reshape((height, fy, width, fx) + frame.shape[2:])
+    np.rint(blocks.mean(axis=(1, 3)), out=dst, casting='unsafe')
+    return dst
+
+def absdiff(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """|a - b| для uint8 без переполнения"""
+    if cv2 is not None:
+        return cv2.absdiff(a, b)
+    return np.maximum(a, b) - np.minimum(a, b)
+
+class DetectionPyramid:
+    """Масштабирование кадров и уточнение детекции coarse-to-fine"""
+
+    SUPPORTED_SCALES = (1.0, 0.5, 0.25)
+
+    def __init__(self, scale: float = 1.0, coarse_to_fine: bool = False,
+                 tile_size: int = 64, diff_threshold: int = 25):
+        self.scale = 1.0
+        self.coarse_to_fine = coarse_to_fine
+        self.tile_size = tile_size          # Размер тайла в пикселях полного разрешения
+        self.diff_threshold = diff_threshold  # Порог разницы яркости для уточнения
+
+        # Предвыделенные буферы
+        self._scaled: Optional[np.ndarray] = None
+        self._previous: Optional[np.ndarray] = None
+        self._has_previous = False
+
+        self.set_scale(scale)
+
+    def set_scale(self, scale: float):
+        """Установка масштаба обработки (1, 1/2 или 1/4)"""
+        if scale not in self.SUPPORTED_SCALES:
+            Logger.warning(f"DetectionPyramid: Неподдерживаемый масштаб: {scale}")
+            return
+        self.scale = scale
+        self._scaled = None
+
+    @property
+    def area_factor(self) -> float:
+        """Множитель для пересчета площади из масштаба обработки в полный"""
+        return 1.0 / (self.scale * self.scale)
+
+    def downscale(self, frame: np.ndarray) -> np.ndarray:
+        """Уменьшение кадра до разрешения обработки"""
+        if self.scale == 1.0:
+            return frame
+
+        height, width = frame.shape[:2]
+        size = (max(1, int(width * self.scale)), max(1, int(height * self.scale)))
+        shape = (size[1], size[0]) + frame.shape[2:]
+
+        if self._scaled is None or self._scaled.shape != shape:
+            self._scaled = np.empty(shape, dtype=frame.dtype)
+
+        if cv2 is None:
+            return area_downscale(frame, self._scaled)
+        cv2.resize(frame, size, dst=self._scaled, interpolation=cv2.INTER_AREA)
+        return self._scaled
+
+    def _fired_tiles(self, coarse_mask: np.ndarray, full_shape: Tuple[int, int]) -> np.ndarray:
+        """Координаты тайлов полного разрешения, где сработала грубая маска"""
+        height, width = full_shape
+        rows = -(-height // self.tile_size)
+        cols = -(-width // self.tile_size)
+
+        # Граница тайла в пикселях грубой маски
+        coarse_tile = max(1, int(round(self.tile_size * self.scale)))
+        mask_h, mask_w = coarse_mask.shape[:2]
+
+        # Суммы по тайлам одним векторным проходом
+        row_starts = np.arange(0, mask_h, coarse_tile)
+        col_starts = np.arange(0, mask_w, coarse_tile)
+        sums = np.add.reduceat(np.add.reduceat(coarse_mask, row_starts, axis=0, dtype=np.uint32),
+                               col_starts, axis=1)
+        return np.argwhere(sums[:rows, :cols] > 0)
+
+    def refine(self, coarse_mask: np.ndarray, frame: np.ndarray, min_area: float) -> bool:
+        """Проверка движения на тайлах полного разрешения, где сработала грубая маска"""
+        motion_detected = False
+
+        if self._has_previous and self._previous.shape == frame.shape:
+            fine_area = 0
+            for row, col in self._fired_tiles(coarse_mask, frame.shape[:2]):
+                y = row * self.tile_size
+                x = col * self.tile_size
+                tile = (slice(y, y + self.tile_size), slice(x, x + self.tile_size))
+
+                diff = absdiff(frame[tile], self._previous[tile])
+                if diff.ndim == 3:
+                    diff = diff.max(axis=2)
+                fine_area += int(np.count_nonzero(diff > self.diff_threshold))
+
+                if fine_area > min_area:
+                    motion_detected = True
+                    break
+
+        self.remember(frame)
+        return motion_detected
+
+    def remember(self, frame: np.ndarray):
+        """Сохранение кадра полного разрешения для следующего уточнения"""
+        if self._previous is None or self._previous.shape != frame.shape:
+            self._previous = np.empty_like(frame)
+        np.copyto(self._previous, frame)
+        self._has_previous = True
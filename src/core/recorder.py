@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Запись клипов по движению с предзаписью
+Кадры сжимаются в JPEG в кольцевом буфере; при движении буфер и живые
+кадры пишутся в видеофайл фоновым потоком
+"""
+
+import collections
+import os
+import threading
+import time
+import numpy as np
+from typing import Callable, Dict, Optional, Tuple
+from kivy.logger import Logger
+
+from .pipeline import LatestQueue
+
+try:
+    import cv2
+except ImportError:
+    # Запись клипов (JPEG и VideoWriter) доступна только с OpenCV
+    cv2 = None
+
+# Преобразование формата пикселей источника в BGR для кодировщика
+BGR_CONVERSIONS = {
+    'rgba': cv2.COLOR_RGBA2BGR,
+    'gray': cv2.COLOR_GRAY2BGR
+} if cv2 is not None else {}
+
+# Сколько путей последних клипов помнит MotionRecorder
+MAX_CLIPS = 100
+
+class MotionRecorder:
+    """Запись клипов движения с предзаписью pre_roll секунд
+
+    Поток захвата только кладет ссылку на кадр в ограниченную очередь;
+    сжатие, запись и ротация файлов выполняются в отдельном потоке,
+    поэтому детекция не ждет кодировщик. Память ограничена очередью
+    и размером буфера предзаписи.
+
+    Файл пишется с постоянной частотой fps, а кадры приходят с частотой
+    трекера (в простое около 5 FPS): пропуски между метками времени
+    заполняются повтором предыдущего кадра, и клип идет в реальном времени.
+    """
+
+    # Кодек клипов: MJPG в AVI поддерживается встроенным кодировщиком OpenCV
+    FOURCC = 'MJPG'
+    EXTENSION = '.avi'
+
+    # Таймаут ожидания кадра, чтобы поток замечал остановку и конец клипа
+    QUEUE_TIMEOUT = 0.5
+
+    def __init__(self, output_dir: str, pre_roll: float = 3.0, cooldown: float = 5.0,
+                 fps: float = 15.0, jpeg_quality: int = 80, chunk_seconds: float = 60.0,
+                 max_pre_roll_bytes: int = 16 * 1024 * 1024):
+        self.output_dir = output_dir
+        self.pre_roll = pre_roll            # Секунд до срабатывания в клипе
+        self.cooldown = cooldown            # Секунд без движения до конца клипа
+        self.fps = fps                      # Частота кадров клипа
+        self.jpeg_quality = jpeg_quality
+        self.chunk_seconds = chunk_seconds  # Длина одного файла длинного клипа
+        self.max_pre_roll_bytes = max_pre_roll_bytes
+
+        # Буфер предзаписи: (время, JPEG) от старых к новым
+        self.pre_roll_frames: collections.deque = collections.deque()
+        self.pre_roll_bytes = 0
+
+        # Очередь кадров от потока захвата: при отставании теряются старые
+        self.queue = LatestQueue(maxsize=max(2, int(fps)))
+        self.clip_callback: Optional[Callable[[str], None]] = None
+        self.clips: collections.deque = collections.deque(maxlen=MAX_CLIPS)  # Пути последних клипов
+        self.clips_written = 0
+
+        self.is_recording = False
+        self.frames_written = 0
+        self.writer = None
+        self.writer_size: Tuple[int, int] = (0, 0)
+        self._chunk_started = 0.0
+        self._chunk_frames = 0  # Кадров в текущем файле, включая повторы
+        self._last_frame: Optional[np.ndarray] = None  # Последний записанный кадр файла
+        self._chunk_index = 0
+        self._clip_name = ''
+        self._clip_path = ''
+
+        self._last_submitted = 0.0
+        self._last_motion: Optional[float] = None
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+
+    @property
+    def is_running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    @staticmethod
+    def is_available() -> bool:
+        """Доступна ли запись в текущей сборке (нужен OpenCV)"""
+        return cv2 is not None
+
+    def start(self) -> bool:
+        """Запуск фонового потока записи"""
+        if self.is_running:
+            return True
+        if not self.is_available():
+            Logger.error("MotionRecorder: Запись клипов недоступна без OpenCV")
+            return False
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+        except Exception as e:
+            Logger.error(f"MotionRecorder: Ошибка создания каталога {self.output_dir}: {e}")
+            return False
+
+        self.stop_event.clear()
+        self.queue = LatestQueue(maxsize=self.queue.items.maxlen)
+        self.thread = threading.Thread(target=self._record_loop, name='MotionRecorder')
+        self.thread.daemon = True
+        self.thread.start()
+        Logger.info(f"MotionRecorder: Запись в {self.output_dir}")
+        return True
+
+    def stop(self, timeout: float = 2.0):
+        """Остановка потока; открытый клип дописывается и закрывается"""
+        self.stop_event.set()
+        self.queue.close()
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=timeout)
+        self.thread = None
+
+    def submit(self, image: np.ndarray, pixel_format: str, timestamp: float):
+        """Передача кадра источника (вызывается из потока захвата, без копирования)
+
+        Кадр не должен изменяться после передачи: источники отдают новый
+        массив на каждый кадр.
+        """
+        if not self.is_running or timestamp - self._last_submitted < 1.0 / self.fps:
+            return
+        self._last_submitted = timestamp
+        self.queue.put((timestamp, image, pixel_format))
+
+    def trigger(self, timestamp: float):
+        """Отметка движения: начинает клип или продлевает текущий"""
+        self._last_motion = timestamp
+
+    def _record_loop(self):
+        """Фоновый поток: сжатие предзаписи и запись клипов"""
+        while not self.stop_event.is_set():
+            item = self.queue.get(self.QUEUE_TIMEOUT)
+            if item is None:
+                # Кадры не идут (пауза) - клип все равно закрывается по таймауту
+                if self.is_recording and not self._motion_active(time.monotonic()):
+                    self._finish_clip()
+                continue
+
+            try:
+                timestamp, image, pixel_format = item
+                self._handle_frame(self._to_bgr(image, pixel_format), timestamp)
+            except Exception as e:
+                Logger.error(f"MotionRecorder: Ошибка записи кадра: {e}")
+
+        if self.is_recording:
+            self._finish_clip()
+
+    def _motion_active(self, timestamp: float) -> bool:
+        return self._last_motion is not None and timestamp - self._last_motion <= self.cooldown
+
+    @staticmethod
+    def _to_bgr(image: np.ndarray, pixel_format: str) -> np.ndarray:
+        code = BGR_CONVERSIONS.get(pixel_format)
+        return cv2.cvtColor(image, code) if code is not None else image
+
+    def _handle_frame(self, frame: np.ndarray, timestamp: float):
+        """Кадр в буфер предзаписи или в открытый клип"""
+        if self._motion_active(timestamp):
+            if not self.is_recording:
+                self._start_clip(frame, timestamp)
+            elif timestamp - self._chunk_started >= self.chunk_seconds:
+                # Длинный клип делится на файлы ограниченной длины
+                self._open_writer(frame, timestamp)
+            self._write(frame, timestamp)
+            return
+
+        if self.is_recording:
+            self._finish_clip()
+        self._buffer_frame(frame, timestamp)
+
+    def _buffer_frame(self, frame: np.ndarray, timestamp: float):
+        """Сжатие кадра в буфер предзаписи с ограничением по времени и памяти"""
+        ok, jpeg = cv2.imencode('.jpg', frame, (cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality))
+        if not ok:
+            return
+        self.pre_roll_frames.append((timestamp, jpeg))
+        self.pre_roll_bytes += jpeg.nbytes
+
+        frames = self.pre_roll_frames
+        while frames and (timestamp - frames[0][0] > self.pre_roll or
+                          self.pre_roll_bytes > self.max_pre_roll_bytes):
+            self.pre_roll_bytes -= frames.popleft()[1].nbytes
+
+    def _start_clip(self, frame: np.ndarray, timestamp: float):
+        """Открытие клипа и запись предзаписи перед живыми кадрами"""
+        self._clip_name = time.strftime('motion-%Y%m%d-%H%M%S')
+        self._chunk_index = 0
+        self.is_recording = True
+        # Клип начинается с самого старого кадра предзаписи
+        started = self.pre_roll_frames[0][0] if self.pre_roll_frames else timestamp
+        self._open_writer(frame, started)
+
+        while self.pre_roll_frames:
+            buffered_at, jpeg = self.pre_roll_frames.popleft()
+            buffered = cv2.imdecode(jpeg, cv2.IMREAD_COLOR)
+            if buffered is not None:
+                self._write(buffered, buffered_at)
+        self.pre_roll_bytes = 0
+        Logger.info(f"MotionRecorder: Начат клип {self._clip_name}")
+
+    def _open_writer(self, frame: np.ndarray, timestamp: float):
+        """Открытие следующего файла клипа"""
+        self._close_writer()
+        suffix = f'-{self._chunk_index:03d}' if self._chunk_index else ''
+        self._clip_path = os.path.join(self.output_dir, f'{self._clip_name}{suffix}{self.EXTENSION}')
+        self.writer_size = (frame.shape[1], frame.shape[0])
+        self.writer = cv2.VideoWriter(self._clip_path, cv2.VideoWriter_fourcc(*self.FOURCC),
+                                      self.fps, self.writer_size)
+        if not self.writer.isOpened():
+            Logger.error(f"MotionRecorder: Не удалось открыть {self._clip_path}")
+            self.writer = None
+        self._chunk_started = timestamp
+        self._chunk_frames = 0
+        self._last_frame = None
+        self._chunk_index += 1
+
+    def _write(self, frame: np.ndarray, timestamp: float):
+        """Запись кадра в его слот файла; пропуск до него - повтор предыдущего"""
+        if self.writer is None:
+            return
+        if (frame.shape[1], frame.shape[0]) != self.writer_size:
+            frame = cv2.resize(frame, self.writer_size)
+
+        # Пропуск длиннее cooldown закрыл бы клип: больше не повторяем
+        slot = int((timestamp - self._chunk_started) * self.fps)
+        repeats = min(slot - self._chunk_frames, int(self.cooldown * self.fps))
+        if self._last_frame is not None:
+            for _ in range(repeats):
+                self.writer.write(self._last_frame)
+                self._chunk_frames += 1
+                self.frames_written += 1
+
+        self.writer.write(frame)
+        self._chunk_frames += 1
+        self.frames_written += 1
+        self._last_frame = frame
+
+    def _close_writer(self):
+        """Закрытие текущего файла и уведомление о готовом фрагменте"""
+        if self.writer is None:
+            return
+        self.writer.release()
+        self.writer = None
+        self._last_frame = None
+        self.clips.append(self._clip_path)
+        self.clips_written += 1
+
+        if self.clip_callback:
+            try:
+                self.clip_callback(self._clip_path)
+            except Exception as e:
+                Logger.error(f"MotionRecorder: Ошибка обработчика клипа: {e}")
+
+    def _finish_clip(self):
+        """Завершение клипа после периода без движения"""
+        self._close_writer()
+        self.is_recording = False
+        Logger.info(f"MotionRecorder: Клип {self._clip_name} завершен")
+
+    def get_stats(self) -> Dict:
+        return {
+            'recording': self.is_recording,
+            'clips': self.clips_written,
+            'frames_written': self.frames_written,
+            'frames_dropped': self.queue.dropped,
+            'pre_roll_frames': len(self.pre_roll_frames),
+            'pre_roll_bytes': self.pre_roll_bytes
+        }
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Адаптивный планировщик частоты кадров
+Дедлайны вместо фиксированной паузы, отбрасывание устаревших кадров
+и снижение частоты при отсутствии движения
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+
+class FrameScheduler:
+    """Планировщик обработки кадров по дедлайнам"""
+
+    # Максимальное ожидание кадра от камеры, сек
+    FRAME_WAIT_TIMEOUT = 1.0
+
+    def __init__(self, target_fps: float = 30.0, idle_fps: float = 5.0,
+                 idle_timeout: float = 10.0):
+        self.target_fps = target_fps
+        self.idle_fps = idle_fps
+        self.idle_timeout = idle_timeout  # Секунд без движения до снижения частоты
+
+        # Уведомления о новых кадрах от камеры (on_texture)
+        self.frame_event = threading.Event()
+        self.frame_events_supported = False
+        self._frames_arrived = 0
+        self._frames_consumed = 0
+
+        self.is_idle = False
+        self.frames_dropped = 0
+        self.last_processing_time = 0.0  # Стадия захвата: от begin_frame до end_frame
+        self._last_motion_time = time.monotonic()
+        self._deadline = 0.0
+        self._frame_start = 0.0
+
+    @property
+    def current_fps(self) -> float:
+        """Текущая целевая частота с учетом режима простоя"""
+        return self.idle_fps if self.is_idle else self.target_fps
+
+    @property
+    def frame_interval(self) -> float:
+        """Интервал между кадрами в секундах"""
+        return 1.0 / self.current_fps if self.current_fps > 0 else 0.0
+
+    def notify_frame(self, *args):
+        """Уведомление о новом кадре (вызывается из события камеры)"""
+        self._frames_arrived += 1
+        self.frame_event.set()
+
+    def wake(self):
+        """Пробуждение ожидающего потока (например, при остановке)"""
+        self.frame_event.set()
+
+    def reset(self):
+        """Сброс состояния перед запуском"""
+        self.frame_event.clear()
+        self._frames_consumed = self._frames_arrived
+        self._deadline = time.monotonic()
+        self._last_motion_time = time.monotonic()
+        self.is_idle = False
+
+    def wait_for_frame(self, stop_event: threading.Event) -> bool:
+        """Ожидание дедлайна и свежего кадра; False - кадра нет или пора остановиться"""
+        # Ждем до дедлайна, не занимая процессор
+        remaining = self._deadline - time.monotonic()
+        if remaining > 0 and stop_event.wait(remaining):
+            return False
+
+        if self.frame_events_supported:
+            # Ждем кадр от камеры вместо опроса текстуры
+            if not self.frame_event.wait(self.FRAME_WAIT_TIMEOUT):
+                return False
+            self.frame_event.clear()
+
+            # Из пришедших кадров обрабатывается только последний, остальные устарели
+            arrived = self._frames_arrived
+            pending = arrived - self._frames_consumed
+            if pending > 1:
+                self.frames_dropped += pending - 1
+            self._frames_consumed = arrived
+
+        return not stop_event.is_set()
+
+    def begin_frame(self):
+        """Отметка начала обработки кадра"""
+        self._frame_start = time.monotonic()
+
+    def end_frame(self, motion_detected: Optional[bool] = None):
+        """Отметка конца обработки кадра и расчет следующего дедлайна"""
+        now = time.monotonic()
+        self.last_processing_time = now - self._frame_start
+
+        if motion_detected is not None:
+            self.report_motion(motion_detected)
+
+        # Время обработки вычитается из паузы; при перерасходе долг не копится
+        self._deadline = max(self._frame_start + self.frame_interval, now)
+
+    def report_motion(self, motion_detected: bool):
+        """Учет результата детекции для режима простоя"""
+        now = time.monotonic()
+        if motion_detected:
+            # Движение - сразу возвращаем полную частоту
+            self._last_motion_time = now
+            self.is_idle = False
+        elif now - self._last_motion_time > self.idle_timeout:
+            self.is_idle = True
+
+    def get_stats(self) -> Dict:
+        """Статистика планировщика"""
+        return {
+            'target_fps': self.current_fps,
+            'idle': self.is_idle,
+            'frames_dropped': self.frames_dropped,
+            'capture_ms': self.last_processing_time * 1000.0
+        }
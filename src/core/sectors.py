@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Области интереса (ROI) и сетка секторов для детекции движения
+"""
+
+import numpy as np
+from typing import List, Optional, Sequence, Tuple
+from kivy.logger import Logger
+
+try:
+    import cv2
+except ImportError:
+    # Без OpenCV маска ROI и интегральное изображение строятся на NumPy
+    cv2 = None
+
+# Полигон в нормализованных координатах: [(x, y), ...], где x, y в диапазоне 0..1
+Polygon = Sequence[Tuple[float, float]]
+
+def fill_polygons(mask: np.ndarray, polygons: List[np.ndarray], value: int):
+    """Заливка полигонов (точки в пикселях) значением value"""
+    if cv2 is not None:
+        cv2.fillPoly(mask, polygons, value)
+        return
+
+    # Правило чет-нечет для центров пикселей; строится только при смене ROI
+    height, width = mask.shape
+    ys = np.arange(height, dtype=np.float64)[:, None]
+    xs = np.arange(width, dtype=np.float64)[None, :]
+    for polygon in polygons:
+        points = polygon.reshape(-1, 2).astype(np.float64)
+        inside = np.zeros(mask.shape, dtype=bool)
+        for (ax, ay), (bx, by) in zip(points, np.roll(points, -1, axis=0)):
+            if ay == by:
+                continue
+            crosses = (ay > ys) != (by > ys)
+            x_cross = ax + (ys - ay) * (bx - ax) / (by - ay)
+            inside ^= crosses & (xs < x_cross)
+        mask[inside] = value
+
+def bounding_rect(mask: np.ndarray) -> Tuple[int, int, int, int]:
+    """Рамка ненулевых пикселей: x, y, w, h (нули для пустой маски)"""
+    if cv2 is not None:
+        return cv2.boundingRect(mask)
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if not len(rows):
+        return 0, 0, 0, 0
+    return int(cols[0]), int(rows[0]), int(cols[-1] - cols[0] + 1), int(rows[-1] - rows[0] + 1)
+
+class SectorGrid:
+    """Маска ROI и сетка секторов NxM с оценкой активности по секторам"""
+
+    def __init__(self, rows: int = 3, cols: int = 3, activity_threshold: float = 0.01):
+        self.rows = 3
+        self.cols = 3
+        self.activity_threshold = activity_threshold  # Доля пикселей для активного сектора
+
+        self.include_polygons: List[np.ndarray] = []
+        self.exclude_polygons: List[np.ndarray] = []
+
+        # Кэш, построенный под размер кадра обработки
+        self._shape: Optional[Tuple[int, int]] = None
+        self._roi_mask: Optional[np.ndarray] = None
+        self._roi_full = True
+        self._bounds = (0, 0, 0, 0)  # x, y, w, h рамки ROI
+        self._row_edges: Optional[np.ndarray] = None
+        self._col_edges: Optional[np.ndarray] = None
+        self._integral: Optional[np.ndarray] = None
+        self._sector_pixels: Optional[np.ndarray] = None
+        self._masked: Optional[np.ndarray] = None
+        self._full_mask: Optional[np.ndarray] = None
+        self._binary: Optional[np.ndarray] = None
+        self._sector_active: Optional[np.ndarray] = None
+
+        self.scores = np.zeros((3, 3), dtype=np.float32)
+        self.set_grid(rows, cols)
+
+    def set_grid(self, rows: int, cols: int):
+        """Установка размера сетки секторов"""
+        self.rows = max(1, rows)
+        self.cols = max(1, cols)
+        self.scores = np.zeros((self.rows, self.cols), dtype=np.float32)
+        self._shape = None
+
+    def set_roi(self, include: Optional[List[Polygon]] = None,
+                exclude: Optional[List[Polygon]] = None):
+        """Установка полигонов ROI; без include учитывается весь кадр"""
+        try:
+            self.include_polygons = [np.asarray(p, dtype=np.float32) for p in include or []]
+            self.exclude_polygons = [np.asarray(p, dtype=np.float32) for p in exclude or []]
+        except Exception as e:
+            Logger.error(f"SectorGrid: Ошибка задания ROI: {e}")
+            self.include_polygons = []
+            self.exclude_polygons = []
+        self._shape = None
+
+    def _to_pixels(self, polygon: np.ndarray, shape: Tuple[int, int]) -> np.ndarray:
+        height, width = shape
+        points = polygon * np.array([width, height], dtype=np.float32)
+        return np.round(points).astype(np.int32).reshape((-1, 1, 2))
+
+    def prepare(self, shape: Tuple[int, int]):
+        """Построение маски ROI и границ секторов под размер кадра"""
+        if shape == self._shape:
+            return
+
+        height, width = shape
+        if self.include_polygons:
+            roi = np.zeros(shape, dtype=np.uint8)
+            fill_polygons(roi, [self._to_pixels(p, shape) for p in self.include_polygons], 255)
+        else:
+            roi = np.full(shape, 255, dtype=np.uint8)
+        if self.exclude_polygons:
+            fill_polygons(roi, [self._to_pixels(p, shape) for p in self.exclude_polygons], 0)
+
+        self._roi_mask = roi
+        self._roi_full = bool(roi.all())
+        x, y, w, h = bounding_rect(roi)
+        self._bounds = (x, y, w, h) if w and h else (0, 0, width, height)
+
+        # Границы секторов и буфер интегрального изображения
+        self._row_edges = np.linspace(0, height, self.rows + 1).astype(np.intp)
+        self._col_edges = np.linspace(0, width, self.cols + 1).astype(np.intp)
+        self._integral = np.empty((height + 1, width + 1), dtype=np.int32)
+
+        # Число пикселей ROI в каждом секторе (знаменатель оценки)
+        self._sector_pixels = self._reduce(roi // 255).astype(np.float32)
+        self._sector_active = self._sector_pixels > 0
+
+        self._full_mask = np.zeros(shape, dtype=np.uint8)
+        self._binary = np.empty(shape, dtype=np.uint8)
+        self._masked = None
+        self._shape = shape
+
+    def _reduce(self, binary: np.ndarray) -> np.ndarray:
+        """Суммы по секторам через интегральное изображение"""
+        if cv2 is not None:
+            cv2.integral(binary, sum=self._integral, sdepth=cv2.CV_32S)
+        else:
+            self._integral[0, :] = 0
+            self._integral[:, 0] = 0
+            inner = self._integral[1:, 1:]
+            np.cumsum(binary, axis=0, dtype=np.int32, out=inner)
+            np.cumsum(inner, axis=1, out=inner)
+        corners = self._integral[self._row_edges[:, None], self._col_edges[None, :]]
+        return corners[1:, 1:] - corners[:-1, 1:] - corners[1:, :-1] + corners[:-1, :-1]
+
+    def crop(self, frame: np.ndarray) -> np.ndarray:
+        """Часть кадра для детектора: рамка ROI, исключенные области обнулены"""
+        self.prepare(frame.shape[:2])
+        if self._roi_full:
+            return frame
+
+        x, y, w, h = self._bounds
+        region = frame[y:y + h, x:x + w]
+        roi = self._roi_mask[y:y + h, x:x + w]
+
+        if self._masked is None or self._masked.shape != region.shape:
+            self._masked = np.empty_like(region)
+        # Пиксели вне ROI постоянны, поэтому детектор не видит в них движения
+        if cv2 is not None:
+            cv2.bitwise_and(region, region, dst=self._masked, mask=roi)
+        else:
+            np.bitwise_and(region, roi if region.ndim == 2 else roi[:, :, None], out=self._masked)
+        return self._masked
+
+    def expand(self, mask: np.ndarray) -> np.ndarray:
+        """Маска рамки ROI -> маска полного кадра обработки"""
+        if self._roi_full:
+            return mask
+
+        x, y, w, h = self._bounds
+        target = self._full_mask[y:y + h, x:x + w]
+        np.bitwise_and(mask, self._roi_mask[y:y + h, x:x + w], out=target)
+        return self._full_mask
+
+    def score(self, mask: np.ndarray) -> np.ndarray:
+        """Доля пикселей переднего плана в каждом секторе"""
+        self.prepare(mask.shape[:2])
+        # Маска 0/255 -> 0/1
+        np.minimum(mask, 1, out=self._binary)
+        counts = self._reduce(self._binary)
+        self.scores.fill(0.0)
+        np.divide(counts, self._sector_pixels, out=self.scores, where=self._sector_active)
+        return self.scores
+
+    def active_sectors(self) -> List[int]:
+        """Номера активных секторов (построчно, начиная с 0)"""
+        return np.flatnonzero(self.scores > self.activity_threshold).tolist()
@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Последовательный транспорт для ESP32
+Кадры с префиксом длины, неблокирующая очередь записи с объединением
+команд и поток чтения телеметрии; порты USB Host (Android), pyusb,
+pyserial и tty/pty (POSIX)
+"""
+
+import collections
+import json
+import os
+import struct
+import threading
+from typing import Callable, Dict, Iterator, List, Optional
+from kivy.logger import Logger
+
+from . import esp32_protocol
+from .esp32_protocol import BinaryCodec, ProtocolError, parse_text_command
+
+try:
+    import serial
+except ImportError:
+    serial = None
+
+try:
+    import usb.core
+    import usb.util
+except ImportError:
+    usb = None
+
+# Кадр: маркер 0xA5, длина полезной нагрузки (uint16 LE), полезная нагрузка
+FRAME_MAGIC = 0xA5
+FRAME_HEADER = struct.Struct('<BH')
+MAX_PAYLOAD = 4096
+
+def encode_frame(payload: bytes) -> bytes:
+    """Упаковка полезной нагрузки в кадр"""
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"Слишком длинный кадр: {len(payload)} байт")
+    return FRAME_HEADER.pack(FRAME_MAGIC, len(payload)) + payload
+
+class FrameDecoder:
+    """Потоковый разбор кадров с восстановлением синхронизации по маркеру"""
+
+    def __init__(self, max_payload: int = MAX_PAYLOAD):
+        self.max_payload = max_payload
+        self.buffer = bytearray()
+        self.errors = 0  # Отброшенные байты и кадры с неверной длиной
+
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        """Добавление принятых байтов; возвращает готовые полезные нагрузки"""
+        self.buffer += data
+        buffer = self.buffer
+        while True:
+            start = buffer.find(FRAME_MAGIC)
+            if start < 0:
+                if buffer:
+                    self.errors += 1
+                    buffer.clear()
+                return
+            if start:
+                # Мусор до маркера (шум на линии, вывод загрузчика ESP32)
+                self.errors += 1
+                del buffer[:start]
+            if len(buffer) < FRAME_HEADER.size:
+                return
+
+            _, length = FRAME_HEADER.unpack_from(buffer)
+            if length > self.max_payload:
+                # Ложный маркер - ищем следующий
+                self.errors += 1
+                del buffer[:1]
+                continue
+
+            end = FRAME_HEADER.size + length
+            if len(buffer) < end:
+                return
+            payload = bytes(buffer[FRAME_HEADER.size:end])
+            del buffer[:end]
+            yield payload
+
+def command_key(command: str) -> Optional[str]:
+    """Ключ объединения команды: новая команда с тем же ключом заменяет старую
+
+    'TRACK:3:50:40' -> 'TRACK:3', 'SERVO:90' -> 'SERVO'; команды без
+    параметров ('PING', 'RESET') не объединяются.
+    """
+    parts = command.split(':')
+    if len(parts) >= 3:
+        return ':'.join(parts[:2])
+    if len(parts) == 2:
+        return parts[0]
+    return None
+
+class SerialPort:
+    """Базовый порт: чтение с таймаутом и запись байтов"""
+
+    def __init__(self, location: str, baudrate: int = 115200):
+        self.location = location
+        self.baudrate = baudrate
+        self.is_open = False
+
+    def open(self) -> bool:
+        raise NotImplementedError
+
+    def read(self, size: int, timeout: float) -> bytes:
+        """Чтение до size байт; b'' - данных нет за timeout"""
+        raise NotImplementedError
+
+    def write(self, data: bytes):
+        raise NotImplementedError
+
+    def close(self):
+        self.is_open = False
+
+class PosixTtyPort(SerialPort):
+    """tty или pty устройство через termios (без сторонних зависимостей)"""
+
+    def __init__(self, location: str, baudrate: int = 115200):
+        super().__init__(location, baudrate)
+        self.fd: Optional[int] = None
+
+    def open(self) -> bool:
+        import termios
+        import tty
+
+        self.fd = os.open(self.location, os.O_RDWR | os.O_NOCTTY)
+        tty.setraw(self.fd)
+        speed = getattr(termios, f'B{self.baudrate}', None)
+        if speed is not None:
+            attrs = termios.tcgetattr(self.fd)
+            attrs[4] = attrs[5] = speed
+            termios.tcsetattr(self.fd, termios.TCSANOW, attrs)
+        self.is_open = True
+        return True
+
+    def read(self, size: int, timeout: float) -> bytes:
+        import select
+
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return b''
+        data = os.read(self.fd, size)
+        if not data:
+            # Готов к чтению, но данных нет: другая сторона закрыла линию
+            raise OSError(f"Линия {self.location} закрыта")
+        return data
+
+    def write(self, data: bytes):
+        view = memoryview(data)
+        while view:
+            written = os.write(self.fd, view)
+            view = view[written:]
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        super().close()
+
+class PySerialPort(SerialPort):
+    """CDC-ACM / USB-UART на десктопе через pyserial"""
+
+    def __init__(self, location: str, baudrate: int = 115200):
+        super().__init__(location, baudrate)
+        self.serial = None
+
+    def open(self) -> bool:
+        self.serial = serial.Serial(self.location, self.baudrate, timeout=0)
+        self.is_open = True
+        return True
+
+    def read(self, size: int, timeout: float) -> bytes:
+        self.serial.timeout = timeout
+        # Первый байт ждем с таймаутом, остальное забираем без ожидания
+        data = self.serial.read(1)
+        if data and self.serial.in_waiting:
+            data += self.serial.read(min(size - 1, self.serial.in_waiting))
+        return data
+
+    def write(self, data: bytes):
+        self.serial.write(data)
+
+    def close(self):
+        if self.serial is not None:
+            self.serial.close()
+            self.serial = None
+        super().close()
+
+class PyUSBPort(SerialPort):
+    """CDC-ACM устройство напрямую через pyusb (location: 'usb:VID:PID')"""
+
+    # Класс интерфейса данных CDC и запрос SET_LINE_CODING
+    CDC_DATA_CLASS = 0x0A
+    SET_LINE_CODING = 0x20
+
+    def __init__(self, location: str, baudrate: int = 115200):
+        super().__init__(location, baudrate)
+        self.device = None
+        self.endpoint_in = None
+        self.endpoint_out = None
+
+    def open(self) -> bool:
+        _, vendor, product = self.location.split(':')
+        self.device = usb.core.find(idVendor=int(vendor, 16), idProduct=int(product, 16))
+        if self.device is None:
+            Logger.error(f"PyUSBPort: Устройство {self.location} не найдено")
+            return False
+
+        config = self.device.get_active_configuration()
+        for interface in config:
+            number = interface.bInterfaceNumber
+            if self.device.is_kernel_driver_active(number):
+                self.device.detach_kernel_driver(number)
+            if interface.bInterfaceClass == self.CDC_DATA_CLASS:
+                self.endpoint_in = usb.util.find_descriptor(interface, custom_match=lambda e:
+                    usb.util.endpoint_direction(e.bEndpointAddress) == usb.util.ENDPOINT_IN)
+                self.endpoint_out = usb.util.find_descriptor(interface, custom_match=lambda e:
+                    usb.util.endpoint_direction(e.bEndpointAddress) == usb.util.ENDPOINT_OUT)
+
+        if self.endpoint_in is None or self.endpoint_out is None:
+            Logger.error(f"PyUSBPort: {self.location} не является CDC-ACM устройством")
+            return False
+
+        # Скорость, 1 стоп-бит, без четности, 8 бит данных
+        line_coding = struct.pack('<IBBB', self.baudrate, 0, 0, 8)
+        self.device.ctrl_transfer(0x21, self.SET_LINE_CODING, 0, 0, line_coding)
+        self.is_open = True
+        return True
+
+    def read(self, size: int, timeout: float) -> bytes:
+        try:
+            size = max(size, self.endpoint_in.wMaxPacketSize)
+            return bytes(self.endpoint_in.read(size, timeout=int(timeout * 1000)))
+        except usb.core.USBTimeoutError:
+            return b''
+
+    def write(self, data: bytes):
+        self.endpoint_out.write(data)
+
+    def close(self):
+        if self.device is not None:
+            usb.util.dispose_resources(self.device)
+            self.device = None
+        super().close()
+
+class AndroidUsbPort(SerialPort):
+    """USB Host API Android через usbserial4a (CP210x, CH34x, CDC-ACM)"""
+
+    def __init__(self, location: str, baudrate: int = 115200):
+        super().__init__(location, baudrate)
+        self.serial = None
+
+    def open(self) -> bool:
+        from usb4a import usb
+        from usbserial4a import serial4a
+
+        device = usb.get_usb_device(self.location)
+        if device is None:
+            Logger.error(f"AndroidUsbPort: Устройство {self.location} не найдено")
+            return False
+        if not usb.has_usb_permission(device):
+            # Пользователь подтверждает доступ в системном диалоге; повтор - при следующем подключении
+            usb.request_usb_permission(device)
+            Logger.warning(f"AndroidUsbPort: Запрошено разрешение для {self.location}")
+            return False
+
+        self.serial = serial4a.get_serial_port(self.location, self.baudrate, 8, 'N', 1, timeout=0)
+        self.is_open = self.serial is not None and self.serial.is_open
+        return self.is_open
+
+    def read(self, size: int, timeout: float) -> bytes:
+        self.serial.timeout = timeout
+        return self.serial.read(size)
+
+    def write(self, data: bytes):
+        self.serial.write(data)
+
+    def close(self):
+        if self.serial is not None:
+            self.serial.close()
+            self.serial = None
+        super().close()
+
+def open_port(location: str, baudrate: int = 115200) -> Optional[SerialPort]:
+    """Открытие порта по адресу: 'usb:VID:PID', путь tty/pty или имя USB устройства Android"""
+    if location.startswith('usb:'):
+        port = PyUSBPort(location, baudrate) if usb is not None else None
+    elif location.startswith('/dev/bus/usb/'):
+        port = AndroidUsbPort(location, baudrate)
+    elif serial is not None:
+        port = PySerialPort(location, baudrate)
+    elif os.name == 'posix':
+        port = PosixTtyPort(location, baudrate)
+    else:
+        port = None
+
+    if port is None:
+        Logger.error(f"SerialTransport: Нет драйвера для порта {location}")
+        return None
+
+    try:
+        return port if port.open() else None
+    except Exception as e:
+        Logger.error(f"SerialTransport: Ошибка открытия порта {location}: {e}")
+        return None
+
+class SerialTransport:
+    """Обмен кадрами с ESP32: поток записи и поток чтения
+
+    send() только кладет команду в очередь и никогда не блокирует
+    вызывающий поток. Поток записи забирает все накопившиеся команды,
+    упаковывает их в кадры и отправляет одной записью; команда с тем же
+    ключом (command_key) заменяет еще не отправленную. С codec команды
+    передаются двоичным протоколом: все накопленные - одним сообщением.
+    """
+
+    # Таймаут чтения, чтобы поток замечал остановку
+    READ_TIMEOUT = 0.2
+    READ_SIZE = 4096
+
+    def __init__(self, port: SerialPort, on_message: Optional[Callable[[bytes], None]] = None,
+                 on_disconnect: Optional[Callable[[], None]] = None,
+                 max_pending: int = 256,
+                 coalesce: Callable[[str], Optional[str]] = command_key,
+                 codec: Optional[BinaryCodec] = None):
+        self.port = port
+        self.on_message = on_message        # Полезная нагрузка принятого кадра
+        self.on_disconnect = on_disconnect  # Порт закрылся из-за ошибки
+        self.max_pending = max_pending
+        self.coalesce = coalesce
+        self.codec = codec  # Двоичный протокол; None - текстовые команды
+        if codec is not None:
+            # Сообщение кодека целиком помещается в кадр
+            codec.max_message = min(codec.max_message, MAX_PAYLOAD)
+
+        # Очередь записи: ключ -> полезная нагрузка (с codec - пара
+        # (команда, попытка)) в порядке постановки
+        self.pending: collections.OrderedDict = collections.OrderedDict()
+        self.condition = threading.Condition()
+        self.decoder = FrameDecoder()
+        self._sequence = 0  # Уникальные ключи для необъединяемых команд
+        self._protocol_errors = 0
+
+        self.stats = {
+            'frames_sent': 0,
+            'bytes_sent': 0,
+            'writes': 0,
+            'coalesced': 0,
+            'dropped': 0,
+            'frames_received': 0,
+            'decode_errors': 0,
+            'io_errors': 0
+        }
+
+        self.threads: List[threading.Thread] = []
+        self.stop_event = threading.Event()
+
+    @property
+    def is_running(self) -> bool:
+        return not self.stop_event.is_set() and any(thread.is_alive() for thread in self.threads)
+
+    def start(self):
+        """Запуск потоков записи и чтения"""
+        self.stop_event.clear()
+        self.threads = []
+        for name, target in (('writer', self._write_loop), ('reader', self._read_loop)):
+            thread = threading.Thread(target=target, name=f'SerialTransport-{name}')
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, timeout: float = 1.0):
+        """Остановка потоков и закрытие порта"""
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify_all()
+        for thread in self.threads:
+            if thread.is_alive() and thread is not threading.current_thread():
+                thread.join(timeout=timeout)
+        self.threads = []
+        self.port.close()
+
+    def send(self, command, key: Optional[str] = None) -> bool:
+        """Постановка команды в очередь записи без блокировки
+
+        Текстовый режим: str или bytes. Двоичный: str (разбирается
+        parse_text_command) или кортеж команды esp32_protocol.
+        """
+        if self.stop_event.is_set():
+            return False
+        if self.codec is not None:
+            if isinstance(command, str):
+                if key is None:
+                    key = self.coalesce(command)
+                try:
+                    command = parse_text_command(command)
+                except ProtocolError as e:
+                    Logger.error(f"SerialTransport: {e}")
+                    return False
+            elif key is None:
+                key = esp32_protocol.command_key(command)
+            payload = (command, 0)
+        else:
+            if isinstance(command, str):
+                if key is None:
+                    key = self.coalesce(command)
+                payload = command.encode('utf-8')
+            else:
+                payload = bytes(command)
+            if len(payload) > MAX_PAYLOAD:
+                Logger.error(f"SerialTransport: Команда длиннее {MAX_PAYLOAD} байт")
+                return False
+
+        with self.condition:
+            self._enqueue(key, payload)
+        return True
+
+    def _enqueue(self, key, payload, replace: bool = True):
+        """Добавление в очередь записи (вызывается под self.condition)"""
+        if key is not None and key in self.pending:
+            # Неотправленная команда заменяется новой на своем месте в очереди;
+            # повторная отправка не затирает более новую команду
+            if replace:
+                self.pending[key] = payload
+                self.stats['coalesced'] += 1
+            return
+
+        if key is None:
+            self._sequence += 1
+            key = self._sequence
+        if len(self.pending) >= self.max_pending:
+            self.pending.popitem(last=False)
+            self.stats['dropped'] += 1
+        self.pending[key] = payload
+        self.condition.notify()
+
+    def _write_loop(self):
+        """Поток записи: все накопленные команды одной записью в порт"""
+        while not self.stop_event.is_set():
+            with self.condition:
+                if self.codec is not None:
+                    # Команды без подтверждения - обратно в очередь
+                    for command, attempt in self.codec.expired():
+                        self._enqueue(esp32_protocol.command_key(command), (command, attempt),
+                                      replace=False)
+                if not self.pending:
+                    self.condition.wait(self.codec.next_timeout() if self.codec else None)
+                    continue
+                payloads = list(self.pending.values())
+                self.pending.clear()
+
+            try:
+                if self.codec is not None:
+                    payloads = self.codec.encode_messages(payloads)
+                data = b''.join(encode_frame(payload) for payload in payloads)
+            except Exception as e:
+                # Пакет не кодируется: теряем его, но поток записи продолжает работу
+                self.stats['dropped'] += len(payloads)
+                Logger.error(f"SerialTransport: Ошибка кодирования команд: {e}")
+                continue
+
+            try:
+                self.port.write(data)
+                self.stats['frames_sent'] += len(payloads)
+                self.stats['bytes_sent'] += len(data)
+                self.stats['writes'] += 1
+            except Exception as e:
+                self.stats['io_errors'] += 1
+                Logger.error(f"SerialTransport: Ошибка записи в {self.port.location}: {e}")
+                self._disconnect()
+
+    def _read_loop(self):
+        """Поток чтения: разбор кадров телеметрии"""
+        while not self.stop_event.is_set():
+            try:
+                data = self.port.read(self.READ_SIZE, self.READ_TIMEOUT)
+            except Exception as e:
+                if not self.stop_event.is_set():
+                    self.stats['io_errors'] += 1
+                    Logger.error(f"SerialTransport: Ошибка чтения из {self.port.location}: {e}")
+                    self._disconnect()
+                return
+
+            if not data:
+                continue
+            for payload in self.decoder.feed(data):
+                self.stats['frames_received'] += 1
+                if self.codec is not None:
+                    payload = self._handle_message(payload)
+                    if payload is None:
+                        continue
+                if self.on_message:
+                    try:
+                        self.on_message(payload)
+                    except Exception as e:
+                        Logger.error(f"SerialTransport: Ошибка обработчика телеметрии: {e}")
+            self.stats['decode_errors'] = self.decoder.errors + self._protocol_errors
+
+    def _handle_message(self, payload: bytes) -> Optional[bytes]:
+        """Сообщение двоичного протокола: подтверждения учитываются здесь,
+        тело телеметрии возвращается обработчику"""
+        try:
+            message = self.codec.decode(payload)
+        except ProtocolError as e:
+            self._protocol_errors += 1
+            Logger.warning(f"SerialTransport: Отброшено сообщение: {e}")
+            return None
+
+        if message.type == esp32_protocol.MSG_ACK:
+            self.codec.acknowledge(message.ack_seq)
+            return None
+        if message.type == esp32_protocol.MSG_TELEMETRY:
+            return message.body
+        return None
+
+    def _disconnect(self):
+        """Остановка после ошибки ввода-вывода (устройство отключено)"""
+        if self.stop_event.is_set():
+            return
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify_all()
+        self.port.close()
+        if self.on_disconnect:
+            self.on_disconnect()
+
+    def get_stats(self) -> Dict:
+        stats = dict(self.stats)
+        stats['pending'] = len(self.pending)
+        if self.codec is not None:
+            stats['protocol'] = self.codec.get_stats()
+        return stats
+
+def parse_telemetry(payload: bytes) -> Dict:
+    """Телеметрия ESP32: JSON объект или пары 'key=value;key=value'"""
+    text = payload.decode('utf-8', errors='replace').strip()
+    if text.startswith('{'):
+        data = json.loads(text)
+        return data if isinstance(data, dict) else {'message': data}
+
+    data = {}
+    for pair in text.split(';'):
+        key, sep, value = pair.partition('=')
+        if not sep:
+            continue
+        try:
+            data[key.strip()] = float(value) if '.' in value else int(value)
+        except ValueError:
+            data[key.strip()] = value.strip()
+    return data or {'message': text}
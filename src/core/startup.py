@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Поэтапный запуск приложения
+Интерфейс показывается сразу, OpenCV и детектор загружаются фоновым
+потоком; время импорта модулей и до первого кадра пишется в отчет
+"""
+
+import importlib
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+# Запусков в файле истории отчетов
+REPORT_HISTORY = 20
+
+def process_age() -> Optional[float]:
+    """Секунд с запуска процесса (Linux и Android, /proc); None - недоступно"""
+    try:
+        with open('/proc/self/stat') as f:
+            # Имя процесса в скобках может содержать пробелы
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        start_ticks = int(fields[19])  # starttime: поле 22 от начала
+        return max(0.0, uptime - start_ticks / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError):
+        return None
+
+class StartupReport:
+    """Время импорта модулей, этапов запуска и ключевых моментов
+
+    Моменты (marks) отсчитываются от запуска процесса, если его время
+    доступно, иначе - от создания отчета.
+    """
+
+    def __init__(self):
+        age = process_age()
+        self.origin = time.monotonic() - (age or 0.0)
+        self.from_process_start = age is not None
+        self.started = time.time() - (age or 0.0)
+        self.imports: Dict[str, float] = {}  # Модуль -> мс импорта
+        self.stages: Dict[str, float] = {}   # Этап -> мс выполнения
+        self.marks: Dict[str, float] = {}    # Момент -> мс от старта
+        self.lock = threading.Lock()
+
+    def elapsed_ms(self) -> float:
+        return (time.monotonic() - self.origin) * 1000.0
+
+    def mark(self, name: str, once: bool = True) -> float:
+        """Отметка момента запуска ('ui_ready', 'core_ready', 'first_frame', 'first_processed')"""
+        with self.lock:
+            if once and name in self.marks:
+                return self.marks[name]
+            self.marks[name] = self.elapsed_ms()
+            return self.marks[name]
+
+    def import_module(self, name: str, package: Optional[str] = None):
+        """Импорт с замером; уже загруженный модуль не учитывается"""
+        resolved = importlib.util.resolve_name(name, package) if name.startswith('.') else name
+        if resolved in sys.modules:
+            return sys.modules[resolved]
+        start = time.perf_counter()
+        module = importlib.import_module(resolved)
+        with self.lock:
+            self.imports[resolved] = (time.perf_counter() - start) * 1000.0
+        return module
+
+    @contextmanager
+    def stage(self, name: str):
+        """Замер этапа запуска"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.stages[name] = (time.perf_counter() - start) * 1000.0
+
+    def to_dict(self) -> Dict:
+        with self.lock:
+            return {
+                'timestamp': time.time(),
+                'started': round(self.started, 3),
+                'from_process_start': self.from_process_start,
+                'marks_ms': {name: round(value, 1) for name, value in self.marks.items()},
+                'stages_ms': {name: round(value, 1) for name, value in self.stages.items()},
+                'imports_ms': {name: round(value, 1) for name, value in self.imports.items()}
+            }
+
+    def save(self, path: str, version: str = '') -> bool:
+        """Добавление отчета в файл истории (последние REPORT_HISTORY запусков)
+
+        Повторная запись того же запуска (новые отметки) заменяет его отчет.
+        """
+        report = self.to_dict()
+        report['version'] = version
+        try:
+            history = []
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as f:
+                    history = json.load(f)
+            if history and history[-1].get('started') == report['started']:
+                history.pop()
+            history = (history + [report])[-REPORT_HISTORY:]
+
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(history, f, ensure_ascii=False, indent=1)
+            return True
+
+        except Exception as e:
+            Logger.error(f"StartupReport: Ошибка записи отчета {path}: {e}")
+            return False
+
+    def summary(self) -> str:
+        """Строка для журнала"""
+        marks = ', '.join(f'{name} {value:.0f} мс' for name, value in self.marks.items())
+        imports = ', '.join(f'{name} {value:.0f} мс' for name, value in self.imports.items())
+        return f"{marks}; импорт: {imports}"
+
+Stage = Tuple[str, Callable[[], object]]
+
+class StagedStartup:
+    """Фоновое выполнение этапов запуска с состоянием прогресса
+
+    Этапы выполняются по порядку в отдельном потоке; обработчики
+    on_progress(этап, доля), on_ready(результаты) и on_error(этап, ошибка)
+    вызываются в потоке интерфейса через Clock.
+    """
+
+    def __init__(self, stages: List[Stage], report: Optional[StartupReport] = None,
+                 on_progress: Optional[Callable[[str, float], None]] = None,
+                 on_ready: Optional[Callable[[Dict], None]] = None,
+                 on_error: Optional[Callable[[str, Exception], None]] = None):
+        self.stages = stages
+        self.report = report or StartupReport()
+        self.on_progress = on_progress
+        self.on_ready = on_ready
+        self.on_error = on_error
+
+        self.state = 'idle'  # 'idle', 'running', 'ready', 'failed'
+        self.current_stage = ''
+        self.progress = 0.0
+        self.error: Optional[Exception] = None
+        self.results: Dict[str, object] = {}
+
+        self.thread: Optional[threading.Thread] = None
+        self.done_event = threading.Event()
+
+    @property
+    def is_ready(self) -> bool:
+        return self.state == 'ready'
+
+    def start(self):
+        """Запуск этапов в фоне (повторный вызов ничего не делает)"""
+        if self.state != 'idle':
+            return
+        self.state = 'running'
+        self.thread = threading.Thread(target=self._run, name='StagedStartup')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Ожидание завершения; True - все этапы выполнены"""
+        self.done_event.wait(timeout)
+        return self.is_ready
+
+    def _dispatch(self, callback: Optional[Callable], *args):
+        if callback:
+            Clock.schedule_once(lambda dt: callback(*args), 0)
+
+    def _run(self):
+        count = len(self.stages)
+        for index, (name, function) in enumerate(self.stages):
+            self.current_stage = name
+            self._dispatch(self.on_progress, name, index / count)
+            try:
+                with self.report.stage(name):
+                    self.results[name] = function()
+            except Exception as e:
+                self.state = 'failed'
+                self.error = e
+                Logger.error(f"StagedStartup: Ошибка этапа {name}: {e}")
+                self._dispatch(self.on_error, name, e)
+                self.done_event.set()
+                return
+            self.progress = (index + 1) / count
+
+        self.state = 'ready'
+        self.current_stage = ''
+        self.report.mark('core_ready')
+        Logger.info(f"StagedStartup: Запуск завершен: {self.report.summary()}")
+        self._dispatch(self.on_progress, '', 1.0)
+        self._dispatch(self.on_ready, self.results)
+        self.done_event.set()
+
+def import_optional(report: StartupReport, name: str):
+    """Импорт необязательного модуля; None, если его нет в сборке"""
+    try:
+        return report.import_module(name)
+    except ImportError:
+        Logger.warning(f"StagedStartup: Модуль {name} недоступен")
+        return None
+
+def core_stages(report: StartupReport) -> List[Stage]:
+    """Этапы загрузки ядра: numpy, OpenCV, модуль трекера, трекер с детектором"""
+    def create_tracker():
+        module = report.import_module('.motion_tracker', __package__)
+        tracker = module.MotionTracker()
+        tracker.set_detector(tracker.detector_name)
+        return tracker
+
+    return [
+        ('numpy', lambda: report.import_module('numpy')),
+        ('opencv', lambda: import_optional(report, 'cv2')),
+        ('tracker', create_tracker)
+    ]
+
+def mark_first_processed(tracker, report: StartupReport,
+                         callback: Optional[Callable[[StartupReport], None]] = None):
+    """Отметка 'first_processed' по первому обработанному кадру трекера"""
+    def listener(snapshot):
+        if snapshot.frames_processed < 1:
+            return
+        tracker.remove_stats_listener(listener)
+        report.mark('first_processed')
+        if callback:
+            callback(report)
+
+    tracker.add_stats_listener(listener)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Снимки статистики трекинга
+Неизменяемый снимок публикуется раз в кадр заменой ссылки; читатели
+получают согласованное состояние без блокировок и копирования
+"""
+
+import numpy as np
+from typing import Callable, Dict, NamedTuple, Tuple
+from kivy.logger import Logger
+
+from .blobs import EMPTY_BLOBS
+from .object_tracker import TRACK_DTYPE
+
+EMPTY_SECTORS = np.zeros((0, 0), dtype=np.float32)
+EMPTY_SECTORS.flags.writeable = False
+EMPTY_TRACKS = np.zeros(0, dtype=TRACK_DTYPE)
+EMPTY_TRACKS.flags.writeable = False
+
+class TrackerStats(NamedTuple):
+    """Статистика трекинга на момент публикации кадра"""
+
+    frames_processed: int = 0
+    motion_detections: int = 0
+    motion_detected: bool = False
+    fps: float = 0.0
+    last_motion_time: float = 0.0
+    bytes_per_frame: int = 0
+    detector: str = 'mog2'
+    detector_cost_ms: float = 0.0
+    sectors: np.ndarray = EMPTY_SECTORS  # Активность секторов, только для чтения
+    active_sectors: Tuple[int, ...] = ()
+    blob_count: int = 0
+    track_count: int = 0
+
+    # Пятна и треки этого кадра (только для чтения) для отрисовки
+    blobs: np.ndarray = EMPTY_BLOBS    # BLOB_DTYPE
+    tracks: np.ndarray = EMPTY_TRACKS  # TRACK_DTYPE
+    frame_size: Tuple[int, int] = (0, 0)
+
+    # Планировщик кадров
+    target_fps: float = 0.0
+    idle: bool = False
+    frames_dropped: int = 0
+    processing_ms: float = 0.0  # Стадия детекции кадра
+    capture_ms: float = 0.0     # Стадия захвата (чтение и преобразование)
+
+    timestamp: float = 0.0  # time.time() публикации
+
+    def as_dict(self) -> Dict:
+        """Словарь в формате прежнего MotionTracker.stats"""
+        stats = self._asdict()
+        del stats['blobs'], stats['tracks'], stats['frame_size']
+        stats['sectors'] = self.sectors.tolist()
+        stats['active_sectors'] = list(self.active_sectors)
+        return stats
+
+StatsListener = Callable[[TrackerStats], None]
+
+class StatsPublisher:
+    """Последний снимок статистики и подписчики на новые снимки
+
+    Публикует один поток: стадия публикации конвейера, а при остановленном
+    конвейере - поток, управляющий трекером (сброс, смена движка). Присваивание
+    ссылки атомарно, а снимок не изменяется, поэтому читатель из любого
+    потока видит целиком либо старый, либо новый снимок. Список
+    подписчиков заменяется целиком при изменении (копирование при записи),
+    поэтому публикация перебирает его без блокировки.
+    """
+
+    def __init__(self, initial: TrackerStats = TrackerStats()):
+        self.snapshot = initial
+        self.version = 0  # Номер публикации: читатель замечает новый снимок без сравнения полей
+        self.listeners: Tuple[StatsListener, ...] = ()
+
+    def publish(self, snapshot: TrackerStats):
+        """Замена снимка и уведомление подписчиков (в потоке публикации)"""
+        self.snapshot = snapshot
+        self.version += 1
+        for listener in self.listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                Logger.error(f"StatsPublisher: Ошибка обработчика статистики: {e}")
+
+    def add_listener(self, callback: StatsListener):
+        if callback not in self.listeners:
+            self.listeners = self.listeners + (callback,)
+
+    def remove_listener(self, callback: StatsListener):
+        self.listeners = tuple(listener for listener in self.listeners if listener != callback)
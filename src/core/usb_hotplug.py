@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Уведомления о подключении и отключении USB устройств
+Широковещательные сообщения USB Host на Android, uevent через netlink на Linux
+"""
+
+import os
+import select
+import socket
+import sys
+import threading
+from typing import Callable, Dict, Optional
+from kivy.logger import Logger
+
+# Обработчик события: ('add' или 'remove', сведения об устройстве)
+# Сведения - те же ключи, что у OTGManager._get_android_usb_devices
+HotplugCallback = Callable[[str, Dict], None]
+
+class HotplugMonitor:
+    """Базовый источник событий подключения USB"""
+
+    name = 'base'
+
+    def __init__(self, callback: HotplugCallback):
+        self.callback = callback
+        self.is_running = False
+
+    def start(self) -> bool:
+        raise NotImplementedError
+
+    def stop(self):
+        self.is_running = False
+
+    def _emit(self, action: str, info: Dict):
+        if not info.get('device_id'):
+            return
+        try:
+            self.callback(action, info)
+        except Exception as e:
+            Logger.error(f"HotplugMonitor: Ошибка обработчика события {action}: {e}")
+
+def android_device_info(device) -> Dict:
+    """Сведения об android.hardware.usb.UsbDevice"""
+    return {
+        'device_id': device.getDeviceName(),
+        'vendor_id': device.getVendorId(),
+        'product_id': device.getProductId(),
+        'name': device.getDeviceName(),
+        'manufacturer': device.getManufacturerName() or '',
+        'product': device.getProductName() or ''
+    }
+
+class AndroidHotplugMonitor(HotplugMonitor):
+    """USB_DEVICE_ATTACHED / USB_DEVICE_DETACHED через BroadcastReceiver"""
+
+    name = 'android'
+
+    ACTION_ATTACHED = 'android.hardware.usb.action.USB_DEVICE_ATTACHED'
+    ACTION_DETACHED = 'android.hardware.usb.action.USB_DEVICE_DETACHED'
+
+    def __init__(self, callback: HotplugCallback):
+        super().__init__(callback)
+        self.receiver = None
+        self.extra_device = None
+
+    def start(self) -> bool:
+        try:
+            from android import activity
+            from android.broadcast import BroadcastReceiver
+            from jnius import autoclass
+
+            self.extra_device = autoclass('android.hardware.usb.UsbManager').EXTRA_DEVICE
+            self.receiver = BroadcastReceiver(self._on_broadcast,
+                                              actions=[self.ACTION_ATTACHED, self.ACTION_DETACHED])
+            self.receiver.start()
+
+            # ATTACHED может прийти и как новый intent активности (intent-filter манифеста)
+            activity.bind(on_new_intent=self._on_new_intent)
+            self.is_running = True
+            return True
+
+        except Exception as e:
+            Logger.warning(f"AndroidHotplugMonitor: Широковещательные сообщения недоступны: {e}")
+            return False
+
+    def stop(self):
+        try:
+            if self.receiver:
+                self.receiver.stop()
+                self.receiver = None
+            from android import activity
+            activity.unbind(on_new_intent=self._on_new_intent)
+        except Exception as e:
+            Logger.warning(f"AndroidHotplugMonitor: Ошибка остановки: {e}")
+        super().stop()
+
+    def _on_broadcast(self, context, intent):
+        self._handle_intent(intent)
+
+    def _on_new_intent(self, intent):
+        self._handle_intent(intent)
+
+    def _handle_intent(self, intent):
+        action = intent.getAction()
+        if action not in (self.ACTION_ATTACHED, self.ACTION_DETACHED):
+            return
+        device = intent.getParcelableExtra(self.extra_device)
+        if device is None:
+            return
+        self._emit('add' if action == self.ACTION_ATTACHED else 'remove', android_device_info(device))
+
+def parse_uevent(data: bytes) -> Dict[str, str]:
+    """Сообщение uevent ядра: 'add@/devpath\\0KEY=VALUE\\0...' -> словарь"""
+    env = {}
+    for field in data.split(b'\0')[1:]:
+        key, sep, value = field.partition(b'=')
+        if sep:
+            env[key.decode('ascii', errors='replace')] = value.decode('utf-8', errors='replace')
+    return env
+
+def _read_sysfs(devpath: str, attribute: str) -> str:
+    try:
+        with open(f'/sys{devpath}/{attribute}', encoding='utf-8', errors='replace') as f:
+            return f.read().strip()
+    except OSError:
+        return ''
+
+def uevent_device_info(env: Dict[str, str]) -> Dict:
+    """Сведения об USB устройстве из uevent (и sysfs для подключенного)"""
+    vendor_id = product_id = 0
+    product_field = env.get('PRODUCT', '')
+    if product_field.count('/') >= 2:
+        vendor, product, _ = product_field.split('/', 2)
+        vendor_id, product_id = int(vendor, 16), int(product, 16)
+
+    devpath = env.get('DEVPATH', '')
+    product = _read_sysfs(devpath, 'product') if env.get('ACTION') == 'add' else ''
+    return {
+        'device_id': f"/dev/{env['DEVNAME']}" if env.get('DEVNAME') else '',
+        'vendor_id': vendor_id,
+        'product_id': product_id,
+        'name': product or env.get('DEVNAME', ''),
+        'manufacturer': _read_sysfs(devpath, 'manufacturer') if product else '',
+        'product': product
+    }
+
+class NetlinkHotplugMonitor(HotplugMonitor):
+    """uevent ядра Linux через сокет NETLINK_KOBJECT_UEVENT (как udev)"""
+
+    name = 'netlink'
+
+    NETLINK_KOBJECT_UEVENT = 15
+    UEVENT_GROUP = 1  # Группа событий ядра (до обработки udev)
+
+    # Таймаут ожидания, чтобы поток замечал остановку
+    SELECT_TIMEOUT = 0.5
+
+    def __init__(self, callback: HotplugCallback):
+        super().__init__(callback)
+        self.sock: Optional[socket.socket] = None
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+
+    def start(self) -> bool:
+        try:
+            self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM,
+                                      self.NETLINK_KOBJECT_UEVENT)
+            self.sock.bind((0, self.UEVENT_GROUP))
+        except (AttributeError, OSError) as e:
+            Logger.warning(f"NetlinkHotplugMonitor: Сокет uevent недоступен: {e}")
+            self.sock = None
+            return False
+
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._loop, name='NetlinkHotplugMonitor')
+        self.thread.daemon = True
+        self.thread.start()
+        self.is_running = True
+        return True
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+        self.thread = None
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+        super().stop()
+
+    def _loop(self):
+        while not self.stop_event.is_set():
+            try:
+                ready, _, _ = select.select([self.sock], [], [], self.SELECT_TIMEOUT)
+                if not ready:
+                    continue
+                env = parse_uevent(self.sock.recv(65536))
+            except Exception as e:
+                if not self.stop_event.is_set():
+                    Logger.error(f"NetlinkHotplugMonitor: Ошибка чтения uevent: {e}")
+                return
+
+            # Только устройства целиком, не их интерфейсы
+            if env.get('SUBSYSTEM') != 'usb' or env.get('DEVTYPE') != 'usb_device':
+                continue
+            action = env.get('ACTION')
+            if action in ('add', 'remove'):
+                self._emit(action, uevent_device_info(env))
+
+def create_hotplug_monitor(callback: HotplugCallback) -> Optional[HotplugMonitor]:
+    """Запуск доступного источника событий; None - остается только опрос шины"""
+    candidates = []
+    if 'ANDROID_ARGUMENT' in os.environ or 'ANDROID_PRIVATE' in os.environ:
+        candidates.append(AndroidHotplugMonitor)
+    elif sys.platform.startswith('linux'):
+        candidates.append(NetlinkHotplugMonitor)
+
+    for monitor_class in candidates:
+        monitor = monitor_class(callback)
+        if monitor.start():
+            Logger.info(f"HotplugMonitor: События USB: {monitor.name}")
+            return monitor
+    return None
@@ -5,39 +5,48 @@
 """
 
 from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.floatlayout import FloatLayout
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.button import Button
 from kivy.uix.label import Label
+from kivy.uix.image import Image
 from kivy.uix.slider import Slider
 from kivy.uix.switch import Switch
-from kivy.uix.camera import Camera
 from kivy.uix.popup import Popup
 from kivy.uix.scrollview import ScrollView
 from kivy.graphics import Color, Rectangle
 from kivy.clock import Clock
 from kivy.logger import Logger
 
+from .ui_updater import UIUpdater
+
+# Цвета индикаторов
+COLOR_BACKGROUND = (0.2, 0.2, 0.2, 1)
+COLOR_ACTIVE = (0, 1, 0, 1)
+COLOR_ALERT = (1, 0, 0, 1)
+COLOR_INACTIVE = (0.5, 0.5, 0.5, 1)
+
 class StatusIndicator(Label):
     """Индикатор статуса с цветовой индикацией"""
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        # Инструкции фона создаются один раз; дальше меняются только их свойства
+        with self.canvas.before:
+            self.background_color = Color(*COLOR_BACKGROUND)
+            self.background_rect = Rectangle(pos=self.pos, size=self.size)
         self.bind(size=self._update_rect, pos=self._update_rect)
-        self._update_rect()
     
     def _update_rect(self, *args):
-        self.canvas.before.clear()
-        with self.canvas.before:
-            Color(0.2, 0.2, 0.2, 1)  # Темно-серый фон
-            Rectangle(pos=self.pos, size=self.size)
+        self.background_rect.pos = self.pos
+        self.background_rect.size = self.size
     
-    def set_status(self, status: str, color: tuple = (0, 1, 0, 1)):
+    def set_status(self, status: str, color: tuple = COLOR_ACTIVE):
         """Установка статуса с цветом"""
-        self.text = status
-        self.canvas.before.clear()
-        with self.canvas.before:
-            Color(*color)
-            Rectangle(pos=self.pos, size=self.size)
+        if self.text != status:
+            self.text = status
+        if tuple(self.background_color.rgba) != tuple(color):
+            self.background_color.rgba = color
 
 class MainScreen(BoxLayout):
     """Главный экран приложения"""
@@ -50,9 +59,27 @@ class MainScreen(BoxLayout):
         
         # Компоненты интерфейса
         self.camera_widget = None
+        self.camera_view = None
+        self.loading_label = None
+        self.overlay = None
         self.status_indicators = {}
         self.control_buttons = {}
         self.settings_panel = None
+        self.controller = None  # AppController: команды кнопок и настроек
+        self.camera = None      # Камера, чьи кадры показывает camera_widget
+        self.detection = None   # Последние пятна, треки и секторы для наложения
+        
+        # Обновления из потоков трекера и OTG: не чаще 10 раз в секунду
+        self.ui_updater = UIUpdater(max_rate=10.0)
+        self.ui_updater.register('fps', self._apply_fps)
+        self.ui_updater.register('motion', self._apply_motion)
+        self.ui_updater.register('otg', self._apply_otg)
+        self.ui_updater.register('esp32', self._apply_esp32)
+        self.ui_updater.register('sensitivity', self._apply_sensitivity)
+        self.ui_updater.register('tracking', self._apply_tracking)
+        self.ui_updater.register('status', self._apply_status)
+        self.ui_updater.register('camera', self._apply_camera)
+        self.ui_updater.register('detection', self._apply_detection)
         
         # Создаем интерфейс
         self._create_interface()
@@ -110,13 +137,16 @@ class MainScreen(BoxLayout):
         """Создание области камеры"""
         camera_container = BoxLayout(orientation='vertical', size_hint_x=0.6)
         
-        # Видео с камеры
-        self.camera_widget = Camera(
-            resolution=(640, 480),
-            play=True,
-            size_hint_y=0.8
+        # Видео с камеры появляется после фоновой загрузки (attach_camera);
+        # до этого - состояние загрузки
+        self.camera_view = FloatLayout(size_hint_y=0.8)
+        self.loading_label = Label(
+            text='Загрузка...',
+            font_size='16sp',
+            color=(0.8, 0.8, 0.8, 1)
         )
-        camera_container.add_widget(self.camera_widget)
+        self.camera_view.add_widget(self.loading_label)
+        camera_container.add_widget(self.camera_view)
         
         # Индикатор движения
         motion_indicator = StatusIndicator(
@@ -318,71 +348,169 @@ class MainScreen(BoxLayout):
     
     def _toggle_tracking(self, instance):
         """Переключение трекинга"""
-        if self.control_buttons['start'].text == 'СТАРТ':
-            self.control_buttons['start'].text = 'СТОП'
-            self.control_buttons['start'].background_color = (0.7, 0, 0, 1)
-            Logger.info("MainScreen: Запуск трекинга")
-        else:
-            self.control_buttons['start'].text = 'СТАРТ'
-            self.control_buttons['start'].background_color = (0, 0.7, 0, 1)
-            Logger.info("MainScreen: Остановка трекинга")
+        if not self.controller:
+            return
+        running = self.controller.toggle_tracking()
+        Logger.info(f"MainScreen: {'Запуск' if running else 'Остановка'} трекинга")
     
     def _reset_tracking(self, instance):
         """Сброс трекинга"""
         Logger.info("MainScreen: Сброс трекинга")
-        # Здесь будет логика сброса
+        if self.controller:
+            self.controller.reset()
     
     def _calibrate_camera(self, instance):
         """Калибровка камеры"""
         Logger.info("MainScreen: Калибровка камеры")
-        # Здесь будет логика калибровки
+        if self.controller and self.controller.calibrate():
+            self.ui_updater.post('status', 'Фон обновлен')
     
     def _show_otg_devices(self, instance):
         """Показ OTG устройств"""
         Logger.info("MainScreen: Показ OTG устройств")
-        # Здесь будет показ списка устройств
+        if not self.controller:
+            return
+        
+        devices = self.controller.get_otg_devices()
+        lines = [f"{d.name} ({d.device_type}): {'подключено' if d.connected else 'обнаружено'}"
+                 for d in devices]
+        text = Label(
+            text='\n'.join(lines) if lines else 'Устройства не найдены',
+            font_size='14sp',
+            size_hint_y=None,
+            halign='left',
+            valign='top'
+        )
+        text.bind(width=lambda label, width: setattr(label, 'text_size', (width, None)),
+                  texture_size=lambda label, size: setattr(label, 'height', size[1]))
+        content = ScrollView()
+        content.add_widget(text)
+        Popup(title='OTG устройства', content=content, size_hint=(0.8, 0.6)).open()
     
     def _on_sensitivity_change(self, instance, value):
         """Изменение чувствительности"""
-        self.status_indicators['sensitivity'].text = f'Чувствительность: {int(value)}%'
+        if self.controller:
+            self.controller.set_sensitivity(int(value))
+        self.ui_updater.post('sensitivity', int(value))
         Logger.info(f"MainScreen: Изменена чувствительность на {int(value)}%")
     
     def _toggle_display_mode(self, instance, value):
         """Переключение режима отображения"""
         mode = "включено" if value else "отключено"
+        if self.overlay:
+            self.overlay.show_sectors = value
         Logger.info(f"MainScreen: Отображение секторов {mode}")
     
-    def update_stats(self, stats: dict):
-        """Обновление статистики"""
-        if 'fps' in stats:
-            self.status_indicators['fps'].text = f'FPS: {stats["fps"]:.1f}'
-        
-        if 'motion_detections' in stats:
-            motion_text = 'Движение: ДА' if stats.get('motion_detected', False) else 'Движение: НЕТ'
-            self.status_indicators['motion'].text = motion_text
-            
-            # Обновляем цвет индикатора
-            color = (1, 0, 0, 1) if stats.get('motion_detected', False) else (0, 1, 0, 1)
-            self.status_indicators['motion'].set_status(motion_text, color)
+    def update_detection(self, snapshot):
+        """Снимок трекера с результатами детекции кадра для наложения (из любого потока)
+        
+        Массивы не сравниваются: ключ 'detection' - время публикации снимка,
+        наложение перерисовывается вместе с остальным экраном при сбросе.
+        """
+        self.detection = (snapshot.blobs, snapshot.tracks, snapshot.sectors, snapshot.frame_size)
+        self.ui_updater.post_many({
+            'fps': round(snapshot.fps, 1),
+            'motion': snapshot.motion_detected,
+            'detection': snapshot.timestamp
+        })
+    
+    def set_tracking(self, running: bool):
+        """Состояние трекинга для кнопки запуска (из любого потока)"""
+        self.ui_updater.post('tracking', running)
+    
+    def set_camera_status(self, ready: bool):
+        """Состояние камеры (из любого потока)"""
+        self.ui_updater.post('camera', ready)
     
     def update_otg_status(self, devices: list):
-        """Обновление статуса OTG устройств"""
-        device_count = len(devices)
-        self.status_indicators['otg'].text = f'OTG: {device_count}'
-        
-        # Проверяем наличие ESP32
-        esp32_count = len([d for d in devices if d.device_type == 'esp32'])
-        self.status_indicators['esp32'].text = f'ESP32: {esp32_count}'
-        
-        # Обновляем цвета индикаторов
-        otg_color = (0, 1, 0, 1) if device_count > 0 else (0.5, 0.5, 0.5, 1)
-        esp32_color = (0, 1, 0, 1) if esp32_count > 0 else (0.5, 0.5, 0.5, 1)
-        
-        self.status_indicators['otg'].set_status(f'OTG: {device_count}', otg_color)
-        self.status_indicators['esp32'].set_status(f'ESP32: {esp32_count}', esp32_color)
+        """Обновление статуса OTG устройств (из любого потока)"""
+        esp32_count = sum(1 for d in devices if d.device_type == 'esp32')
+        self.ui_updater.post_many({'otg': len(devices), 'esp32': esp32_count})
+    
+    def _apply_fps(self, fps: float):
+        self.status_indicators['fps'].text = f'FPS: {fps:.1f}'
+    
+    def _apply_motion(self, motion_detected: bool):
+        if motion_detected:
+            self.status_indicators['motion'].set_status('Движение: ДА', COLOR_ALERT)
+        else:
+            self.status_indicators['motion'].set_status('Движение: НЕТ', COLOR_ACTIVE)
+    
+    def _apply_otg(self, device_count: int):
+        color = COLOR_ACTIVE if device_count > 0 else COLOR_INACTIVE
+        self.status_indicators['otg'].set_status(f'OTG: {device_count}', color)
+    
+    def _apply_esp32(self, esp32_count: int):
+        color = COLOR_ACTIVE if esp32_count > 0 else COLOR_INACTIVE
+        self.status_indicators['esp32'].set_status(f'ESP32: {esp32_count}', color)
+    
+    def _apply_sensitivity(self, value: int):
+        self.status_indicators['sensitivity'].text = f'Чувствительность: {value}%'
+    
+    def _apply_tracking(self, running: bool):
+        if running:
+            self.control_buttons['start'].text = 'СТОП'
+            self.control_buttons['start'].background_color = (0.7, 0, 0, 1)
+            self.status_indicators['general'].set_status('Трекинг: АКТИВЕН', COLOR_ACTIVE)
+        else:
+            self.control_buttons['start'].text = 'СТАРТ'
+            self.control_buttons['start'].background_color = (0, 0.7, 0, 1)
+            self.status_indicators['general'].set_status('Трекинг: ОСТАНОВЛЕН', COLOR_INACTIVE)
+        self.ui_updater.invalidate('status')
+    
+    def _apply_status(self, text: str):
+        # Общая строка статуса занята и трекингом: следующее его состояние
+        # применится, даже если не изменилось
+        self.status_indicators['general'].set_status(text, COLOR_ACTIVE)
+        self.ui_updater.invalidate('tracking')
+    
+    def _apply_camera(self, ready: bool):
+        if ready:
+            self.status_indicators['camera'].set_status('Камера: ГОТОВ', COLOR_ACTIVE)
+        else:
+            self.status_indicators['camera'].set_status('Камера: ОШИБКА', COLOR_ALERT)
+    
+    def _apply_detection(self, timestamp: float):
+        if self.overlay and self.detection:
+            self.overlay.update_detection(*self.detection)
+    
+    def set_loading_progress(self, stage: str, progress: float):
+        """Состояние фоновой загрузки в области камеры"""
+        if self.loading_label:
+            self.loading_label.text = f'Загрузка: {stage} {int(progress * 100)}%' if stage else 'Запуск камеры...'
+    
+    def attach_camera(self, camera):
+        """Показ кадров камеры (kivy.core.camera) и наложения поверх них
+        
+        Вызывается после загрузки OpenCV и numpy; повторный вызов
+        переключает изображение на новую камеру (после ее освобождения).
+        """
+        if self.camera is not None:
+            self.camera.unbind(on_texture=self._on_camera_texture)
+        self.camera = camera
+        camera.bind(on_texture=self._on_camera_texture)
+        if self.camera_widget:
+            return
+        # numpy загружается здесь, а не при показе экрана
+        from .motion_overlay import MotionOverlay
+        
+        self.camera_view.remove_widget(self.loading_label)
+        self.loading_label = None
+        
+        # Видео с камеры и наложение рамок, следов и секторов поверх него
+        self.camera_widget = Image(fit_mode='contain')
+        self.camera_view.add_widget(self.camera_widget)
+        self.overlay = MotionOverlay(image_widget=self.camera_widget)
+        self.camera_view.add_widget(self.overlay)
+    
+    def _on_camera_texture(self, camera):
+        """Новый кадр камеры (поток интерфейса)"""
+        texture = camera.texture
+        if self.camera_widget.texture is not texture:
+            self.camera_widget.texture = texture
+        self.camera_widget.canvas.ask_update()
     
     def enable_features(self):
         """Включение функций после получения разрешений"""
-        self.status_indicators['camera'].set_status('Камера: ГОТОВ', (0, 1, 0, 1))
-        self.status_indicators['general'].set_status('Готов к работе', (0, 1, 0, 1))
+        self.status_indicators['general'].set_status('Готов к работе', COLOR_ACTIVE)
         Logger.info("MainScreen: Функции включены")
\ No newline at end of file
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Наложение результатов детекции поверх изображения камеры
+Рамки пятен и треков, следы треков и сетка секторов рисуются
+инструкциями canvas; пиксели кадра в GPU не загружаются
+"""
+
+import numpy as np
+from typing import Optional, Tuple
+from kivy.clock import Clock
+from kivy.graphics import Color, Mesh
+from kivy.properties import BooleanProperty
+from kivy.uix.widget import Widget
+
+# Цвета слоев наложения
+COLOR_BLOBS = (1, 1, 0, 0.9)
+COLOR_TRACKS = (0, 1, 0, 1)
+COLOR_TRAILS = (0, 0.8, 1, 0.8)
+COLOR_GRID = (1, 1, 1, 0.35)
+COLOR_ACTIVE_SECTORS = (1, 0, 0, 0.25)
+
+# Шаблоны индексов одного элемента: рамка - 4 отрезка, ячейка - 2 треугольника
+BOX_INDICES = (0, 1, 1, 2, 2, 3, 3, 0)
+QUAD_INDICES = (0, 1, 2, 2, 3, 0)
+
+class MeshBuffer:
+    """Вершины и индексы Mesh в предвыделенных массивах numpy
+
+    Mesh получает буферы через memoryview без преобразования в списки.
+    Емкость растет удвоением; неиспользуемые элементы вырождаются в точку,
+    поэтому индексы не меняются от кадра к кадру.
+    """
+
+    def __init__(self, mesh: Mesh, vertices_per_item: int, pattern: Tuple[int, ...]):
+        self.mesh = mesh
+        self.vertices_per_item = vertices_per_item
+        self.pattern = np.asarray(pattern, dtype=np.uint16)
+        self.capacity = 0
+        self.used = 0  # Элементов с данными в прошлом кадре
+        self.vertices = np.zeros((0, 4), dtype=np.float32)  # x, y, u, v
+        self.indices = np.zeros(0, dtype=np.uint16)
+        self._vertex_view = None
+        self._index_view = None
+
+    def reserve(self, count: int):
+        """Емкость не меньше count элементов"""
+        if count <= self.capacity:
+            return
+        capacity = max(count, 2 * self.capacity, 8)
+        vertices = np.zeros((capacity * self.vertices_per_item, 4), dtype=np.float32)
+        vertices[:len(self.vertices)] = self.vertices
+        offsets = np.arange(capacity, dtype=np.uint16)[:, None] * self.vertices_per_item
+        self.indices = (offsets + self.pattern[None, :]).reshape(-1)
+        self.vertices = vertices
+        self.capacity = capacity
+        self._vertex_view = memoryview(self.vertices.reshape(-1))
+        self._index_view = memoryview(self.indices)
+        self.mesh.indices = self._index_view
+
+    def items(self) -> np.ndarray:
+        """Вершины по элементам: (емкость, вершин на элемент, 4)"""
+        return self.vertices.reshape(self.capacity, self.vertices_per_item, 4)
+
+    def clear_from(self, count: int):
+        """Вырождение элементов count..used прошлого кадра"""
+        if count < self.used:
+            self.items()[count:self.used] = 0.0
+        self.used = count
+
+    def commit(self):
+        """Передача обновленных вершин в Mesh"""
+        if self._vertex_view is not None:
+            self.mesh.vertices = self._vertex_view
+
+class MotionOverlay(Widget):
+    """Рамки, следы и секторы поверх виджета камеры
+
+    Результаты детекции передаются из любого потока через
+    update_detection(); перерисовка выполняется один раз в кадр Clock
+    и только переписывает содержимое буферов вершин.
+    """
+
+    show_boxes = BooleanProperty(True)
+    show_trails = BooleanProperty(True)
+    show_sectors = BooleanProperty(True)
+
+    # Точек в следе трека
+    TRAIL_LENGTH = 16
+
+    def __init__(self, image_widget: Optional[Widget] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.image_widget = image_widget  # Виджет Image/Camera, чью картинку накрываем
+        self.activity_threshold = 0.01
+        self.tracker = None
+
+        # Последние данные от трекера (заменяются ссылкой целиком)
+        self._pending = None
+        self.frame_size: Tuple[int, int] = (0, 0)
+        self.blobs = None
+        self.tracks = None
+        self.sector_scores = None
+        self._grid_key = None
+
+        # Следы: слот -> ID трека и точки в координатах кадра (новая - первая)
+        self.trail_ids = np.full(0, -1, dtype=np.int64)
+        self.trails = np.zeros((0, self.TRAIL_LENGTH, 2), dtype=np.float32)
+
+        with self.canvas:
+            self.sector_color = Color(*COLOR_ACTIVE_SECTORS)
+            self.sector_mesh = MeshBuffer(Mesh(mode='triangles'), 4, QUAD_INDICES)
+            self.grid_color = Color(*COLOR_GRID)
+            self.grid_mesh = MeshBuffer(Mesh(mode='lines'), 2, (0, 1))
+            self.trail_color = Color(*COLOR_TRAILS)
+            self.trail_mesh = MeshBuffer(Mesh(mode='lines'), self.TRAIL_LENGTH,
+                                         self._trail_pattern())
+            self.track_color = Color(*COLOR_TRACKS)
+            self.track_mesh = MeshBuffer(Mesh(mode='lines'), 4, BOX_INDICES)
+            self.blob_color = Color(*COLOR_BLOBS)
+            self.blob_mesh = MeshBuffer(Mesh(mode='lines'), 4, BOX_INDICES)
+
+        self._redraw_trigger = Clock.create_trigger(self._redraw)
+        self._relayout_trigger = Clock.create_trigger(self._relayout)
+        self.bind(pos=self._relayout_trigger, size=self._relayout_trigger,
+                  show_boxes=self._on_visibility, show_trails=self._on_visibility,
+                  show_sectors=self._on_visibility)
+        if image_widget is not None:
+            image_widget.bind(pos=self._relayout_trigger, size=self._relayout_trigger,
+                              norm_image_size=self._relayout_trigger)
+
+    def _trail_pattern(self) -> Tuple[int, ...]:
+        """Отрезки между соседними точками следа"""
+        pattern = []
+        for index in range(self.TRAIL_LENGTH - 1):
+            pattern.extend((index, index + 1))
+        return tuple(pattern)
+
+    def update_detection(self, blobs: np.ndarray, tracks: np.ndarray,
+                         sector_scores: np.ndarray, frame_size: Tuple[int, int]):
+        """Новые результаты детекции (из любого потока)"""
+        self._pending = (blobs, tracks, sector_scores, frame_size)
+        self._redraw_trigger()
+
+    def _on_tracker_stats(self, snapshot):
+        """Подписчик снимков статистики (поток публикации трекера)
+
+        Пятна и треки снимка - массивы этого кадра только для чтения,
+        поэтому ссылки передаются без копирования.
+        """
+        self.update_detection(snapshot.blobs, snapshot.tracks, snapshot.sectors,
+                              snapshot.frame_size)
+
+    def bind_tracker(self, tracker):
+        """Обновление по каждому опубликованному кадру MotionTracker"""
+        self.unbind_tracker()
+        self.tracker = tracker
+        self.activity_threshold = tracker.sectors.activity_threshold
+        tracker.add_stats_listener(self._on_tracker_stats)
+
+    def unbind_tracker(self):
+        if self.tracker is not None:
+            self.tracker.remove_stats_listener(self._on_tracker_stats)
+            self.tracker = None
+
+    def _on_visibility(self, *args):
+        self.blob_color.a = COLOR_BLOBS[3] if self.show_boxes else 0.0
+        self.track_color.a = COLOR_TRACKS[3] if self.show_boxes else 0.0
+        self.trail_color.a = COLOR_TRAILS[3] if self.show_trails else 0.0
+        self.grid_color.a = COLOR_GRID[3] if self.show_sectors else 0.0
+        self.sector_color.a = COLOR_ACTIVE_SECTORS[3] if self.show_sectors else 0.0
+        self._relayout()
+
+    def _image_rect(self) -> Optional[Tuple[float, float, float, float]]:
+        """Левый нижний угол картинки и масштаб кадр -> экран по x и y"""
+        frame_width, frame_height = self.frame_size
+        if not frame_width or not frame_height:
+            return None
+
+        widget = self.image_widget
+        if widget is not None and hasattr(widget, 'norm_image_size'):
+            width, height = widget.norm_image_size
+            center_x, center_y = widget.center
+        else:
+            # Картинка вписана в наложение с сохранением пропорций
+            scale = min(self.width / frame_width, self.height / frame_height)
+            width, height = frame_width * scale, frame_height * scale
+            center_x, center_y = self.center
+        return (center_x - width / 2.0, center_y - height / 2.0,
+                width / frame_width, height / frame_height)
+
+    def _redraw(self, *args):
+        """Применение новых данных детекции (поток интерфейса)"""
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        self.blobs, self.tracks, self.sector_scores, frame_size = pending
+        if frame_size != self.frame_size:
+            self.frame_size = frame_size
+            self._grid_key = None
+        self._update_trails()
+        self._relayout()
+
+    def _relayout(self, *args):
+        """Перезапись вершин всех видимых слоев"""
+        rect = self._image_rect()
+        if rect is None:
+            return
+        if self.show_sectors:
+            self._draw_grid(rect)
+            self._draw_sectors(rect)
+        if self.show_boxes:
+            self._draw_boxes(self.blob_mesh, self.blobs, rect)
+            self._draw_boxes(self.track_mesh, self.tracks, rect)
+        if self.show_trails:
+            self._draw_trails(rect)
+
+    def _draw_boxes(self, buffer: MeshBuffer, boxes: Optional[np.ndarray], rect):
+        """Рамки x, y, w, h (пиксели кадра, ось y вниз) -> 4 вершины на рамку"""
+        count = 0 if boxes is None else len(boxes)
+        buffer.reserve(count)
+        if count:
+            left, bottom, scale_x, scale_y = rect
+            top_edge = bottom + self.frame_size[1] * scale_y
+            x0 = left + boxes['x'] * scale_x
+            x1 = x0 + boxes['w'] * scale_x
+            y0 = top_edge - boxes['y'] * scale_y
+            y1 = y0 - boxes['h'] * scale_y
+
+            items = buffer.items()
+            items[:count, 0, 0] = x0
+            items[:count, 0, 1] = y0
+            items[:count, 1, 0] = x1
+            items[:count, 1, 1] = y0
+            items[:count, 2, 0] = x1
+            items[:count, 2, 1] = y1
+            items[:count, 3, 0] = x0
+            items[:count, 3, 1] = y1
+        buffer.clear_from(count)
+        buffer.commit()
+
+    def _update_trails(self):
+        """Сдвиг следов существующих треков и слоты для новых"""
+        tracks = self.tracks
+        if tracks is None or not len(tracks):
+            self.trail_ids.fill(-1)
+            return
+
+        ids = tracks['id'].astype(np.int64)
+        centers = np.stack((tracks['cx'], tracks['cy']), axis=1)
+
+        if not len(self.trail_ids):
+            self._grow_trails(len(ids))
+
+        # Сопоставление треков и слотов без словарей: матрица совпадений ID
+        match = self.trail_ids[:, None] == ids[None, :]
+        self.trail_ids[~match.any(axis=1)] = -1
+        known = match.any(axis=0)
+        slots = match.argmax(axis=0)
+
+        new = np.flatnonzero(~known)
+        if len(new):
+            free = np.flatnonzero(self.trail_ids < 0)
+            if len(free) < len(new):
+                self._grow_trails(len(self.trail_ids) + len(new) - len(free))
+                free = np.flatnonzero(self.trail_ids < 0)
+            slots[new] = free[:len(new)]
+            self.trail_ids[slots[new]] = ids[new]
+            # Новый след начинается вырожденным: все точки в текущем центре
+            self.trails[slots[new]] = centers[new][:, None, :]
+
+        moved = slots[known]
+        if len(moved):
+            self.trails[moved, 1:] = self.trails[moved, :-1]
+            self.trails[moved, 0] = centers[known]
+
+    def _grow_trails(self, count: int):
+        capacity = max(count, 2 * len(self.trail_ids), 8)
+        trail_ids = np.full(capacity, -1, dtype=np.int64)
+        trail_ids[:len(self.trail_ids)] = self.trail_ids
+        trails = np.zeros((capacity, self.TRAIL_LENGTH, 2), dtype=np.float32)
+        trails[:len(self.trails)] = self.trails
+        self.trail_ids, self.trails = trail_ids, trails
+
+    def _draw_trails(self, rect):
+        buffer = self.trail_mesh
+        count = len(self.trail_ids)
+        buffer.reserve(count)
+        if count:
+            left, bottom, scale_x, scale_y = rect
+            top_edge = bottom + self.frame_size[1] * scale_y
+            items = buffer.items()
+            np.multiply(self.trails[:, :, 0], scale_x, out=items[:count, :, 0])
+            items[:count, :, 0] += left
+            np.multiply(self.trails[:, :, 1], -scale_y, out=items[:count, :, 1])
+            items[:count, :, 1] += top_edge
+            # Свободные слоты не рисуются
+            items[:count][self.trail_ids < 0] = 0.0
+        buffer.clear_from(count)
+        buffer.commit()
+
+    def _draw_grid(self, rect):
+        """Линии сетки секторов: пересчет только при смене сетки или геометрии"""
+        scores = self.sector_scores
+        if scores is None or scores.ndim != 2:
+            return
+        rows, cols = scores.shape
+        key = (rows, cols, rect)
+        if key == self._grid_key:
+            return
+        self._grid_key = key
+
+        left, bottom, scale_x, scale_y = rect
+        width = self.frame_size[0] * scale_x
+        height = self.frame_size[1] * scale_y
+        buffer = self.grid_mesh
+        buffer.reserve(rows + cols + 2)
+        items = buffer.items()
+        # Горизонтальные линии, затем вертикальные
+        ys = bottom + np.linspace(0.0, height, rows + 1)
+        items[:rows + 1, 0, 0] = left
+        items[:rows + 1, 1, 0] = left + width
+        items[:rows + 1, :, 1] = ys[:, None]
+        xs = left + np.linspace(0.0, width, cols + 1)
+        items[rows + 1:rows + cols + 2, :, 0] = xs[:, None]
+        items[rows + 1:rows + cols + 2, 0, 1] = bottom
+        items[rows + 1:rows + cols + 2, 1, 1] = bottom + height
+        buffer.clear_from(rows + cols + 2)
+        buffer.commit()
+
+    def _draw_sectors(self, rect):
+        """Заливка активных секторов; неактивные ячейки вырождены"""
+        scores = self.sector_scores
+        if scores is None or scores.ndim != 2:
+            return
+        rows, cols = scores.shape
+        buffer = self.sector_mesh
+        buffer.reserve(rows * cols)
+
+        left, bottom, scale_x, scale_y = rect
+        cell_width = self.frame_size[0] * scale_x / cols
+        cell_height = self.frame_size[1] * scale_y / rows
+        active = (scores > self.activity_threshold).reshape(-1)
+        cells = np.flatnonzero(active)
+        # Строка 0 - верх кадра
+        x0 = left + (cells % cols) * cell_width
+        y1 = bottom + (rows - cells // cols) * cell_height
+        y0 = y1 - cell_height
+
+        items = buffer.items()
+        count = len(cells)
+        items[:count, 0, 0] = x0
+        items[:count, 0, 1] = y0
+        items[:count, 1, 0] = x0 + cell_width
+        items[:count, 1, 1] = y0
+        items[:count, 2, 0] = x0 + cell_width
+        items[:count, 2, 1] = y1
+        items[:count, 3, 0] = x0
+        items[:count, 3, 1] = y1
+        buffer.clear_from(count)
+        buffer.commit()
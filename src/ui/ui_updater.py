@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Пакетные обновления интерфейса
+Значения из любых потоков объединяются по ключу и применяются одним
+вызовом Clock не чаще max_rate раз в секунду; неизменившиеся значения
+не трогают виджеты
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+_MISSING = object()
+
+class UIUpdater:
+    """Объединение обновлений виджетов в один кадр Clock
+
+    post() только запоминает последнее значение ключа и при необходимости
+    планирует сброс; сколько бы кадров ни обработал трекер, поток
+    интерфейса выполняет не больше max_rate сбросов в секунду. При сбросе
+    обработчик ключа вызывается, только если значение отличается от уже
+    примененного, поэтому значения стоит передавать в готовом для
+    отображения виде (числа с нужной точностью, строки, кортежи).
+    """
+
+    def __init__(self, max_rate: float = 10.0):
+        self.interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.handlers: Dict[str, Callable[[Any], None]] = {}
+        self.applied: Dict[str, Any] = {}  # Значения, уже показанные виджетами
+        self.pending: Dict[str, Any] = {}  # Последние значения до сброса
+        self.lock = threading.Lock()
+        self.scheduled = False
+        self.last_flush = 0.0
+
+        self.posted = 0
+        self.flushes = 0
+        self.applied_count = 0
+        self.skipped = 0  # Значения без изменений: виджет не трогали
+
+    def register(self, key: str, handler: Callable[[Any], None]):
+        """Обработчик ключа (вызывается в потоке интерфейса)"""
+        self.handlers[key] = handler
+
+    def post(self, key: str, value: Any):
+        """Новое значение ключа из любого потока"""
+        with self.lock:
+            self.pending[key] = value
+            self.posted += 1
+            self._schedule()
+
+    def post_many(self, values: Dict[str, Any]):
+        """Несколько значений одним сбросом"""
+        with self.lock:
+            self.pending.update(values)
+            self.posted += len(values)
+            self._schedule()
+
+    def _schedule(self):
+        # Вызывается под self.lock: сброс планируется один раз на пачку
+        if self.scheduled:
+            return
+        self.scheduled = True
+        delay = max(0.0, self.last_flush + self.interval - time.monotonic())
+        Clock.schedule_once(self._flush, delay)
+
+    def _flush(self, dt: float = 0.0):
+        """Применение накопленных значений (поток интерфейса)"""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.scheduled = False
+            self.last_flush = time.monotonic()
+        self.flushes += 1
+
+        for key, value in pending.items():
+            if self.applied.get(key, _MISSING) == value:
+                self.skipped += 1
+                continue
+            handler = self.handlers.get(key)
+            if handler is None:
+                continue
+            try:
+                handler(value)
+                self.applied[key] = value
+                self.applied_count += 1
+            except Exception as e:
+                Logger.error(f"UIUpdater: Ошибка обновления {key}: {e}")
+
+    def invalidate(self, key: Optional[str] = None):
+        """Забыть примененное значение: следующее обновление применится в любом случае"""
+        if key is None:
+            self.applied.clear()
+        else:
+            self.applied.pop(key, None)
+
+    def get_stats(self) -> Dict:
+        return {
+            'posted': self.posted,
+            'flushes': self.flushes,
+            'applied': self.applied_count,
+            'skipped': self.skipped
+        }
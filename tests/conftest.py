@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+"""
+Общие настройки тестов: корень репозитория в sys.path, Kivy без разбора argv
+"""
+
+import os
+import sys
+
+# Kivy разбирает sys.argv при импорте (аргументы pytest)
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Горячий цикл не удерживает память после прогрева (tracemalloc)
+"""
+
+import tracemalloc
+
+import pytest
+
+from benchmarks.check_allocations import measure, measure_process_frame
+from benchmarks.synthetic import synthetic_rgba_frames
+from src.core.detectors import DETECTOR_REGISTRY
+from src.core.morphology import MorphologyStage
+from src.core.motion_tracker import MotionTracker
+
+@pytest.fixture(autouse=True)
+def tracing():
+    """Трассировка с создания трекера: его состояние целиком отслеживается"""
+    tracemalloc.start()
+    yield
+    tracemalloc.stop()
+
+def make_tracker(detector: str):
+    if not DETECTOR_REGISTRY[detector].is_available():
+        pytest.skip(f"движок {detector} недоступен")
+    tracker = MotionTracker()
+    assert tracker.set_detector(detector)
+    frames = [tracker.frame_acquirer.from_rgba(rgba).copy()
+              for rgba in synthetic_rgba_frames(resolution=(320, 240), count=40)]
+    return tracker, frames
+
+@pytest.mark.parametrize('detector', ('mog2', 'running_avg'))
+def test_process_frame_retains_nothing(detector):
+    tracker, frames = make_tracker(detector)
+    current, _ = measure_process_frame(tracker, frames)
+    assert current == 0
+
+@pytest.mark.parametrize('merged', (False, True))
+def test_morphology_retains_nothing(merged):
+    tracker, frames = make_tracker('running_avg')
+    masks = [tracker.detector.apply(frame).copy() for frame in frames]
+    current, _ = measure(MorphologyStage(merged=merged).apply, masks)
+    assert current == 0
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+AppController: USB камера подключается только по запросу и становится
+источником трекера
+"""
+
+import numpy as np
+import pytest
+
+from src.core.controller import AppController
+from src.core.frame_sources import FrameSource
+from src.core.motion_tracker import MotionTracker
+from src.core.otg_manager import OTGManager
+
+ESP32_INFO = {'device_id': 'esp32', 'name': 'CP2102', 'vendor_id': 0x10C4, 'product_id': 0xEA60}
+CAMERA_INFO = {'device_id': 'camera', 'name': 'Webcam', 'vendor_id': 0x046D, 'product_id': 0x0825}
+
+class FakeScreen:
+    """Экран без Kivy: запоминает последние обновления"""
+
+    def __init__(self):
+        self.tracking = None
+        self.camera_ready = None
+
+    def set_tracking(self, running):
+        self.tracking = running
+
+    def set_camera_status(self, ready):
+        self.camera_ready = ready
+
+    def attach_camera(self, camera):
+        pass
+
+    def update_detection(self, snapshot):
+        pass
+
+    def update_otg_status(self, devices):
+        pass
+
+class FakeCameraSource(FrameSource):
+    """Источник USB камеры: серые кадры по запросу"""
+
+    pixel_format = 'gray'
+
+    def open(self) -> bool:
+        self.is_open = True
+        return True
+
+    def read(self):
+        self.frame_index += 1
+        return np.zeros((120, 160), dtype=np.uint8)
+
+@pytest.fixture
+def controller(monkeypatch):
+    controller = AppController(FakeScreen())
+    controller.tracker = MotionTracker()
+    assert controller.tracker.set_detector('running_avg')
+
+    manager = OTGManager()
+    connected = []
+
+    def connect_device(device_id):
+        connected.append(device_id)
+        if manager.devices[device_id].device_type == 'camera':
+            manager.camera_sources[device_id] = FakeCameraSource()
+        return True
+
+    monkeypatch.setattr(manager, 'connect_device', connect_device)
+    manager.connected = connected
+    manager.add_device_listener(controller._on_device_event)
+    controller.otg_manager = manager
+    yield controller
+    controller.tracker.stop()
+
+def test_only_esp32_connects_automatically(controller):
+    manager = controller.otg_manager
+    manager._device_attached(dict(ESP32_INFO))
+    manager._device_attached(dict(CAMERA_INFO))
+    assert manager.connected == ['esp32']
+    assert manager.get_camera_source('camera') is None
+
+def test_use_otg_camera_selects_tracker_source(controller):
+    manager = controller.otg_manager
+    manager._device_attached(dict(CAMERA_INFO))
+
+    assert controller.use_otg_camera()
+    assert manager.connected == ['camera']
+    assert controller.otg_camera_id == 'camera'
+    assert controller.tracker.source is manager.get_camera_source('camera')
+    assert controller.screen.tracking is False
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Смена движка во время трекинга: движок ставит стадия детекции,
+снимки статистики публикует только стадия публикации
+"""
+
+import itertools
+import threading
+import time
+
+from benchmarks.synthetic import synthetic_rgba_frames
+from src.core.frame_sources import FrameSource
+from src.core.motion_tracker import MotionTracker
+
+class SyntheticSource(FrameSource):
+    """Синтетические RGBA кадры по кругу"""
+
+    pixel_format = 'rgba'
+
+    def __init__(self):
+        super().__init__()
+        self.frames = itertools.cycle(list(synthetic_rgba_frames(resolution=(160, 120), count=20)))
+
+    def open(self) -> bool:
+        self.is_open = True
+        return True
+
+    def read(self):
+        self.frame_index += 1
+        return next(self.frames)
+
+def wait_until(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+def test_set_detector_while_running_publishes_from_pipeline():
+    tracker = MotionTracker()
+    assert tracker.set_detector('running_avg')
+    assert tracker.set_source(SyntheticSource())
+
+    publishers = []
+    tracker.add_stats_listener(lambda snapshot: publishers.append(threading.current_thread()))
+    assert tracker.start()
+    try:
+        assert wait_until(lambda: tracker.stats.frames_processed > 2)
+        old_detector = tracker.detector
+        publishers.clear()
+
+        # Калибровка из потока интерфейса
+        assert tracker.set_detector('running_avg')
+        assert wait_until(lambda: tracker.detector is not old_detector)
+        assert wait_until(lambda: len(publishers) > 2)
+    finally:
+        tracker.stop()
+
+    assert threading.main_thread() not in publishers
+    assert tracker.stats.detector == 'running_avg'
+
+def test_set_detector_when_stopped_installs_immediately():
+    tracker = MotionTracker()
+    assert tracker.set_detector('running_avg')
+    old_detector = tracker.detector
+    version = tracker.stats_publisher.version
+
+    assert tracker.set_detector('running_avg')
+    assert tracker.detector is not old_detector
+    assert tracker.stats_publisher.version == version + 1
+
+def test_snapshot_carries_frame_blobs_and_tracks():
+    tracker = MotionTracker()
+    assert tracker.set_detector('running_avg')
+    assert tracker.set_source(SyntheticSource())
+
+    snapshots = []
+    tracker.add_stats_listener(snapshots.append)
+    assert tracker.start()
+    try:
+        assert wait_until(lambda: any(snapshot.blob_count for snapshot in snapshots[5:]))
+    finally:
+        tracker.stop()
+
+    for snapshot in snapshots:
+        assert len(snapshot.blobs) == snapshot.blob_count
+        assert len(snapshot.tracks) == snapshot.track_count
+        assert snapshot.frame_size == (160, 120)
+        assert not snapshot.blobs.flags.writeable and not snapshot.tracks.flags.writeable
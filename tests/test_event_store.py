@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""
+Журнал событий: close закрывает соединения чтения всех потоков
+"""
+
+import sqlite3
+import threading
+
+import pytest
+
+from src.core.event_store import EventStore
+
+def test_close_closes_readers_of_all_threads(tmp_path):
+    store = EventStore(str(tmp_path / 'events.db'), thumbnails=False)
+    assert store.open()
+
+    threads = [threading.Thread(target=store.count) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.count()
+
+    readers = list(store._readers)
+    assert len(readers) == 4
+    store.close()
+
+    for connection in readers:
+        with pytest.raises(sqlite3.ProgrammingError):
+            connection.execute('SELECT 1')
+    # После close чтение открывает новое соединение
+    assert store.count() == 0
+    store.close()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Выборочное профилирование: перенастройка из другого потока во время кадров
+"""
+
+import os
+import sys
+import threading
+
+import pytest
+
+from src.core import profiling
+from src.core.profiling import StageProfiler
+
+@pytest.mark.parametrize('mode', profiling.PROFILE_MODES)
+def test_configure_sampling_while_frames_run(tmp_path, mode):
+    profiler = StageProfiler()
+    profiler.configure_sampling(every=2, frames=2, mode=mode, output_dir=str(tmp_path))
+    stop = threading.Event()
+    errors = []
+    hooks = []
+
+    def detect_loop():
+        try:
+            while not stop.is_set():
+                profiler.begin_frame()
+                profiler.mark('detector', profiler.now())
+                profiler.end_frame()
+                hooks.append(sys.getprofile())
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=detect_loop)
+    thread.start()
+    try:
+        for i in range(200):
+            profiler.configure_sampling(every=1 + i % 3, frames=2, mode=mode)
+    finally:
+        stop.set()
+        thread.join()
+        profiler.close()
+
+    assert not errors
+    # Профиль, закрытый из другого потока, все равно выключается потоком кадров
+    assert hooks and all(hook is None for hook in hooks)
+    assert len(profiler.dumps) <= profiling.MAX_DUMPS
+    # Дампы дописаны фоновым потоком к возврату close()
+    assert profiler.dumps and all(os.path.exists(path) for path in profiler.dumps)
+
+def test_dump_written_off_frame_thread(tmp_path, monkeypatch):
+    profiler = StageProfiler()
+    profiler.configure_sampling(every=1, frames=1, mode='trace', output_dir=str(tmp_path))
+    writers = []
+    write_trace = StageProfiler._write_trace
+    monkeypatch.setattr(StageProfiler, '_write_trace', staticmethod(
+        lambda path, spans: (writers.append(threading.current_thread()), write_trace(path, spans))))
+
+    profiler.begin_frame()
+    profiler.mark('detector', profiler.now())
+    profiler.end_frame()
+    profiler.close()
+
+    assert len(profiler.dumps) == 1
+    assert writers and threading.current_thread() not in writers
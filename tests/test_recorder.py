@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Клипы движения идут в реальном времени при редких кадрах (режим простоя)
+"""
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+
+from src.core import recorder
+from src.core.recorder import MotionRecorder
+
+def frame(value: int) -> np.ndarray:
+    return np.full((48, 64, 3), value, dtype=np.uint8)
+
+def clip_frame_count(path: str) -> int:
+    capture = cv2.VideoCapture(path)
+    count = 0
+    while capture.read()[0]:
+        count += 1
+    capture.release()
+    return count
+
+def test_idle_rate_frames_fill_clip_in_real_time(tmp_path):
+    clip_recorder = MotionRecorder(str(tmp_path), pre_roll=1.0, cooldown=5.0, fps=15.0)
+
+    # Предзапись и клип при 5 FPS: 1 с до движения и 2 с движения
+    for i in range(5):
+        clip_recorder._handle_frame(frame(i), 10.0 + i * 0.2)
+    clip_recorder.trigger(11.0)
+    for i in range(11):
+        clip_recorder._handle_frame(frame(100 + i), 11.0 + i * 0.2)
+    clip_recorder._finish_clip()
+
+    # Клип от первого кадра предзаписи (10.0 с) до последнего (13.0 с) при 15 FPS
+    assert clip_recorder.frames_written == 46
+    assert clip_frame_count(clip_recorder.clips[-1]) == 46
+
+def test_clip_list_is_bounded(tmp_path):
+    clip_recorder = MotionRecorder(str(tmp_path), cooldown=0.5)
+    for i in range(recorder.MAX_CLIPS + 5):
+        clip_recorder.trigger(i)
+        clip_recorder._handle_frame(frame(i), float(i))
+        clip_recorder._finish_clip()
+
+    assert len(clip_recorder.clips) == recorder.MAX_CLIPS
+    assert clip_recorder.get_stats()['clips'] == recorder.MAX_CLIPS + 5
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+SerialTransport и OTGManager против эмулятора ESP32 на pty
+"""
+
+import os
+import time
+
+import pytest
+
+pytestmark = pytest.mark.skipif(os.name != 'posix', reason='эмулятор ESP32 использует pty')
+
+from src.core import esp32_protocol
+from src.core.esp32_protocol import BinaryCodec
+from src.core.otg_manager import OTGManager
+from src.core.serial_transport import (FrameDecoder, PosixTtyPort, SerialTransport,
+                                       MAX_PAYLOAD, encode_frame)
+from tools.esp32_emulator import ESP32Emulator
+
+ESP32_INFO = {'device_id': 'esp32', 'name': 'CP2102', 'vendor_id': 0x10C4, 'product_id': 0xEA60}
+
+def wait_for(predicate, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+@pytest.fixture
+def emulator():
+    emulator = ESP32Emulator(telemetry_interval=0)
+    emulator.start()
+    yield emulator
+    if not emulator.stop_event.is_set():
+        emulator.stop()
+
+@pytest.fixture
+def binary_emulator():
+    emulator = ESP32Emulator(telemetry_interval=0, binary=True)
+    emulator.start()
+    yield emulator
+    emulator.stop()
+
+def open_transport(emulator, **kwargs) -> SerialTransport:
+    port = PosixTtyPort(emulator.port)
+    assert port.open()
+    transport = SerialTransport(port, **kwargs)
+    transport.start()
+    return transport
+
+@pytest.fixture
+def manager(emulator):
+    manager = OTGManager()
+    manager.esp32_port = emulator.port
+    events = []
+    manager.add_device_listener(lambda event, device: events.append(event))
+    manager.events = events
+    assert manager._device_attached(dict(ESP32_INFO))
+    yield manager
+    manager.disconnect_all(by_user=False)
+
+def test_frame_decoder_split_frames():
+    data = encode_frame(b'TRACK:1:50:40') + encode_frame(b'PING')
+    decoder = FrameDecoder()
+    payloads = []
+    for i in range(len(data)):
+        payloads.extend(decoder.feed(data[i:i + 1]))
+    assert payloads == [b'TRACK:1:50:40', b'PING']
+    assert decoder.errors == 0
+
+def test_frame_decoder_resync_after_garbage():
+    decoder = FrameDecoder()
+    data = b'\x00boot log' + encode_frame(b'PING')
+    assert list(decoder.feed(data)) == [b'PING']
+    assert decoder.errors == 1
+
+def test_text_commands_framed(emulator):
+    transport = open_transport(emulator)
+    try:
+        for command in ('PING', 'TRACK:1:50:40', 'SERVO:90'):
+            assert transport.send(command)
+        assert wait_for(lambda: len(emulator.commands) == 3)
+        assert emulator.commands == ['PING', 'TRACK:1:50:40', 'SERVO:90']
+        assert emulator.state['track_id'] == 1
+    finally:
+        transport.stop()
+
+def test_write_coalescing(emulator):
+    transport = open_transport(emulator)
+    try:
+        # Поток записи ждет освобождения очереди: все команды накапливаются
+        with transport.condition:
+            for x in range(10):
+                transport.send(f'TRACK:1:{x}:40')
+                transport.send(f'TRACK:2:{x}:60')
+            transport.send('PING')
+        assert wait_for(lambda: len(emulator.commands) == 3)
+        time.sleep(0.05)
+        assert emulator.commands == ['TRACK:1:9:40', 'TRACK:2:9:60', 'PING']
+        stats = transport.get_stats()
+        assert stats['coalesced'] == 18
+        assert stats['writes'] == 1
+        assert emulator.reads == 1
+    finally:
+        transport.stop()
+
+def test_binary_commands_acknowledged(binary_emulator):
+    codec = BinaryCodec(require_acks=True)
+    transport = open_transport(binary_emulator, codec=codec)
+    try:
+        with transport.condition:
+            transport.send('TRACK:3:50:40')
+            transport.send('TRACK:3:55:45')
+            transport.send('LED:0:255:0:0')
+        assert wait_for(lambda: codec.get_stats()['acked'] == 1)
+        assert binary_emulator.messages == 1
+        assert binary_emulator.commands == ['TRACK:3:55:45', 'LED:0:255:0:0']
+        assert codec.get_stats()['unacked'] == 0
+    finally:
+        transport.stop()
+
+def test_codec_splits_batches_by_size():
+    codec = BinaryCodec(max_message=MAX_PAYLOAD)
+    items = [((esp32_protocol.OP_TEXT, b'x' * 200), 0) for _ in range(64)]
+    messages = codec.encode_messages(items)
+    assert len(messages) > 1
+    assert all(len(message) <= MAX_PAYLOAD for message in messages)
+    decoded = [codec.decode(message) for message in messages]
+    assert sum(len(message.commands) for message in decoded) == 64
+
+def test_oversized_text_command_rejected():
+    # 128 двухбайтовых символов: обрезка до 255 байт разрезала бы последний
+    with pytest.raises(esp32_protocol.ProtocolError):
+        esp32_protocol.parse_text_command('я' * 128)
+    assert esp32_protocol.parse_text_command('я' * 127) == (esp32_protocol.OP_TEXT, ('я' * 127).encode('utf-8'))
+
+def test_send_rejects_oversized_text(binary_emulator):
+    transport = open_transport(binary_emulator, codec=BinaryCodec())
+    try:
+        assert not transport.send('я' * 128)
+        assert transport.is_running
+    finally:
+        transport.stop()
+
+def test_many_long_text_commands_delivered(binary_emulator):
+    codec = BinaryCodec(require_acks=True)
+    transport = open_transport(binary_emulator, codec=codec)
+    commands = [f'SAY:{i:03d}:' + 'x' * 200 for i in range(40)]
+    try:
+        # Все команды в одной записи: пакет больше кадра делится на сообщения
+        with transport.condition:
+            for command in commands:
+                assert transport.send(command)
+        assert wait_for(lambda: len(binary_emulator.commands) == len(commands))
+        assert binary_emulator.commands == commands
+        assert binary_emulator.messages > 1
+        assert wait_for(lambda: codec.get_stats()['unacked'] == 0)
+        assert transport.is_running
+        assert transport.get_stats()['dropped'] == 0
+    finally:
+        transport.stop()
+
+def test_telemetry_received(emulator):
+    received = []
+    transport = open_transport(emulator, on_message=received.append)
+    try:
+        emulator.send_telemetry({'servo_x': 10})
+        assert wait_for(lambda: received)
+        assert received == [b'{"servo_x": 10}']
+    finally:
+        transport.stop()
+
+def test_telemetry_updates_device_data(emulator, manager):
+    assert manager.connect_device('esp32')
+    device = manager.devices['esp32']
+    emulator.send_telemetry({'servo_x': 12, 'servo_y': 34, 'track_id': 5})
+    assert wait_for(lambda: device.data.get('servo_x') == 12)
+    assert device.data['servo_y'] == 34
+    assert device.data['track_id'] == 5
+    assert device.connected
+
+def test_send_command_reaches_emulator(emulator, manager):
+    assert manager.connect_device('esp32')
+    assert manager.send_command('esp32', 'TRACK:7:20:80')
+    assert wait_for(lambda: emulator.state['track_id'] == 7)
+    assert emulator.state['servo_x'] == 20
+
+def test_link_lost_marks_disconnected(emulator, manager):
+    assert manager.connect_device('esp32')
+    device = manager.devices['esp32']
+    # Закрытие master pty: чтение порта завершается ошибкой ввода-вывода
+    emulator.stop()
+    assert wait_for(lambda: not device.connected)
+    assert 'esp32' not in manager.transports
+    manager._check_device_status()
+    assert not device.connected
+    assert manager.events[-1] == 'disconnected'
+
+def test_user_disconnect_survives_status_check(emulator, manager):
+    assert manager.connect_device('esp32')
+    device = manager.devices['esp32']
+    manager.disconnect_device('esp32')
+    assert not device.connected
+    assert manager.is_user_disconnected('esp32')
+
+    # Проверка состояния не должна снова считать устройство подключенным
+    manager._check_device_status()
+    assert not device.connected
+    assert manager.events.count('connected') == 1
+
+    assert manager.connect_device('esp32')
+    assert device.connected
+    assert not manager.is_user_disconnected('esp32')
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Горячий путь детекции без OpenCV: NumPy замены совпадают с cv2,
+трекер с движком running_avg работает при отсутствующем cv2
+"""
+
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from src.core import blobs, morphology
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def by_component(stats: np.ndarray, centroids: np.ndarray):
+    """Компоненты без фона в порядке статистики (порядок меток OpenCV зависит от алгоритма)"""
+    order = np.lexsort(stats[1:].T[::-1])
+    return stats[1:][order], centroids[1:][order]
+
+@pytest.mark.parametrize('connectivity', (4, 8))
+def test_connected_components_match_opencv(connectivity):
+    cv2 = pytest.importorskip('cv2')
+    rng = np.random.default_rng(1)
+    for _ in range(50):
+        height, width = rng.integers(1, 60, 2)
+        mask = (rng.random((height, width)) < rng.random()).astype(np.uint8) * 255
+        count, _, stats, centroids = cv2.connectedComponentsWithStats(
+            mask, connectivity=connectivity, ltype=cv2.CV_32S)
+        own_count, own_stats, own_centroids = blobs.connected_components(mask, connectivity)
+        assert own_count == count
+        own_stats, own_centroids = by_component(own_stats, own_centroids)
+        stats, centroids = by_component(stats, centroids)
+        assert np.array_equal(own_stats, stats)
+        assert np.allclose(own_centroids, centroids)
+
+@pytest.mark.parametrize('merged', (False, True))
+@pytest.mark.parametrize('shape', tuple(morphology.KERNEL_SHAPES))
+def test_morphology_matches_opencv(monkeypatch, merged, shape):
+    pytest.importorskip('cv2')
+    mask = (np.random.default_rng(2).random((61, 83)) < 0.3).astype(np.uint8) * 255
+    expected = morphology.MorphologyStage(5, shape, merged).apply(mask).copy()
+
+    monkeypatch.setattr(morphology, 'cv2', None)
+    monkeypatch.setattr(morphology, '_kernel_cache', {})
+    assert np.array_equal(morphology.MorphologyStage(5, shape, merged).apply(mask), expected)
+
+def test_tracker_runs_without_opencv():
+    # Отдельный процесс: cv2 блокируется до импорта модулей ядра
+    script = '''
+import sys
+sys.modules['cv2'] = None
+from src.core.motion_tracker import MotionTracker
+from benchmarks.synthetic import synthetic_rgba_frames
+
+tracker = MotionTracker()
+assert tracker.set_detector(tracker.detector_name), tracker.detector_name
+tracker.set_processing_scale(0.5, coarse_to_fine=True)
+tracker.set_roi(include=[[(0.05, 0.05), (0.95, 0.05), (0.95, 0.95), (0.05, 0.95)]])
+motion = 0
+for rgba in synthetic_rgba_frames((320, 240), 40, objects=2, seed=1):
+    frame = tracker.frame_acquirer.from_rgba(rgba)
+    motion += tracker._process_frame(frame)
+    tracker.frame_acquirer.release(frame)
+print(tracker.detector_name, motion)
+'''
+    completed = subprocess.run([sys.executable, '-c', script], cwd=ROOT, text=True,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               env=dict(os.environ, KIVY_NO_ARGS='1'))
+    assert completed.returncode == 0, completed.stderr
+    name, motion = completed.stdout.split()[-2:]
+    assert name == 'running_avg'
+    assert int(motion) > 20
@@ -0,0 +1 @@
+# Инструменты разработки
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Эмулятор ESP32 на псевдотерминале (pty) для разработки без устройства
+Принимает кадры команд (текст или двоичный протокол) и периодически
+отправляет телеметрию в JSON
+
+Запуск: python -m tools.esp32_emulator --interval 0.5 [--binary]
+Путь порта печатается при старте; его можно задать в OTGManager.esp32_port
+"""
+
+import os
+
+# Kivy разбирает sys.argv при импорте
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+import argparse
+import json
+import pty
+import select
+import sys
+import threading
+import time
+import tty
+from typing import Dict, List, Optional
+
+from src.core.serial_transport import FrameDecoder, encode_frame
+from src.core.esp32_protocol import (BinaryCodec, ProtocolError, MSG_COMMANDS,
+                                     FLAG_ACK_REQUESTED, format_command)
+
+class ESP32Emulator:
+    """Эмулятор ESP32 на стороне master псевдотерминала"""
+
+    def __init__(self, telemetry_interval: float = 1.0, echo: bool = False, binary: bool = False):
+        self.telemetry_interval = telemetry_interval
+        self.echo = echo  # Текстовый режим: ответ 'ACK:<команда>' на каждую команду
+        self.codec = BinaryCodec() if binary else None
+        self.messages = 0  # Принятые сообщения двоичного протокола
+        self.master_fd, self.slave_fd = pty.openpty()
+        tty.setraw(self.slave_fd)
+        self.port = os.ttyname(self.slave_fd)
+
+        self.decoder = FrameDecoder()
+        self.commands: List[str] = []
+        self.reads = 0  # Число чтений из pty (объединенные записи - одно чтение)
+        self.state: Dict = {'servo_x': 50, 'servo_y': 50, 'track_id': None}
+        self.started = time.monotonic()
+
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._loop, name='ESP32Emulator')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=1.0)
+        os.close(self.master_fd)
+        os.close(self.slave_fd)
+
+    def send_telemetry(self, data: Optional[Dict] = None):
+        """Отправка кадра телеметрии"""
+        payload = data if data is not None else dict(
+            self.state, uptime=round(time.monotonic() - self.started, 2),
+            commands=len(self.commands))
+        body = json.dumps(payload).encode('utf-8')
+        if self.codec is not None:
+            body = self.codec.encode_telemetry(body)
+        os.write(self.master_fd, encode_frame(body))
+
+    def _handle(self, command: str):
+        self.commands.append(command)
+        parts = command.split(':')
+        if parts[0] == 'TRACK' and len(parts) == 4:
+            self.state.update(track_id=int(parts[1]), servo_x=int(parts[2]), servo_y=int(parts[3]))
+        if self.echo and self.codec is None:
+            os.write(self.master_fd, encode_frame(f'ACK:{command}'.encode('utf-8')))
+
+    def _handle_message(self, payload: bytes):
+        """Сообщение двоичного протокола: команды и подтверждение"""
+        try:
+            message = self.codec.decode(payload)
+        except ProtocolError as e:
+            print(f"ошибка протокола: {e}", flush=True)
+            return
+        if message.type != MSG_COMMANDS:
+            return
+        self.messages += 1
+        for command in message.commands:
+            self._handle(format_command(command))
+        if message.flags & FLAG_ACK_REQUESTED:
+            os.write(self.master_fd, encode_frame(self.codec.encode_ack(message.seq)))
+
+    def _loop(self):
+        next_telemetry = time.monotonic()
+        while not self.stop_event.is_set():
+            timeout = max(0.0, next_telemetry - time.monotonic())
+            ready, _, _ = select.select([self.master_fd], [], [], min(timeout, 0.1))
+            if ready:
+                data = os.read(self.master_fd, 4096)
+                self.reads += 1
+                for payload in self.decoder.feed(data):
+                    if self.codec is None:
+                        self._handle(payload.decode('utf-8', errors='replace'))
+                    else:
+                        self._handle_message(payload)
+
+            if self.telemetry_interval > 0 and time.monotonic() >= next_telemetry:
+                self.send_telemetry()
+                next_telemetry = time.monotonic() + self.telemetry_interval
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Эмулятор ESP32 на pty')
+    parser.add_argument('--interval', type=float, default=1.0, help='период телеметрии, сек')
+    parser.add_argument('--echo', action='store_true', help='отвечать ACK на текстовые команды')
+    parser.add_argument('--binary', action='store_true', help='двоичный протокол esp32_protocol')
+    args = parser.parse_args(argv)
+
+    emulator = ESP32Emulator(args.interval, args.echo, args.binary)
+    emulator.start()
+    print(f"ESP32 эмулятор: {emulator.port}", flush=True)
+    try:
+        while True:
+            time.sleep(1.0)
+            if emulator.commands:
+                print(f"команд: {len(emulator.commands)}, последняя: {emulator.commands[-1]}", flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.stop()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())